@@ -4,8 +4,11 @@ from django.contrib.auth import get_user_model
 from .forms import UserCreationForm, UserChangeForm
 from django.contrib.auth.models import Group
 
+from posts.deletion import soft_delete_user
+from sukeb.admin import EstimatedCountPaginator, IndexedSearchMixin
 
-class CustomUserAdmin(UserAdmin):
+
+class CustomUserAdmin(IndexedSearchMixin, UserAdmin):
     # ユーザーインスタンスを追加、変更するためのフォーム
     form = UserChangeForm
     add_form = UserCreationForm
@@ -37,8 +40,32 @@ class CustomUserAdmin(UserAdmin):
     # 3つのフィールドでユーザーを絞り込む
     list_filter = ('is_staff', 'is_superuser', 'is_active',)
 
-    # 検索される時に使われるフィールド
+    # 件数はCOUNT(*)で数えずに見積もる
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # 検索される時に使われるフィールド、メールアドレスの完全一致とユーザーネームの前方一致で探す
     search_fields = ('email', 'username',)
+    search_email_field = 'email'
+    search_prefix_field = 'username'
+    search_help_text = 'メールアドレスか、ユーザーネームの先頭で検索します'
+
+    def get_queryset(self, request):
+        # 退会済みのユーザーは、purge_deletedコマンドで削除されるまで表示しない
+        return super().get_queryset(request).filter(deleted_at__isnull=True)
+
+    def get_deleted_objects(self, objs, request):
+        # 削除済みにするだけなので、関連するオブジェクトを全て集めずに選んだものだけを表示する
+        perms_needed = set() if self.has_delete_permission(request) else {self.model._meta.verbose_name}
+        return [str(obj) for obj in objs], {self.model._meta.verbose_name_plural: len(objs)}, perms_needed, []
+
+    def delete_model(self, request, obj):
+        # 退会済みにするだけで、投稿やコメントはpurge_deletedコマンドが少しずつ削除する
+        soft_delete_user(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            soft_delete_user(user)
 
 
 admin.site.register(get_user_model(), CustomUserAdmin) # 新しいユーザーアドミンを登録
@@ -0,0 +1,71 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.signals import user_login_failed
+
+from .hashers import acheck_password, amake_password
+
+
+User = get_user_model()
+
+
+class EmailBackend(ModelBackend):
+    """
+    メールアドレスの大文字、小文字を区別せずに認証するバックエンド
+    """
+    def authenticate(self, request, email=None, password=None, username=None, **kwargs):
+        # 管理画面のログインなど、Django標準のフォームはメールアドレスをusernameで渡す
+        email = email or username or kwargs.get(User.USERNAME_FIELD)
+        if email is None or password is None:
+            return None
+        try:
+            user = User._default_manager.get_by_email(email)
+        except User.DoesNotExist:
+            # ユーザーが存在しない時もハッシュ計算をして、応答時間の差をなくす
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, email=None, password=None):
+        """
+        authenticateの非同期版
+        データベースの検索だけを同期で行い、パスワードのハッシュ計算はスレッドプールに任せる
+        """
+        if email is None or password is None:
+            return None
+        try:
+            user = await sync_to_async(User._default_manager.get_by_email)(email)
+        except User.DoesNotExist:
+            # ユーザーが存在しない時もハッシュ計算をして、応答時間の差をなくす
+            await amake_password(password)
+            return None
+        if await acheck_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+
+async def aauthenticate(request=None, email=None, password=None):
+    """
+    django.contrib.auth.authenticateと同じように、EmailBackendでユーザーを認証する非同期関数
+    失敗した時はuser_login_failedを送り、同期のログインと同じようにログインの失敗を記録できるようにする
+
+    引数:
+        request (HttpRequest): リクエスト
+        email (str): メールアドレス
+        password (str): パスワード
+    戻り値:
+        User: 認証に成功したユーザー、失敗した時はNone
+    """
+    backend = EmailBackend()
+    user = await backend.aauthenticate(request, email=email, password=password)
+    if user is None:
+        # Djangoと同じく、パスワードは伏せて送る
+        await sync_to_async(user_login_failed.send)(
+            sender=__name__, credentials={'email': email, 'password': '*' * 20}, request=request
+        )
+        return None
+    # login()でどの認証バックエンドを使ったか判定するため
+    user.backend = f'{EmailBackend.__module__}.{EmailBackend.__qualname__}'
+    return user
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    PBKDF2PasswordHasher, check_password, make_password
+)
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    反復回数を設定のコストプロファイルから読み込むPBKDF2ハッシャー
+    アルゴリズム名はDjango標準と同じなので、既存のハッシュもそのまま検証できる
+    プロファイルを変えるとmust_updateがTrueになり、次のログイン時に再ハッシュされる
+    """
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_PROFILES[settings.PASSWORD_HASH_PROFILE]
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_hash_executor():
+    """
+    パスワードハッシュ専用のスレッドプールを返す
+    ワーカー数はPASSWORD_HASH_WORKERSで上限を決める
+    gunicornのpreload後にforkされても安全なように、最初に使われた時に作成する
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS,
+                    thread_name_prefix='password-hash',
+                )
+    return _executor
+
+
+def _verify_password(raw_password, encoded):
+    """
+    パスワードを検証し、(一致したか, 再ハッシュが必要か)のタプルを返す
+    """
+    must_update = []
+    is_correct = check_password(raw_password, encoded, setter=must_update.append)
+    return is_correct, bool(must_update)
+
+
+async def averify_password(raw_password, encoded):
+    """
+    パスワードの検証をスレッドプールで行う
+
+    引数:
+        raw_password (str): 入力されたパスワード
+        encoded (str): 保存されているハッシュ
+    戻り値:
+        tuple: (一致したか, 再ハッシュが必要か)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_executor(), _verify_password, raw_password, encoded)
+
+
+async def amake_password(raw_password):
+    """
+    パスワードのハッシュ化をスレッドプールで行う
+
+    引数:
+        raw_password (str): ハッシュ化するパスワード
+    戻り値:
+        str: ハッシュ化されたパスワード
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_executor(), make_password, raw_password)
+
+
+async def acheck_password(user, raw_password):
+    """
+    User.check_passwordの非同期版
+    コストプロファイルが変わっていた場合は、透過的に再ハッシュして保存する
+
+    引数:
+        user (User): 検証するユーザー
+        raw_password (str): 入力されたパスワード
+    戻り値:
+        bool: パスワードが一致したかどうか
+    """
+    is_correct, must_update = await averify_password(raw_password, user.password)
+    if is_correct and must_update:
+        user.password = await amake_password(raw_password)
+        await sync_to_async(user.save)(update_fields=['password'])
+    return is_correct
@@ -0,0 +1,118 @@
+import asyncio
+import statistics
+import time
+import uuid
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from authentications.hashers import averify_password
+from authentications.models import User
+from authentications.views import AuthenticationsAsyncLoginView
+
+
+class Command(BaseCommand):
+    help = (
+        'ログイン時のパスワード検証と、非同期のログインビューのスループットを同時実行数ごとに計測する\n'
+        'viewの計測では一時的なユーザーを作り、計測が終わったら削除する'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', default='1,2,4,8,16',
+            help='カンマ区切りの同時実行数 (デフォルト: 1,2,4,8,16)'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=64,
+            help='同時実行数ごとのログイン回数 (デフォルト: 64)'
+        )
+        parser.add_argument(
+            '--profile', default=settings.PASSWORD_HASH_PROFILE,
+            choices=sorted(settings.PASSWORD_HASH_PROFILES),
+            help='使用するハッシュのコストプロファイル'
+        )
+        parser.add_argument(
+            '--target', default='all', choices=['hash', 'view', 'all'],
+            help='計測する対象、hashはパスワードの検証だけ、viewは非同期のログインビュー全体 (デフォルト: all)'
+        )
+
+    def handle(self, *args, **options):
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        total = options['requests']
+        targets = ['hash', 'view'] if options['target'] == 'all' else [options['target']]
+        with override_settings(PASSWORD_HASH_PROFILE=options['profile']):
+            encoded = make_password('benchmark-password')
+            self.stdout.write(
+                f"profile={options['profile']} "
+                f"iterations={settings.PASSWORD_HASH_PROFILES[options['profile']]} "
+                f"workers={settings.PASSWORD_HASH_WORKERS} requests={total}"
+            )
+            for target in targets:
+                self.stdout.write(f'target={target}')
+                self.stdout.write(f"{'concurrency':>11} {'logins/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+                if target == 'hash':
+                    self._measure(levels, total, lambda: averify_password('benchmark-password', encoded))
+                else:
+                    self._measure_view(levels, total, encoded)
+
+    def _measure(self, levels, total, login):
+        for level in levels:
+            elapsed, latencies = asyncio.run(self._run(login, level, total))
+            latencies.sort()
+            p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+            self.stdout.write(
+                f'{level:>11} {total / elapsed:>10.1f} '
+                f'{statistics.median(latencies) * 1000:>8.1f} {p95 * 1000:>8.1f}'
+            )
+
+    def _measure_view(self, levels, total, encoded):
+        """
+        一時的なユーザーで、非同期のログインビューをユーザーの検索とセッションの保存まで含めて計測する
+        ミドルウェアを通さないので、回数制限はかからない
+        """
+        email = f'bench-{uuid.uuid4().hex}@example.com'
+        user = User.objects.create(username=email[:30], email=email, password=encoded)
+        factory = RequestFactory()
+        view = AuthenticationsAsyncLoginView.as_view()
+        session_store = import_module(settings.SESSION_ENGINE).SessionStore
+        url = reverse('authentications:async_login')
+        sessions = []
+
+        async def login():
+            request = factory.post(url, {'email': email, 'password': 'benchmark-password'})
+            request.user = AnonymousUser()
+            request.session = session_store()
+            response = await view(request)
+            if response.url != reverse('posts:list'):
+                raise RuntimeError('ベンチマーク用のユーザーでログインできませんでした')
+            sessions.append(request.session)
+
+        try:
+            self._measure(levels, total, login)
+        finally:
+            for session in sessions:
+                session.delete()
+            user.delete()
+
+    async def _run(self, login, concurrency, total):
+        """
+        同時実行数をconcurrencyに制限して、total回のログインを行う
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def run_login():
+            async with semaphore:
+                started = time.perf_counter()
+                await login()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(run_login() for _ in range(total)))
+        return time.perf_counter() - started, latencies
@@ -0,0 +1,46 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def report_email_collisions(apps, schema_editor):
+    """
+    大文字、小文字だけが違うメールアドレスのアカウントを探して報告する
+    重複が残っているとlower(email)のユニークインデックスを作成できないので、
+    見つかった場合は一覧を出してマイグレーションを中断する
+    """
+    User = apps.get_model('authentications', 'User')
+    db_alias = schema_editor.connection.alias
+    colliding_emails = (
+        User.objects.using(db_alias)
+        .values(email_lower=Lower('email'))
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .values_list('email_lower', flat=True)
+    )
+    lines = []
+    for email_lower in colliding_emails:
+        users = (
+            User.objects.using(db_alias)
+            .alias(email_lower=Lower('email'))
+            .filter(email_lower=email_lower)
+            .order_by('id')
+        )
+        accounts = ', '.join(f'id={user.id} {user.email}' for user in users)
+        lines.append(f'  {email_lower}: {accounts}')
+    if lines:
+        raise RuntimeError(
+            '大文字、小文字だけが違うメールアドレスのアカウントがあります。'
+            '統合または変更してから再度マイグレーションしてください\n' + '\n'.join(lines)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(report_email_collisions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-19 01:05
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentications', '0002_report_email_collisions'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='authentications_user_email_lower_unique', violation_error_message='このメールアドレスは既に登録されています'),
+        ),
+    ]
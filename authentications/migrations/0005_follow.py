@@ -0,0 +1,57 @@
+# Generated by Django 4.1 on 2026-10-19 01:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentications', '0004_user_deleted_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrefectureFollow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefecture', models.CharField(choices=[('北海道', '北海道'), ('青森県', '青森県'), ('岩手県', '岩手県'), ('宮城県', '宮城県'), ('秋田県', '秋田県'), ('山形県', '山形県'), ('福島県', '福島県'), ('茨城県', '茨城県'), ('栃木県', '栃木県'), ('群馬県', '群馬県'), ('埼玉県', '埼玉県'), ('千葉県', '千葉県'), ('東京都', '東京都'), ('神奈川県', '神奈川県'), ('新潟県', '新潟県'), ('富山県', '富山県'), ('石川県', '石川県'), ('福井県', '福井県'), ('山梨県', '山梨県'), ('長野県', '長野県'), ('岐阜県', '岐阜県'), ('静岡県', '静岡県'), ('愛知県', '愛知県'), ('三重県', '三重県'), ('滋賀県', '滋賀県'), ('京都府', '京都府'), ('大阪府', '大阪府'), ('兵庫県', '兵庫県'), ('奈良県', '奈良県'), ('和歌山県', '和歌山県'), ('鳥取県', '鳥取県'), ('島根県', '島根県'), ('岡山県', '岡山県'), ('広島県', '広島県'), ('山口県', '山口県'), ('徳島県', '徳島県'), ('香川県', '香川県'), ('愛媛県', '愛媛県'), ('高知県', '高知県'), ('福岡県', '福岡県'), ('佐賀県', '佐賀県'), ('長崎県', '長崎県'), ('熊本県', '熊本県'), ('大分県', '大分県'), ('宮崎県', '宮崎県'), ('鹿児島県', '鹿児島県'), ('沖縄県', '沖縄県')], max_length=4, verbose_name='県名')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='フォロー日')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prefecture_follows', to=settings.AUTH_USER_MODEL, verbose_name='フォローした人')),
+            ],
+            options={
+                'verbose_name': '都道府県のフォロー',
+                'verbose_name_plural': '都道府県のフォロー',
+            },
+        ),
+        migrations.CreateModel(
+            name='Follow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='フォロー日')),
+                ('followee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='followers', to=settings.AUTH_USER_MODEL, verbose_name='フォローされた人')),
+                ('follower', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='following', to=settings.AUTH_USER_MODEL, verbose_name='フォローした人')),
+            ],
+            options={
+                'verbose_name': 'フォロー',
+                'verbose_name_plural': 'フォロー',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='prefecturefollow',
+            index=models.Index(fields=['prefecture', 'user'], name='auth_pref_follow_pref_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='prefecturefollow',
+            constraint=models.UniqueConstraint(fields=('user', 'prefecture'), name='auth_prefecture_follow_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['followee', 'follower'], name='auth_follow_followee_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('follower', 'followee'), name='auth_follow_unique'),
+        ),
+    ]
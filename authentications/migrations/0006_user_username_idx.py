@@ -0,0 +1,17 @@
+# Generated by Django 4.1 on 2026-10-19 01:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentications', '0005_follow'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['username'], name='auth_user_username_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
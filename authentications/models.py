@@ -1,8 +1,11 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import (
     AbstractBaseUser, PermissionsMixin, BaseUserManager
 )
 
+from posts.prefectures import PREFECTURE_CHOICES
+
 
 class UserManager(BaseUserManager):
     def create_user(self, email, username, password=None):
@@ -45,6 +48,17 @@ class UserManager(BaseUserManager):
         super_user.save(using=self._db)
         return super_user
 
+    def get_by_email(self, email):
+        """メールアドレスの大文字、小文字を区別せずにユーザーを取得する
+        lower(email)の関数インデックスが使われるように、Lowerで比較する
+
+        引数:
+            email (str): メールアドレス
+        戻り値:
+            User: 見つかったユーザーオブジェクトを返す
+        """
+        return self.alias(email_lower=Lower('email')).get(email_lower=email.lower())
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     """
@@ -57,6 +71,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     username = models.CharField(max_length=100, verbose_name='ユーザーネーム')
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # 退会した日時、purge_deletedコマンドが投稿やコメントと一緒に削除する
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='退会日時')
 
     objects = UserManager()
 
@@ -66,6 +82,67 @@ class User(AbstractBaseUser, PermissionsMixin):
     class Meta:
         verbose_name = 'ユーザー'
         verbose_name_plural = 'ユーザー'
+        constraints = [
+            # 大文字、小文字だけが違うメールアドレスの重複を防ぎ、検索にも使う関数インデックス
+            models.UniqueConstraint(
+                Lower('email'), name='authentications_user_email_lower_unique',
+                violation_error_message='このメールアドレスは既に登録されています',
+            ),
+        ]
+        indexes = [
+            # 削除待ちのユーザーだけを持つ小さなインデックス
+            models.Index(
+                fields=['deleted_at'], name='auth_user_deleted_idx',
+                condition=models.Q(deleted_at__isnull=False),
+            ),
+            # 管理画面でユーザーネームを前方一致で探すためのインデックス
+            models.Index(fields=['username'], name='auth_user_username_idx', opclasses=['varchar_pattern_ops']),
+        ]
 
     def __str__(self):
-        return self.username
\ No newline at end of file
+        return self.username
+
+class Follow(models.Model):
+    """
+    ユーザーのフォローに関するモデル
+    """
+    follower = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='following', verbose_name='フォローした人'
+    )
+    followee = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='followers', verbose_name='フォローされた人'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='フォロー日')
+
+    class Meta:
+        verbose_name = 'フォロー'
+        verbose_name_plural = 'フォロー'
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'followee'], name='auth_follow_unique'),
+        ]
+        indexes = [
+            # 投稿を配る時にフォロワーを読むためのインデックス
+            models.Index(fields=['followee', 'follower'], name='auth_follow_followee_idx'),
+        ]
+
+
+class PrefectureFollow(models.Model):
+    """
+    都道府県のフォローに関するモデル
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='prefecture_follows', verbose_name='フォローした人'
+    )
+    prefecture = models.CharField(max_length=4, choices=PREFECTURE_CHOICES, verbose_name='県名')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='フォロー日')
+
+    class Meta:
+        verbose_name = '都道府県のフォロー'
+        verbose_name_plural = '都道府県のフォロー'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'prefecture'], name='auth_prefecture_follow_unique'),
+        ]
+        indexes = [
+            # 投稿を配る時にフォロワーを読むためのインデックス
+            models.Index(fields=['prefecture', 'user'], name='auth_pref_follow_pref_idx'),
+        ]
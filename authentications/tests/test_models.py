@@ -155,4 +155,18 @@ class UserModelTest(TestCase):
             email='test4@mail.com', username='test', password='testpassword'
         )
         self.assertTrue(superuser.is_superuser)
-        self.assertTrue(superuser.is_staff)
\ No newline at end of file
+        self.assertTrue(superuser.is_staff)
+
+    def test_raise_error_if_email_differs_only_in_case(self):
+        """
+        大文字、小文字だけが違うメールアドレスでもエラーをあげるテスト
+        """
+        error_user = User(username='testuser', email='TEST@mail.com', password='testuser')
+        with self.assertRaises(IntegrityError):
+            error_user.save()
+
+    def test_get_by_email_ignores_case(self):
+        """
+        get_by_emailが大文字、小文字を区別せずにユーザーを取得するテスト
+        """
+        self.assertEqual(User.objects.get_by_email('Test@Mail.com'), self.user)
@@ -1,7 +1,12 @@
+from unittest import mock
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.signals import user_login_failed
 from django.test import TestCase, Client
 from django.urls import reverse
 
 from authentications.models import User
+from posts.models import Comment, Post, Skatepark
 
 
 class AuthenticationsSignupViewTest(TestCase):
@@ -73,6 +78,17 @@ class AuthenticationsSignupViewTest(TestCase):
         }, follow=True)
         self.assertTrue(response.context['user'].is_authenticated)
 
+    def test_view_rejects_email_that_differs_only_in_case(self):
+        """
+        大文字、小文字だけが違うメールアドレスでは登録できないテスト
+        """
+        response = self.client.post(reverse(self.url_name), {
+            'username': 'testuser4', 'email': 'TEST@mail.com',
+            'password': 'testpassword', 'confirm_password': 'testpassword'
+        })
+        self.assertTemplateUsed(response, self.template_name)
+        self.assertEqual(User.objects.filter(email__iexact='test@mail.com').count(), 1)
+
     def test_view_render_signup_page_if_form_is_invalid(self):
         """ 
         フォームの検証が失敗した時登録ページにレンダーするテスト
@@ -146,6 +162,15 @@ class AuthenticationsLoginViewTest(TestCase):
         response = self.client.get(reverse(self.url_name), follow=True)
         self.assertTemplateUsed(response, 'posts/posts_list.html')
 
+    def test_view_can_login_with_different_case_email(self):
+        """
+        大文字、小文字が違うメールアドレスでもログインできるかテスト
+        """
+        response = self.client.post(reverse(self.url_name), {
+            'email': 'TEST@Mail.com', 'password': 'testpassword'
+        }, follow=True)
+        self.assertTrue(response.context['user'].is_authenticated)
+
     def test_redirect_to_login_page_if_user_not_found(self):
         """ 
         ユーザーが見つからなかったらログインページにリダイレクトするテスト
@@ -155,6 +180,17 @@ class AuthenticationsLoginViewTest(TestCase):
         }, follow=True)
         self.assertTemplateUsed(response, self.template_name)
 
+    def test_admin_login_with_email_as_username(self):
+        """
+        管理画面のログインフォームがusernameで渡すメールアドレスでもログインできるかテスト
+        """
+        User.objects.create_superuser(email='admin@mail.com', username='admin', password='testpassword')
+        self.assertIsNotNone(authenticate(None, username='Admin@Mail.com', password='testpassword'))
+        response = self.client.post(reverse('admin:login'), {
+            'username': 'admin@mail.com', 'password': 'testpassword', 'next': reverse('admin:index')
+        })
+        self.assertRedirects(response, reverse('admin:index'))
+
 
 class AuthenticationsLogoutViewTest(TestCase):
     @classmethod
@@ -231,4 +267,150 @@ class UserProfileViewTest(TestCase):
         UserProfileViewが正しいテンプレートファイルを使っているかテスト
         """
         response = self.client.get(self.url)
-        self.assertTemplateUsed(response, self.template_name)
\ No newline at end of file
+        self.assertTemplateUsed(response, self.template_name)
+
+    def test_view_returns_404_if_user_not_found(self):
+        """
+        存在しないユーザーのIDの時404を返すテスト
+        """
+        response = self.client.get(reverse('authentications:profile', kwargs={'pk': 9999}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_view_paginates_posts(self):
+        """
+        投稿がページごとに分けられ、新しい順に並ぶテスト
+        """
+        for i in range(12):
+            skatepark = Skatepark.objects.create(
+                name=f'park{i}', prefecture='東京都', city='渋谷', skatepark_image='test'
+            )
+            Post.objects.create(author=self.user, skatepark=skatepark, body=f'post{i}')
+        response = self.client.get(self.url)
+        posts = list(response.context['posts'])
+        self.assertEqual(len(posts), 10)
+        self.assertEqual(posts[0].body, 'post11')
+        response = self.client.get(self.url, {'page': 2})
+        self.assertEqual(len(response.context['posts']), 2)
+
+    def test_view_shows_user_stats(self):
+        """
+        投稿数、コメント数、都道府県数がコンテキストに入っているテスト
+        """
+        skatepark = Skatepark.objects.create(
+            name='park', prefecture='東京都', city='渋谷', skatepark_image='test'
+        )
+        post = Post.objects.create(author=self.user, skatepark=skatepark, body='post')
+        Comment.objects.create(author=self.user, post=post, body='comment')
+        response = self.client.get(self.url)
+        stats = response.context['stats']
+        self.assertEqual(stats.post_count, 1)
+        self.assertEqual(stats.comment_count, 1)
+        self.assertEqual(stats.prefecture_count, 1)
+
+
+class AuthenticationsAsyncSignupViewTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.template_name = 'authentications/authentications_signup.html'
+        self.url_name = 'authentications:async_signup'
+
+    def test_view_uses_correct_template(self):
+        """
+        AuthenticationsAsyncSignupViewが正しいテンプレートファイルを使っているかテスト
+        """
+        response = self.client.get(reverse(self.url_name))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, self.template_name)
+
+    def test_view_creates_a_new_user_with_hashed_password(self):
+        """
+        ユーザーを作成し、パスワードがハッシュ化されて保存されるテスト
+        """
+        response = self.client.post(reverse(self.url_name), {
+            'username': 'asyncuser', 'email': 'async@mail.com',
+            'password': 'testpassword', 'confirm_password': 'testpassword'
+        }, follow=True)
+        self.assertTrue(response.context['user'].is_authenticated)
+        user = User.objects.get(email='async@mail.com')
+        self.assertNotEqual(user.password, 'testpassword')
+        self.assertTrue(user.check_password('testpassword'))
+
+    def test_view_render_signup_page_if_form_is_invalid(self):
+        """
+        フォームの検証が失敗した時登録ページにレンダーするテスト
+        """
+        response = self.client.post(reverse(self.url_name), {})
+        self.assertTemplateUsed(response, self.template_name)
+
+
+class AuthenticationsAsyncLoginViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='testuser', email='test@mail.com')
+        user.set_password('testpassword')
+        user.save()
+
+    def setUp(self):
+        self.client = Client()
+        self.credentials = {
+            'email': 'test@mail.com', 'password': 'testpassword'
+        }
+        self.url_name = 'authentications:async_login'
+
+    def test_view_can_login(self):
+        """
+        ログインできるかテスト
+        """
+        response = self.client.post(reverse(self.url_name), self.credentials, follow=True)
+        self.assertTrue(response.context['user'].is_authenticated)
+        self.assertTemplateUsed(response, 'posts/posts_list.html')
+
+    def test_redirect_to_login_page_if_password_is_wrong(self):
+        """
+        パスワードが違う時はログインページにリダイレクトするテスト
+        """
+        response = self.client.post(reverse(self.url_name), {
+            'email': 'test@mail.com', 'password': 'wrongpassword'
+        })
+        self.assertRedirects(response, reverse(self.url_name))
+
+    def test_authenticated_user_redirect_to_main_page(self):
+        """
+        ログイン済みのユーザーは投稿一覧ページにリダイレクトされるテスト
+        """
+        self.client.login(**self.credentials)
+        response = self.client.get(reverse(self.url_name))
+        self.assertRedirects(response, reverse('posts:list'))
+
+    def test_failed_login_sends_signal(self):
+        """
+        ログインに失敗した時は、同期のログインと同じくuser_login_failedを送るかテスト
+        """
+        handler = mock.Mock()
+        user_login_failed.connect(handler)
+        self.addCleanup(user_login_failed.disconnect, handler)
+        self.client.post(reverse(self.url_name), {'email': 'test@mail.com', 'password': 'wrongpassword'})
+        handler.assert_called_once()
+        self.assertEqual(handler.call_args.kwargs['credentials']['email'], 'test@mail.com')
+        self.assertNotIn('wrongpassword', handler.call_args.kwargs['credentials'].values())
+
+    def test_inactive_user_cannot_login(self):
+        """
+        無効なユーザーは、正しいパスワードでもログインできないかテスト
+        """
+        User.objects.filter(email='test@mail.com').update(is_active=False)
+        response = self.client.post(reverse(self.url_name), self.credentials)
+        self.assertRedirects(response, reverse(self.url_name))
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_password_is_rehashed_when_cost_profile_changes(self):
+        """
+        コストプロファイルが変わっていたらログイン時に再ハッシュされるテスト
+        """
+        old_password = User.objects.get(email='test@mail.com').password
+        with self.settings(PASSWORD_HASH_PROFILE='low'):
+            self.client.post(reverse(self.url_name), self.credentials)
+        new_password = User.objects.get(email='test@mail.com').password
+        self.assertNotEqual(old_password, new_password)
+        self.assertIn('$100000$', new_password)
+
@@ -8,6 +8,10 @@ app_name = 'authentications'
 urlpatterns = [ 
     path('signup/', views.AuthenticationsSignupView.as_view(), name='signup'),
     path('login/', views.AuthenticationsLoginView.as_view(), name='login'),
+    path('signup/async/', views.AuthenticationsAsyncSignupView.as_view(), name='async_signup'),
+    path('login/async/', views.AuthenticationsAsyncLoginView.as_view(), name='async_login'),
     path('logout/', views.AuthenticationsLogoutView.as_view(), name='logout'),
     path('profile/<int:pk>', views.UserProfileView.as_view(), name='profile'),
+    path('profile/<int:pk>/follow', views.FollowUserView.as_view(), name='follow'),
+    path('prefectures/follow', views.FollowPrefectureView.as_view(), name='follow_prefecture'),
 ]
\ No newline at end of file
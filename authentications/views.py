@@ -1,10 +1,22 @@
-from django.shortcuts import render, redirect
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.shortcuts import get_object_or_404, render, redirect
 from django.views.generic import FormView, View, DetailView
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth import get_user_model
-from django.contrib.auth.mixins import UserPassesTestMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.http import HttpResponseBadRequest
+from django.urls import reverse
+from django.utils.http import urlencode
 
+from .backends import aauthenticate
 from .forms import UserCreationForm, UserLoginForm
+from .hashers import amake_password
+from .models import Follow
+from posts import timeline
+from posts.prefectures import PREFECTURE_ID
+from posts.stats import get_user_stats
 
 
 User = get_user_model()
@@ -23,6 +35,18 @@ class UnauthenticatedOnly(UserPassesTestMixin):
         return redirect('posts:list')
 
 
+class AsyncUnauthenticatedOnly:
+    """
+    UnauthenticatedOnlyの非同期ビュー版
+    """
+    async def dispatch(self, request, *args, **kwargs):
+        # セッションの読み込みはデータベースにアクセスするので同期で行う
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if is_authenticated:
+            return redirect('posts:list')
+        return await super().dispatch(request, *args, **kwargs)
+
+
 class AuthenticationsSignupView(UnauthenticatedOnly, FormView):
     """ 
     ユーザーの登録フォームをHTMLに渡す
@@ -69,6 +93,58 @@ class AuthenticationsLoginView(UnauthenticatedOnly ,FormView):
         return redirect('authentications:login')
 
 
+class AuthenticationsAsyncSignupView(AsyncUnauthenticatedOnly, View):
+    """
+    ユーザー登録の非同期版
+    パスワードのハッシュ計算をスレッドプールで行い、登録が集中してもワーカーを塞がない
+    """
+    template_name = 'authentications/authentications_signup.html'
+
+    async def get(self, request, *args, **kwargs):
+        context = {'form': UserCreationForm()}
+        return await sync_to_async(render)(request, self.template_name, context)
+
+    async def post(self, request, *args, **kwargs):
+        """
+        Postリクエスト時の処理
+        フォームの検証と保存は同期で行い、パスワードのハッシュ化だけをスレッドプールに任せる
+        """
+        user_form = UserCreationForm(request.POST)
+        if not await sync_to_async(user_form.is_valid)():
+            return await sync_to_async(render)(request, self.template_name, {'form': user_form})
+        # is_validの時点でフォームの値がインスタンスに入っている
+        user = user_form.instance
+        user.password = await amake_password(user_form.cleaned_data['password'])
+        await sync_to_async(user.save)()
+        await sync_to_async(login)(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
+        return redirect('posts:list')
+
+
+class AuthenticationsAsyncLoginView(AsyncUnauthenticatedOnly, View):
+    """
+    ログインの非同期版
+    パスワードの検証をスレッドプールで行い、コストが変わっていれば再ハッシュする
+    """
+    template_name = 'authentications/authentications_login.html'
+
+    async def get(self, request, *args, **kwargs):
+        context = {'form': UserLoginForm()}
+        return await sync_to_async(render)(request, self.template_name, context)
+
+    async def post(self, request, *args, **kwargs):
+        """
+        Postリクエスト時の処理
+        見つかったらログインし、見つからなかったらログインページに戻す
+        """
+        user = await aauthenticate(
+            request, email=request.POST.get('email'), password=request.POST.get('password')
+        )
+        if user is not None:
+            await sync_to_async(login)(request, user)
+            return redirect('posts:list')
+        return redirect('authentications:async_login')
+
+
 class AuthenticationsLogoutView(View):
     """
     ログアウト機能 HTMLファイルはなし
@@ -84,15 +160,54 @@ class UserProfileView(DetailView):
     """
     model = User
     template_name = 'authentications/user_profile.html'
+    paginate_by = 10
 
     def get(self, request, pk):
         """ 
-        ユーザーとそのユーザーの全ての投稿を返す
+        ユーザーとそのユーザーの投稿をページごとに返す
+        投稿数などの集計値は保存済みの集計テーブルから取得する
         """
-        user = User.objects.get(id=pk)
-        user_posts = user.post_set.all()
+        user = get_object_or_404(User, id=pk, deleted_at__isnull=True)
+        user_posts = user.post_set.select_related('skatepark').order_by('-created_at', '-id')
+        page_obj = Paginator(user_posts, self.paginate_by).get_page(request.GET.get('page'))
         context = {
             'user': user,
-            'posts': user_posts
+            'posts': page_obj,
+            'page_obj': page_obj,
+            'stats': get_user_stats(user),
+            'can_follow': request.user.is_authenticated and request.user.id != user.id,
+            'is_following': (
+                request.user.is_authenticated
+                and Follow.objects.filter(follower=request.user, followee=user).exists()
+            ),
         }
-        return render(request, self.template_name, context)
\ No newline at end of file
+        return render(request, self.template_name, context)
+
+
+class FollowUserView(LoginRequiredMixin, View):
+    """
+    ユーザーをフォローする、フォロー済みの時はフォローをやめる
+    """
+    def post(self, request, pk):
+        followee = get_object_or_404(User, id=pk, deleted_at__isnull=True)
+        if followee.id != request.user.id:
+            if Follow.objects.filter(follower=request.user, followee=followee).exists():
+                timeline.unfollow_user(request.user, followee)
+            else:
+                timeline.follow_user(request.user, followee)
+        return redirect('authentications:profile', pk=pk)
+
+
+class FollowPrefectureView(LoginRequiredMixin, View):
+    """
+    都道府県をフォローする、フォロー済みの時はフォローをやめる
+    """
+    def post(self, request):
+        prefecture = request.POST.get('prefecture')
+        if prefecture not in PREFECTURE_ID:
+            return HttpResponseBadRequest('都道府県が正しくありません')
+        if request.user.prefecture_follows.filter(prefecture=prefecture).exists():
+            timeline.unfollow_prefecture(request.user, prefecture)
+        else:
+            timeline.follow_prefecture(request.user, prefecture)
+        return redirect(f"{reverse('posts:list')}?{urlencode({'query': prefecture})}")
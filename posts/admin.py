@@ -1,12 +1,17 @@
 from django.contrib import admin
 
-from .models import Post, Skatepark, Comment
+from sukeb.admin import EstimatedCountPaginator, IndexedSearchMixin
+
+from .deletion import soft_delete_post, soft_delete_posts
+from .models import Post, Skatepark, Comment, ForecastRecord, WeatherCity
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(IndexedSearchMixin, admin.ModelAdmin):
     # 投稿モデルの表示に使用されるフィールド
-    list_display = ('author', 'skatepark', 'body',)
+    list_display = ('author', 'skatepark', 'body', 'created_at')
+    # 投稿者とスケートパークを1回のJOINで読み込む
+    list_select_related = ('author', 'skatepark')
     fieldsets = (
         ('投稿', {
             'fields': (
@@ -14,11 +19,32 @@ class PostAdmin(admin.ModelAdmin):
             )
         }),
     )
-     # 1つのフィールドでユーザーを絞り込む
-    list_filter = ('author',)
+    # 投稿者は全ユーザーを選択肢に読み込まないように、IDで指定する
+    raw_id_fields = ('author', 'skatepark')
+    # 投稿日の範囲で絞り込む、date_hierarchyは選択肢を全ての行の日付から集めるので使わない
+    list_filter = ('created_at',)
 
-    # 検索される時に使われるフィールド
-    search_fields = ('author', 'skatepark',)
+    # 件数はCOUNT(*)で数えずに見積もる
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # 検索される時に使われるフィールド、投稿者のメールアドレスとパーク名の前方一致で探す
+    search_fields = ('author__email', 'skatepark__name')
+    search_email_field = 'author__email'
+    search_prefix_field = 'skatepark__name'
+    search_help_text = '投稿者のメールアドレスか、パーク名の先頭で検索します'
+
+    def get_deleted_objects(self, objs, request):
+        # 削除済みにするだけなので、関連するオブジェクトを全て集めずに選んだものだけを表示する
+        perms_needed = set() if self.has_delete_permission(request) else {self.model._meta.verbose_name}
+        return [str(obj) for obj in objs], {self.model._meta.verbose_name_plural: len(objs)}, perms_needed, []
+
+    def delete_model(self, request, obj):
+        # 削除済みにするだけで、コメントなどはpurge_deletedコマンドが削除する
+        soft_delete_post(obj)
+
+    def delete_queryset(self, request, queryset):
+        soft_delete_posts(queryset)
 
 
 @admin.register(Skatepark)
@@ -31,6 +57,8 @@ class LocationAdmin(admin.ModelAdmin):
                 'prefecture',
                 'city',
                 'skatepark_image',
+                'latitude',
+                'longitude',
             )
         }),
     )
@@ -42,8 +70,9 @@ class LocationAdmin(admin.ModelAdmin):
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ('post', 'author', 'body', 'created_at')
+    list_select_related = ('post', 'author')
     fieldsets = (
         ('コメント', {
             'fields': (
@@ -53,5 +82,28 @@ class CommentAdmin(admin.ModelAdmin):
             )
         }),
     )
-    list_filter = ('author', 'created_at', )
-    search_fields = ('author',)
\ No newline at end of file
+    raw_id_fields = ('post', 'author')
+    list_filter = ('created_at',)
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # コメントした人のメールアドレスと、投稿のパーク名の前方一致で探す
+    search_fields = ('author__email', 'post__skatepark__name')
+    search_email_field = 'author__email'
+    search_prefix_field = 'post__skatepark__name'
+    search_help_text = 'コメントした人のメールアドレスか、パーク名の先頭で検索します'
+
+
+@admin.register(WeatherCity)
+class WeatherCityAdmin(admin.ModelAdmin):
+    list_display = ('name', 'prefecture', 'city_code')
+    list_filter = ('prefecture',)
+    search_fields = ('name', 'city_code')
+
+
+@admin.register(ForecastRecord)
+class ForecastRecordAdmin(admin.ModelAdmin):
+    list_display = ('city_code', 'fetched_at', 'telop')
+    list_filter = ('fetched_at',)
+    search_fields = ('city_code',)
\ No newline at end of file
@@ -0,0 +1,254 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.generic import View
+
+from .clusters import CLUSTER_GRID, CLUSTER_MAX_ZOOM
+from .geo import nearby_skateparks
+from .models import Comment, Post, Skatepark, SkateparkCluster
+from .pagination import decode_cursor, encode_cursor
+from .prefectures import PREFECTURE_CHOICES
+
+
+def skatepark_image_url(name):
+    """
+    データベースに保存されている画像のパスをURLに変換する
+    """
+    if not name:
+        return None
+    return Skatepark._meta.get_field('skatepark_image').storage.url(name)
+
+
+class ReadOnlyApiView(View):
+    """
+    読み取り専用のJSON APIの基底クラス
+    fieldsパラメーターで返す項目を選べて、cursorパラメーターで次のページを取得する
+    モデルのインスタンスは作らず、values_listの結果を少しずつJSONにして返す
+    """
+    model = None
+    # 公開する項目名とORMのパスの対応
+    fields = {}
+    # fieldsパラメーターがない時に返す項目
+    default_fields = ()
+    # 値を変換してから返す項目
+    transforms = {}
+    page_size = 20
+    max_page_size = 100
+    chunk_size = 100
+
+    def get(self, request, *args, **kwargs):
+        try:
+            fields = self.get_fields()
+            limit = self.get_limit()
+            cursor = self.request.GET.get('cursor')
+            queryset = self.filter_queryset(self.model.objects.all())
+            if cursor:
+                queryset = queryset.filter(id__lt=decode_cursor(cursor))
+        except ValueError as err:
+            return JsonResponse({'error': str(err)}, status=400)
+        # 次のページがあるか判定するため1件多く取得する
+        rows = (
+            queryset.order_by('-id')
+            .values_list('id', *(self.fields[name] for name in fields))[:limit + 1]
+        )
+        return StreamingHttpResponse(
+            self.stream(rows, fields, limit), content_type='application/json'
+        )
+
+    def get_fields(self):
+        """
+        fieldsパラメーターをカンマで区切り、公開している項目だけを返す
+        """
+        requested = self.request.GET.get('fields')
+        if not requested:
+            return list(self.default_fields)
+        fields = [name.strip() for name in requested.split(',') if name.strip()]
+        unknown = [name for name in fields if name not in self.fields]
+        if unknown:
+            raise ValueError(f"不明なfieldsです: {', '.join(unknown)}")
+        return fields
+
+    def get_limit(self):
+        """
+        limitパラメーターを1以上max_page_size以下の整数にして返す
+        """
+        limit = self.request.GET.get('limit')
+        if limit is None:
+            return self.page_size
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError('limitは整数で指定してください')
+        return max(1, min(limit, self.max_page_size))
+
+    def filter_queryset(self, queryset):
+        """
+        リクエストパラメーターで絞り込む、サブクラスで上書きする
+        """
+        return queryset
+
+    def stream(self, rows, fields, limit):
+        """
+        1件ずつJSONに変換して返すジェネレーター
+        """
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        yield '{"results":['
+        last_id = None
+        has_next = False
+        for index, (pk, *values) in enumerate(rows.iterator(chunk_size=self.chunk_size)):
+            if index == limit:
+                has_next = True
+                break
+            item = {}
+            for name, value in zip(fields, values):
+                transform = self.transforms.get(name)
+                item[name] = transform(value) if transform else value
+            yield (',' if index else '') + encoder.encode(item)
+            last_id = pk
+        next_cursor = encode_cursor(last_id) if has_next else None
+        yield '],"next":' + json.dumps(next_cursor) + '}'
+
+
+class PostsApiView(ReadOnlyApiView):
+    """
+    投稿一覧のAPI
+    queryパラメーターで投稿一覧ページと同じように県名で絞り込める
+    """
+    model = Post
+    fields = {
+        'id': 'id',
+        'body': 'body',
+        'created_at': 'created_at',
+        'author_id': 'author_id',
+        'author': 'author__username',
+        'skatepark_id': 'skatepark_id',
+        'skatepark': 'skatepark__name',
+        'prefecture': 'skatepark__prefecture',
+        'city': 'skatepark__city',
+        'image': 'skatepark__skatepark_image',
+    }
+    default_fields = ('id', 'body', 'created_at', 'author', 'skatepark', 'prefecture')
+    transforms = {'image': skatepark_image_url}
+
+    def filter_queryset(self, queryset):
+        query_keyword = self.request.GET.get('query')
+        if query_keyword:
+            queryset = queryset.filter_prefecture(query_keyword)
+        return queryset
+
+
+class SkateparksApiView(ReadOnlyApiView):
+    """
+    スケートパーク一覧のAPI
+    """
+    model = Skatepark
+    fields = {
+        'id': 'id',
+        'name': 'name',
+        'prefecture': 'prefecture',
+        'city': 'city',
+        'image': 'skatepark_image',
+        'latitude': 'latitude',
+        'longitude': 'longitude',
+    }
+    default_fields = ('id', 'name', 'prefecture', 'city')
+    transforms = {'image': skatepark_image_url}
+
+    def filter_queryset(self, queryset):
+        query_keyword = self.request.GET.get('query')
+        if query_keyword:
+            # 完全一致にして、(prefecture, id)のインデックスを使う
+            queryset = queryset.filter(prefecture=query_keyword)
+        return queryset
+
+
+class NearbySkateparksApiView(View):
+    """
+    指定した地点から近い順にスケートパークを返すAPI
+    latとlngパラメーターで地点を、kパラメーターで件数を指定する
+    """
+    default_k = 10
+    max_k = 50
+
+    def get(self, request, *args, **kwargs):
+        try:
+            latitude = float(request.GET['lat'])
+            longitude = float(request.GET['lng'])
+            k = int(request.GET.get('k', self.default_k))
+        except (KeyError, ValueError):
+            return JsonResponse({'error': 'latとlngを数値で指定してください'}, status=400)
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return JsonResponse({'error': 'latとlngが範囲外です'}, status=400)
+        k = max(1, min(k, self.max_k))
+        results = [
+            dict(skatepark, distance_km=round(distance, 3))
+            for distance, skatepark in nearby_skateparks(latitude, longitude, k=k)
+        ]
+        return JsonResponse({'results': results}, json_dumps_params={'ensure_ascii': False})
+
+
+class ClustersApiView(View):
+    """
+    地図の1タイル分のスケートパークのクラスタを返すAPI
+    事前に集計したテーブルから、インデックスを使う1回のクエリで取得する
+    """
+    def get(self, request, zoom, x, y):
+        if zoom > CLUSTER_MAX_ZOOM or x >= 2 ** zoom or y >= 2 ** zoom:
+            return JsonResponse({'error': 'タイルが範囲外です'}, status=404)
+        rows = SkateparkCluster.objects.filter(zoom=zoom, tile_x=x, tile_y=y).values_list(
+            'cell', 'count', 'latitude_sum', 'longitude_sum'
+        )
+        clusters = [
+            {
+                'cell': cell,
+                'count': count,
+                'latitude': latitude_sum / count,
+                'longitude': longitude_sum / count,
+            }
+            for cell, count, latitude_sum, longitude_sum in rows
+        ]
+        response = JsonResponse({
+            'zoom': zoom, 'x': x, 'y': y, 'grid': CLUSTER_GRID, 'clusters': clusters,
+        })
+        response['Cache-Control'] = 'public, max-age=60'
+        return response
+
+
+class CommentsApiView(ReadOnlyApiView):
+    """
+    コメント一覧のAPI
+    postパラメーターで投稿ごとに絞り込める
+    """
+    model = Comment
+    fields = {
+        'id': 'id',
+        'body': 'body',
+        'created_at': 'created_at',
+        'author_id': 'author_id',
+        'author': 'author__username',
+        'post_id': 'post_id',
+    }
+    default_fields = ('id', 'body', 'created_at', 'author', 'post_id')
+
+    def filter_queryset(self, queryset):
+        # 削除済みの投稿のコメントは、削除されるまでの間も返さない
+        queryset = queryset.filter(post__deleted_at__isnull=True)
+        post_id = self.request.GET.get('post')
+        if post_id:
+            try:
+                queryset = queryset.filter(post_id=int(post_id))
+            except ValueError:
+                raise ValueError('postは整数で指定してください')
+        return queryset
+
+
+class PrefecturesApiView(View):
+    """
+    都道府県一覧のAPI
+    """
+    def get(self, request, *args, **kwargs):
+        results = [{'name': name} for name, _ in PREFECTURE_CHOICES]
+        return JsonResponse(
+            {'results': results, 'next': None}, json_dumps_params={'ensure_ascii': False}
+        )
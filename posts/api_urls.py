@@ -0,0 +1,15 @@
+from django.urls import path
+
+from . import api
+
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', api.PostsApiView.as_view(), name='posts'),
+    path('skateparks/', api.SkateparksApiView.as_view(), name='skateparks'),
+    path('skateparks/nearby/', api.NearbySkateparksApiView.as_view(), name='skateparks_nearby'),
+    path('clusters/<int:zoom>/<int:x>/<int:y>/', api.ClustersApiView.as_view(), name='clusters'),
+    path('comments/', api.CommentsApiView.as_view(), name='comments'),
+    path('prefectures/', api.PrefecturesApiView.as_view(), name='prefectures'),
+]
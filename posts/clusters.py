@@ -0,0 +1,144 @@
+import math
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+
+# クラスタを事前に集計する最大のズームレベル
+CLUSTER_MAX_ZOOM = 16
+# 1タイルを縦横いくつのマスに分けてクラスタにするか
+CLUSTER_GRID = 8
+# Webメルカトル図法で表示できる緯度の上限
+MAX_LATITUDE = 85.05112878
+# 1回のINSERT ... ON CONFLICTで書き込むクラスタの数の上限
+UPSERT_BATCH_SIZE = 1000
+
+
+def cluster_key(latitude, longitude, zoom):
+    """
+    緯度経度が含まれるタイルとタイル内のマスを返す
+
+    引数:
+        latitude (float): 緯度
+        longitude (float): 経度
+        zoom (int): ズームレベル
+    戻り値:
+        tuple: (ズームレベル, タイルのx, タイルのy, タイル内のマス番号)
+    """
+    latitude = max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude))
+    size = (2 ** zoom) * CLUSTER_GRID
+    x = (longitude + 180) / 360
+    phi = math.radians(latitude)
+    y = (1 - math.log(math.tan(phi) + 1 / math.cos(phi)) / math.pi) / 2
+    cell_x = min(int(x * size), size - 1)
+    cell_y = min(int(y * size), size - 1)
+    return (
+        zoom,
+        cell_x // CLUSTER_GRID,
+        cell_y // CLUSTER_GRID,
+        (cell_y % CLUSTER_GRID) * CLUSTER_GRID + cell_x % CLUSTER_GRID,
+    )
+
+
+def _deltas(locations, sign):
+    """
+    緯度経度のリストから、クラスタごとの件数と緯度経度の合計の差分を集計する
+    """
+    deltas = defaultdict(lambda: [0, 0.0, 0.0])
+    for latitude, longitude in locations:
+        if latitude is None or longitude is None:
+            continue
+        for zoom in range(CLUSTER_MAX_ZOOM + 1):
+            delta = deltas[cluster_key(latitude, longitude, zoom)]
+            delta[0] += sign
+            delta[1] += sign * latitude
+            delta[2] += sign * longitude
+    return deltas
+
+
+def _apply(deltas):
+    """
+    クラスタごとの差分を、INSERT ... ON CONFLICT DO UPDATEでまとめて足す
+    件数が0以下になったクラスタは削除する
+    """
+    from .models import SkateparkCluster
+
+    if not deltas:
+        return
+    rows = [
+        (zoom, tile_x, tile_y, cell, count, latitude_sum, longitude_sum)
+        for (zoom, tile_x, tile_y, cell), (count, latitude_sum, longitude_sum) in deltas.items()
+    ]
+    quote = connection.ops.quote_name
+    table = quote(SkateparkCluster._meta.db_table)
+    columns = ['zoom', 'tile_x', 'tile_y', 'cell', 'count', 'latitude_sum', 'longitude_sum']
+    sums = ', '.join(
+        f'{quote(column)} = {table}.{quote(column)} + EXCLUDED.{quote(column)}' for column in columns[4:]
+    )
+    batch_size = min(UPSERT_BATCH_SIZE, connection.ops.bulk_batch_size(columns, rows))
+    placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(quote(column) for column in columns)}) '
+                f'VALUES {", ".join([placeholder] * len(batch))} '
+                f'ON CONFLICT ({", ".join(quote(column) for column in columns[:4])}) DO UPDATE SET {sums}',
+                [value for row in batch for value in row],
+            )
+        # 件数が減ったクラスタのうち、0以下になったものを削除する
+        decreased = [key for key, (count, _, _) in deltas.items() if count < 0]
+        # ORの数が多すぎるとSQLiteの式の深さの上限を超えるので、100件ずつにする
+        for start in range(0, len(decreased), 100):
+            keys = Q()
+            for zoom, tile_x, tile_y, cell in decreased[start:start + 100]:
+                keys |= Q(zoom=zoom, tile_x=tile_x, tile_y=tile_y, cell=cell)
+            SkateparkCluster.objects.filter(keys, count__lte=0).delete()
+
+
+def add_locations(locations):
+    """
+    スケートパークの緯度経度をクラスタに追加する
+    bulk_createで登録した時は、登録したスケートパークをまとめて渡す
+
+    引数:
+        locations (iterable): (緯度, 経度)のタプル
+    """
+    _apply(_deltas(locations, 1))
+
+
+def remove_locations(locations):
+    """
+    スケートパークの緯度経度をクラスタから取り除く
+
+    引数:
+        locations (iterable): (緯度, 経度)のタプル
+    """
+    _apply(_deltas(locations, -1))
+
+
+def rebuild_clusters(chunk_size=2000):
+    """
+    全てのスケートパークからクラスタを作り直す
+    """
+    from .models import Skatepark, SkateparkCluster
+
+    with transaction.atomic():
+        SkateparkCluster.objects.all().delete()
+        locations = (
+            Skatepark.objects.filter(latitude__isnull=False, longitude__isnull=False)
+            .values_list('latitude', 'longitude')
+            .iterator(chunk_size=chunk_size)
+        )
+        deltas = _deltas(locations, 1)
+        SkateparkCluster.objects.bulk_create(
+            (
+                SkateparkCluster(
+                    zoom=zoom, tile_x=tile_x, tile_y=tile_y, cell=cell,
+                    count=count, latitude_sum=latitude_sum, longitude_sum=longitude_sum,
+                )
+                for (zoom, tile_x, tile_y, cell), (count, latitude_sum, longitude_sum) in deltas.items()
+            ),
+            batch_size=chunk_size,
+        )
@@ -0,0 +1,249 @@
+"""
+コメントをいったんファイルに溜めて、まとめてデータベースに書き込む
+
+受け付けたコメントはCOMMENT_BUFFER_DIRに1件1ファイルで置く
+ファイル名の先頭は受け付けた時刻なので、名前の順に書き込めば同じ人のコメントの順番が変わらない
+書き込みはロックを取れた1つのプロセスだけが行い、bulk_createで書き込んでからファイルを消す
+プロセスが落ちてもファイルは残り、次に書き込むプロセスかflush_commentsコマンドが書き込む
+読めないファイルはQUARANTINE_DIRに移し、他のコメントの書き込みを止めない
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = '.lock'
+SUFFIX = '.json'
+# 読めないファイルを移すサブディレクトリ
+QUARANTINE_DIR = 'quarantine'
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def accept(post_id, author_id, body):
+    """
+    コメントを受け付けてファイルに書き込む
+    データベースには書き込まないので、検証済みのコメントを渡す
+
+    引数:
+        post_id (int): 投稿のID
+        author_id (int): コメントした人のID
+        body (str): コメント内容
+    戻り値:
+        str: 受付ID
+    """
+    buffer_id = uuid.uuid4().hex
+    directory = settings.COMMENT_BUFFER_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = f'{time.time_ns():020d}-{buffer_id}'
+    temporary_path = os.path.join(directory, f'.{name}.tmp')
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        json.dump(
+            {
+                'buffer_id': buffer_id, 'post_id': post_id, 'author_id': author_id, 'body': body,
+                'created_at': timezone.now().isoformat(),
+            },
+            f, ensure_ascii=False,
+        )
+    # 書き終わってから名前を変え、書き込み途中のファイルを読まないようにする
+    # プロセスが落ちてもOSに渡した内容は残るので、fsyncはしない
+    os.replace(temporary_path, os.path.join(directory, name + SUFFIX))
+    start_flusher()
+    return buffer_id
+
+
+def pending_names(directory):
+    """
+    書き込み待ちのファイル名を受け付けた順に返す
+    """
+    return sorted(name for name in os.listdir(directory) if name.endswith(SUFFIX))
+
+
+@contextmanager
+def spool_lock(directory, blocking=True):
+    """
+    書き込むプロセスを1つにするためのロック
+    ロックを取れた時はTrue、blockingがFalseで他のプロセスが持っている時はFalseを渡す
+    """
+    with open(os.path.join(directory, LOCK_NAME), 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def read_entry(directory, name):
+    """
+    ファイルのコメントを読み込み、書き込みに必要な値を揃えて返す
+    受付時刻を書いていない古いファイルは、ファイル名の時刻を受付時刻にする
+
+    例外:
+        ValueError, KeyError, TypeError: ファイルが壊れている時
+    """
+    with open(os.path.join(directory, name), encoding='utf-8') as f:
+        entry = json.load(f)
+    if not isinstance(entry, dict):
+        raise TypeError(f'コメントのファイルの中身がオブジェクトではありません: {type(entry).__name__}')
+    if 'created_at' in entry:
+        created_at = datetime.fromisoformat(entry['created_at'])
+    else:
+        created_at = datetime.fromtimestamp(int(name.split('-')[0]) / 1e9, tz=timezone.utc)
+    return {
+        'buffer_id': uuid.UUID(entry['buffer_id']),
+        'post_id': int(entry['post_id']),
+        'author_id': int(entry['author_id']),
+        'body': str(entry['body']),
+        'created_at': created_at,
+    }
+
+
+def quarantine(directory, name):
+    """
+    読めないファイルを書き込み待ちから外して、QUARANTINE_DIRに移す
+    """
+    quarantine_directory = os.path.join(directory, QUARANTINE_DIR)
+    os.makedirs(quarantine_directory, exist_ok=True)
+    os.replace(os.path.join(directory, name), os.path.join(quarantine_directory, name))
+
+
+def write_batch(directory, names):
+    """
+    ファイルのコメントを1回のbulk_createで書き込み、comments_createdを1回だけ送る
+    書き込み済みのコメントと、投稿かコメントした人が削除されたコメントは書き込まない
+    読めないファイルはquarantineで移し、残りのコメントを書き込む
+
+    引数:
+        directory (str): ファイルを置いているディレクトリ
+        names (list): 書き込むファイル名
+    戻り値:
+        int: 書き込んだ件数
+    """
+    from authentications.models import User
+
+    from .models import Comment, Post
+    from .signals import comments_created
+
+    entries = []
+    valid_names = []
+    for name in names:
+        try:
+            entries.append(read_entry(directory, name))
+        except (ValueError, KeyError, TypeError):
+            logger.exception('読めないコメントのファイル%sを%sに移しました', name, QUARANTINE_DIR)
+            quarantine(directory, name)
+            continue
+        valid_names.append(name)
+    written = set(
+        Comment.objects.filter(buffer_id__in=[entry['buffer_id'] for entry in entries])
+        .values_list('buffer_id', flat=True)
+    )
+    post_ids = set(
+        Post.objects.filter(id__in={entry['post_id'] for entry in entries}).values_list('id', flat=True)
+    )
+    # コメントを配る時に名前を使うので、コメントした人もここでまとめて読み込む
+    authors = User.objects.in_bulk({entry['author_id'] for entry in entries})
+    accepted = []
+    for entry in entries:
+        if entry['buffer_id'] in written:
+            continue
+        if entry['post_id'] not in post_ids or entry['author_id'] not in authors:
+            logger.warning(
+                '投稿かコメントした人が削除されたため、コメント%sを書き込みませんでした'
+                '(post_id=%s, author_id=%s)',
+                entry['buffer_id'], entry['post_id'], entry['author_id'],
+            )
+            continue
+        accepted.append(entry)
+    entries = accepted
+    comments = [
+        Comment(
+            buffer_id=entry['buffer_id'], post_id=entry['post_id'],
+            author=authors[entry['author_id']], body=entry['body'],
+        )
+        for entry in entries
+    ]
+    with transaction.atomic():
+        Comment.objects.bulk_create(comments)
+        if any(comment.pk is None for comment in comments):
+            # INSERTでIDを返せないデータベースでは、受付IDで読み直す
+            ids = dict(
+                Comment.objects.filter(buffer_id__in=[comment.buffer_id for comment in comments])
+                .values_list('buffer_id', 'id')
+            )
+            for comment in comments:
+                comment.pk = ids[uuid.UUID(str(comment.buffer_id))]
+        if comments:
+            # auto_now_addで書き込んだ時刻になるので、受け付けた時刻に戻す
+            for comment, entry in zip(comments, entries):
+                comment.created_at = entry['created_at']
+            Comment.objects.bulk_update(comments, ['created_at'])
+            comments_created.send(sender=Comment, comments=comments)
+    # コミットしてから消す、消す前に落ちた時は受付IDで重複を除いて書き込み直す
+    for name in valid_names:
+        os.remove(os.path.join(directory, name))
+    return len(comments)
+
+
+def flush(blocking=True):
+    """
+    溜まっているコメントをCOMMENT_BUFFER_BATCH_SIZE件ずつ書き込む
+
+    引数:
+        blocking (bool): 他のプロセスが書き込んでいる時に待つか、Falseの時は何もしない
+    戻り値:
+        int: 書き込んだ件数
+    """
+    directory = settings.COMMENT_BUFFER_DIR
+    if not os.path.isdir(directory):
+        return 0
+    written = 0
+    with spool_lock(directory, blocking) as locked:
+        if not locked:
+            return 0
+        while True:
+            names = pending_names(directory)[:settings.COMMENT_BUFFER_BATCH_SIZE]
+            if not names:
+                return written
+            written += write_batch(directory, names)
+
+
+def start_flusher():
+    """
+    COMMENT_BUFFER_INTERVAL秒ごとに書き込むスレッドをプロセスごとに1つ起動する
+    0以下の時は起動せず、flush_commentsコマンドで書き込む
+    """
+    global _flusher
+    if settings.COMMENT_BUFFER_INTERVAL <= 0:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=run_flusher, name='comment-buffer-flusher', daemon=True)
+            _flusher.start()
+
+
+def run_flusher():
+    while True:
+        time.sleep(settings.COMMENT_BUFFER_INTERVAL)
+        try:
+            close_old_connections()
+            flush(blocking=False)
+        except Exception:
+            logger.exception('コメントの書き込みに失敗しました')
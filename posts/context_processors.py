@@ -0,0 +1,18 @@
+from django.utils.functional import SimpleLazyObject
+
+from .notifications import unread_count
+
+
+def notifications(request):
+    """
+    ヘッダーに表示する未読の通知の件数をテンプレートに渡す
+    ログインしているかの判定も含めて、テンプレートで使われた時に行う
+    ヘッダーのない投稿カードだけのページでは、セッションもキャッシュも読まず、Vary: Cookieもつかない
+    """
+    def count():
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return 0
+        return unread_count(user)
+
+    return {'unread_notification_count': SimpleLazyObject(count)}
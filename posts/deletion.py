@@ -0,0 +1,177 @@
+"""
+投稿とユーザーの削除
+
+画面からの削除は削除済みの印をつけるだけにしてすぐに返し、
+コメント、スケートパーク、画像ファイルの削除はpurge_deletedコマンドが少しずつ行う
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from authentications.models import User
+
+from . import stats
+from .models import Comment, Post, Skatepark
+
+
+logger = logging.getLogger(__name__)
+
+
+def soft_delete_post(post):
+    """
+    投稿を削除済みにする、投稿者の集計値はこの時に更新する
+    """
+    post.deleted_at = timezone.now()
+    post.save(update_fields=['deleted_at'])
+    stats.record_post_deleted(post)
+
+
+def soft_delete_posts(queryset):
+    """
+    querysetの投稿を1回のUPDATEで削除済みにし、投稿者の集計値は投稿者ごとに1回だけ更新する
+
+    戻り値:
+        int: 削除済みにした件数
+    """
+    with transaction.atomic():
+        rows = list(
+            queryset.filter(deleted_at__isnull=True).values_list('id', 'author_id', 'skatepark__prefecture')
+        )
+        Post.all_objects.filter(id__in=[post_id for post_id, _, _ in rows]).update(deleted_at=timezone.now())
+        stats.record_posts_deleted([(author_id, prefecture) for _, author_id, prefecture in rows])
+    return len(rows)
+
+
+def soft_delete_user(user):
+    """
+    ユーザーを退会済みにしてログインできなくし、ユーザーの投稿も削除済みにする
+    """
+    now = timezone.now()
+    user.is_active = False
+    user.deleted_at = now
+    user.save(update_fields=['is_active', 'deleted_at'])
+    Post.objects.filter(author=user).update(deleted_at=now)
+
+
+def delete_in_batches(queryset, batch_size):
+    """
+    querysetの行をIDの順にbatch_size件ずつ削除する
+    1回のDELETEでロックする行と、シグナルのために読み込む行をbatch_size件までにする
+
+    戻り値:
+        int: 削除した件数
+    """
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic(), stats.grouped_comment_deletes():
+            queryset.filter(id__in=ids).delete()
+        deleted += len(ids)
+
+
+def delete_unused_images(names):
+    """
+    どのスケートパークも使っていない画像ファイルをストレージから削除する
+
+    戻り値:
+        int: 削除したファイルの数
+    """
+    names = {name for name in names if name}
+    names -= set(Skatepark.objects.filter(skatepark_image__in=names).values_list('skatepark_image', flat=True))
+    storage = Skatepark._meta.get_field('skatepark_image').storage
+    deleted = 0
+    for name in sorted(names):
+        try:
+            storage.delete(name)
+            deleted += 1
+        except OSError:
+            logger.exception('画像ファイル%sを削除できませんでした', name)
+    return deleted
+
+
+def purge_posts(batch_size):
+    """
+    削除済みの投稿を、コメント、スケートパーク、画像ファイルと一緒にbatch_size件ずつ削除する
+
+    戻り値:
+        tuple: (削除した投稿の数, 削除した画像ファイルの数)
+    """
+    purged = 0
+    images = 0
+    deleted_posts = Post.all_objects.filter(deleted_at__isnull=False)
+    while True:
+        rows = list(
+            deleted_posts.order_by('id')
+            .values_list('id', 'skatepark_id', 'skatepark__skatepark_image')[:batch_size]
+        )
+        if not rows:
+            return purged, images
+        post_ids = [post_id for post_id, _, _ in rows]
+        delete_in_batches(Comment.objects.filter(post_id__in=post_ids), batch_size)
+        # 投稿はスケートパークのCASCADEで一緒に削除される
+        with transaction.atomic():
+            Skatepark.objects.filter(id__in=[skatepark_id for _, skatepark_id, _ in rows]).delete()
+        # コミットした後でファイルを消し、ロールバックした時に画像だけがなくなるのを防ぐ
+        images += delete_unused_images(image for _, _, image in rows)
+        purged += len(rows)
+
+
+def purge_users(batch_size):
+    """
+    退会済みのユーザーを、投稿とコメントをbatch_size件ずつ削除してから削除する
+
+    戻り値:
+        tuple: (削除したユーザーの数, 削除した投稿の数, 削除した画像ファイルの数)
+    """
+    users = list(User.objects.filter(deleted_at__isnull=False).values_list('id', 'deleted_at'))
+    for user_id, deleted_at in users:
+        # 退会した後に作られた投稿も削除済みにする
+        Post.objects.filter(author_id=user_id).update(deleted_at=deleted_at)
+    posts, images = purge_posts(batch_size)
+    for user_id, _ in users:
+        delete_in_batches(Comment.objects.filter(author_id=user_id), batch_size)
+        User.objects.filter(id=user_id).delete()
+    return len(users), posts, images
+
+
+def sweep_images(min_age):
+    """
+    どのスケートパークも使っていない画像ファイルを探して削除する
+    アップロードしてから保存するまでの間のファイルを消さないように、min_ageより古いファイルだけを対象にする
+
+    引数:
+        min_age (timedelta): 削除するファイルの最低限の古さ
+    戻り値:
+        int: 削除したファイルの数
+    """
+    field = Skatepark._meta.get_field('skatepark_image')
+    storage = field.storage
+    directory = field.upload_to.rstrip('/')
+    try:
+        _, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return 0
+    cutoff = timezone.now() - min_age
+    names = [
+        f'{directory}/{name}' for name in files
+        if storage.get_modified_time(f'{directory}/{name}') < cutoff
+    ]
+    return delete_unused_images(names)
+
+
+def purge_deleted(batch_size, sweep=False, min_age=timedelta(hours=1)):
+    """
+    削除済みのユーザーと投稿をまとめて削除する
+
+    戻り値:
+        dict: 削除したユーザー、投稿、画像ファイルの数
+    """
+    users, user_posts, user_images = purge_users(batch_size)
+    posts, images = purge_posts(batch_size)
+    if sweep:
+        images += sweep_images(min_age)
+    return {'users': users, 'posts': user_posts + posts, 'images': user_images + images}
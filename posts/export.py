@@ -0,0 +1,128 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Post
+
+
+POST_COLUMNS = (
+    ('id', 'id'),
+    ('body', 'body'),
+    ('created_at', 'created_at'),
+    ('author_id', 'author_id'),
+    ('author_username', 'author__username'),
+    ('author_email', 'author__email'),
+    ('skatepark_id', 'skatepark_id'),
+    ('skatepark_name', 'skatepark__name'),
+    ('skatepark_prefecture', 'skatepark__prefecture'),
+    ('skatepark_city', 'skatepark__city'),
+    ('skatepark_image', 'skatepark__skatepark_image'),
+    ('skatepark_latitude', 'skatepark__latitude'),
+    ('skatepark_longitude', 'skatepark__longitude'),
+)
+
+COMMENT_COLUMNS = (
+    ('id', 'id'),
+    ('body', 'body'),
+    ('created_at', 'created_at'),
+    ('author_id', 'author_id'),
+    ('author_username', 'author__username'),
+)
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def iter_posts_with_comments(chunk_size=2000):
+    """
+    全ての投稿を、スケートパーク、投稿者、コメントと一緒に1件ずつ返すジェネレーター
+    投稿はIDの順、コメントは投稿IDの順に2つのカーソルで読み込み、マージしながら返すので
+    件数が増えてもメモリに載るのは1件分の投稿とそのコメントだけになる
+
+    引数:
+        chunk_size (int): 1回のフェッチで読み込む行数
+    戻り値:
+        generator: (投稿のdict, コメントのdictのリスト)のタプル
+    """
+    posts = (
+        Post.objects.order_by('id')
+        .values_list(*(path for _, path in POST_COLUMNS))
+        .iterator(chunk_size=chunk_size)
+    )
+    comments = (
+        Comment.objects.order_by('post_id', 'id')
+        .values_list('post_id', *(path for _, path in COMMENT_COLUMNS))
+        .iterator(chunk_size=chunk_size)
+    )
+    pending = next(comments, None)
+    for row in posts:
+        post = dict(zip((name for name, _ in POST_COLUMNS), row))
+        post_comments = []
+        # 前の投稿までのコメントは読み飛ばし、この投稿のコメントだけを集める
+        while pending is not None and pending[0] <= post['id']:
+            if pending[0] == post['id']:
+                post_comments.append(dict(zip((name for name, _ in COMMENT_COLUMNS), pending[1:])))
+            pending = next(comments, None)
+        yield post, post_comments
+
+
+def iter_ndjson(rows):
+    """
+    1投稿を1行のJSONにして返す、コメントはcommentsにリストで入れる
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for post, comments in rows:
+        yield encoder.encode(dict(post, comments=comments)) + '\n'
+
+
+class Echo:
+    """
+    書き込まれた値をそのまま返す、csv.writerをジェネレーターで使うためのバッファ
+    """
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    """
+    1コメントを1行にして返す、投稿の列はコメントごとに繰り返す
+    コメントがない投稿はコメントの列を空にして1行だけ返す
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(
+        [f'post_{name}' for name, _ in POST_COLUMNS] + [f'comment_{name}' for name, _ in COMMENT_COLUMNS]
+    )
+    empty_comment = [''] * len(COMMENT_COLUMNS)
+    for post, comments in rows:
+        post_values = [_csv_value(value) for value in post.values()]
+        if not comments:
+            yield writer.writerow(post_values + empty_comment)
+        for comment in comments:
+            yield writer.writerow(post_values + [_csv_value(value) for value in comment.values()])
+
+
+def _csv_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def iter_export(export_format, chunk_size=2000):
+    """
+    指定した形式でエクスポートする文字列を少しずつ返す
+
+    引数:
+        export_format (str): csvかndjson
+        chunk_size (int): 1回のフェッチで読み込む行数
+    戻り値:
+        generator: 書き出す文字列
+    """
+    rows = iter_posts_with_comments(chunk_size=chunk_size)
+    if export_format == 'csv':
+        return iter_csv(rows)
+    if export_format == 'ndjson':
+        return iter_ndjson(rows)
+    raise ValueError(f'不明な形式です: {export_format}')
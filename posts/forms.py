@@ -35,6 +35,8 @@ class SkateparkForm(forms.ModelForm):
         self.fields['prefecture'].label = '都道府県'
         self.fields['city'].label = '市町村'
         self.fields['skatepark_image'].label = '写真'
+        self.fields['latitude'].label = '緯度'
+        self.fields['longitude'].label = '経度'
 
     name = forms.CharField(widget=forms.TextInput(
         attrs={
@@ -63,9 +65,30 @@ class SkateparkForm(forms.ModelForm):
         }
     ))
 
+    latitude = forms.FloatField(required=False, min_value=-90, max_value=90, widget=forms.NumberInput(
+        attrs={
+            'class': 'input mb-5',
+            'step': 'any',
+        }
+    ))
+
+    longitude = forms.FloatField(required=False, min_value=-180, max_value=180, widget=forms.NumberInput(
+        attrs={
+            'class': 'input mb-5',
+            'step': 'any',
+        }
+    ))
+
     class Meta:
         model = Skatepark
-        fields = ['name', 'prefecture', 'city', 'skatepark_image']
+        fields = ['name', 'prefecture', 'city', 'skatepark_image', 'latitude', 'longitude']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # 緯度と経度は両方入力するか、両方空にする
+        if (cleaned_data.get('latitude') is None) != (cleaned_data.get('longitude') is None):
+            raise forms.ValidationError('緯度と経度は両方入力してください')
+        return cleaned_data
 
     prefix = 'skatepark'
 
@@ -0,0 +1,91 @@
+import heapq
+import math
+
+
+# グリッドの1マスの大きさ(度)、緯度方向で約11km
+GRID_CELL_DEGREES = 0.1
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# 経度方向にこのマス数だけ広げると、全ての経度が含まれる
+MAX_LNG_RADIUS = math.ceil(180 / GRID_CELL_DEGREES)
+
+
+def grid_cell(latitude, longitude):
+    """
+    緯度経度が含まれるグリッドのマスを返す
+
+    引数:
+        latitude (float): 緯度
+        longitude (float): 経度
+    戻り値:
+        tuple: (緯度方向のマス番号, 経度方向のマス番号)
+    """
+    return (
+        math.floor(latitude / GRID_CELL_DEGREES),
+        math.floor(longitude / GRID_CELL_DEGREES),
+    )
+
+
+def haversine_km(latitude1, longitude1, latitude2, longitude2):
+    """
+    2点間の大円距離(km)を返す
+    """
+    phi1, phi2 = math.radians(latitude1), math.radians(latitude2)
+    delta_phi = phi2 - phi1
+    delta_lambda = math.radians(longitude2 - longitude1)
+    a = (
+        math.sin(delta_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _lng_radius(latitude, radius):
+    """
+    南北にradiusマス分の距離を、東西にも確実に含む経度方向のマス数を返す
+    経度方向のマスは高緯度ほど狭くなるので範囲の端の緯度で計算し、極に近い時は全ての経度にする
+    """
+    edge_latitude = min(abs(latitude) + radius * GRID_CELL_DEGREES, 90)
+    cos_latitude = math.cos(math.radians(edge_latitude))
+    if cos_latitude * MAX_LNG_RADIUS <= radius:
+        return MAX_LNG_RADIUS
+    return min(math.ceil(radius / cos_latitude), MAX_LNG_RADIUS)
+
+
+def nearby_skateparks(latitude, longitude, k=10, max_distance_km=200):
+    """
+    指定した地点から近い順にk件のスケートパークを返す
+    グリッドのマス番号のインデックスで周囲のマスだけを取り出し、その中で正確な距離を計算する
+    k件見つかり、k件目までの距離が検索した範囲に確実に含まれるまで範囲を広げる
+    範囲は南北の距離で倍にしていくので、極の近くでもmax_distance_kmに届くまで数回で終わる
+
+    引数:
+        latitude (float): 緯度
+        longitude (float): 経度
+        k (int): 返す件数
+        max_distance_km (float): これより遠いスケートパークは返さない
+    戻り値:
+        list: (距離km, スケートパークのdict)のタプルのリスト
+    """
+    from .models import Skatepark
+
+    center_lat, center_lng = grid_cell(latitude, longitude)
+    radius = 1
+    while True:
+        lng_radius = _lng_radius(latitude, radius)
+        rows = Skatepark.objects.filter(
+            grid_lat__range=(center_lat - radius, center_lat + radius),
+            grid_lng__range=(center_lng - lng_radius, center_lng + lng_radius),
+        ).values('id', 'name', 'prefecture', 'city', 'latitude', 'longitude')
+        candidates = (
+            (haversine_km(latitude, longitude, row['latitude'], row['longitude']), row)
+            for row in rows.iterator()
+        )
+        nearest = heapq.nsmallest(
+            k, (item for item in candidates if item[0] <= max_distance_km), key=lambda item: item[0]
+        )
+        # 南北はradiusマス分、東西はそれ以上の距離を含んでいる
+        covered_km = radius * GRID_CELL_DEGREES * KM_PER_DEGREE
+        if (len(nearest) == k and nearest[-1][0] <= covered_km) or covered_km >= max_distance_km:
+            return nearest
+        radius *= 2
@@ -0,0 +1,300 @@
+import asyncio
+import json
+import logging
+import re
+import select
+import threading
+import time
+from collections import defaultdict
+from importlib import import_module
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections, connection, connections
+from django.http import HttpRequest
+from django.http.cookie import parse_cookie
+
+
+logger = logging.getLogger(__name__)
+
+# 投稿ごとのコメントのイベントを返すURL
+EVENTS_PATH = re.compile(r'^/posts/detail/(?P<pk>\d+)/events$')
+# 接続が切れていないことを伝えるため、この間隔(秒)でコメント行を送る
+KEEPALIVE_SECONDS = 15
+# 再接続した時に、Last-Event-IDより後のコメントを最大何件送るか
+BACKLOG_SIZE = 100
+
+
+def database_sync_to_async(func):
+    """
+    ORMを使う関数をsync_to_asyncで呼べるようにする
+    リクエストの外で呼ばれるので、リクエストの前後と同じように、
+    呼ぶ前と後で古くなった接続やエラーになった接続を閉じる
+    """
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(wrapper)
+
+
+def comment_payload(comment):
+    """
+    コメントをイベントで送るdictに変換する
+    """
+    return {
+        'post_id': comment.post_id,
+        'id': comment.id,
+        'author': str(comment.author),
+        'body': comment.body,
+        'created_at': comment.created_at.isoformat(),
+    }
+
+
+class InMemoryBroker:
+    """
+    同じプロセスの購読者にコメントを配る
+    購読者ごとにasyncio.Queueを持ち、どのスレッドから配っても購読者のイベントループで受け取る
+    """
+    queue_size = 100
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, post_id):
+        """
+        投稿のコメントを受け取るキューを登録して返す
+        """
+        queue = asyncio.Queue(self.queue_size)
+        with self._lock:
+            self._subscribers[post_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, post_id, queue):
+        with self._lock:
+            subscribers = self._subscribers[post_id]
+            subscribers.difference_update({entry for entry in subscribers if entry[1] is queue})
+            if not subscribers:
+                del self._subscribers[post_id]
+
+    def publish(self, payload):
+        """
+        コメントを購読者に配る
+        """
+        self.dispatch(payload)
+
+    def dispatch(self, payload):
+        with self._lock:
+            subscribers = list(self._subscribers.get(payload['post_id'], ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._offer, queue, payload)
+
+    @staticmethod
+    def _offer(queue, payload):
+        # 受け取りが追いつかない購読者には送らず、再接続時のLast-Event-IDで補ってもらう
+        if not queue.full():
+            queue.put_nowait(payload)
+
+
+class PostgresBroker(InMemoryBroker):
+    """
+    PostgresのLISTEN/NOTIFYでコメントを配る
+    publishはNOTIFYを送るだけで、各ワーカーの1本のLISTEN用の接続が受け取り、
+    そのワーカーの購読者に配る
+    """
+    channel = 'sukeb_comments'
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def subscribe(self, post_id):
+        self._start_listener()
+        return super().subscribe(post_id)
+
+    def publish(self, payload):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, json.dumps(payload)])
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name='live-comments-listener', daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self):
+        """
+        LISTEN用の接続で通知を待ち、受け取ったコメントを購読者に配る
+        接続が切れた時は1秒待ってからつなぎ直す
+        """
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        params = connections['default'].get_connection_params()
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(**params)
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.channel}')
+                while True:
+                    if select.select([conn], [], [], KEEPALIVE_SECONDS) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self.dispatch(json.loads(notify.payload))
+            except Exception:
+                logger.exception('コメントの通知を受け取る接続が切れました')
+            finally:
+                # つなぎ直す前に、切れた接続を閉じる
+                if conn is not None:
+                    conn.close()
+            time.sleep(1)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """
+    設定に合わせたブローカーをプロセスごとに1つ作って返す
+    LIVE_COMMENTS_BROKERがpostgresならLISTEN/NOTIFY、memoryなら同じプロセス内だけで配る
+    指定しない時は、データベースがPostgresならLISTEN/NOTIFYを使う
+    """
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            name = settings.LIVE_COMMENTS_BROKER
+            if name is None:
+                name = 'postgres' if connections['default'].vendor == 'postgresql' else 'memory'
+            if name == 'postgres':
+                _broker = PostgresBroker()
+            else:
+                _broker = InMemoryBroker()
+        return _broker
+
+
+def format_event(payload):
+    return (
+        f"id: {payload['id']}\nevent: comment\n"
+        f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    ).encode()
+
+
+class LiveCommentsApplication:
+    """
+    投稿ごとに新しいコメントをServer-Sent Eventsで送るASGIアプリ
+    /posts/detail/<pk>/events以外のリクエストはDjangoのアプリに渡す
+    """
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            match = EVENTS_PATH.match(scope['path'])
+            if match:
+                return await self.stream(scope, receive, send, int(match['pk']))
+        return await self.application(scope, receive, send)
+
+    async def stream(self, scope, receive, send, post_id):
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        if not await self.is_authenticated(headers):
+            return await self.respond(send, 403)
+        from .models import Post
+        if not await database_sync_to_async(Post.objects.filter(pk=post_id).exists)():
+            return await self.respond(send, 404)
+
+        broker = get_broker()
+        # 取りこぼしがないように、バックログを読む前に購読を始める
+        queue = broker.subscribe(post_id)
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream; charset=utf-8'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            # 再接続の時はLast-Event-ID、最初の接続の時はページに表示したコメントのIDより後を送る
+            last_event_id = headers.get('last-event-id')
+            if last_event_id is None:
+                last_event_id = parse_qs(scope['query_string'].decode()).get('after', [None])[0]
+            last_id = await self.send_backlog(send, post_id, last_event_id)
+            disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+            try:
+                while True:
+                    received = asyncio.ensure_future(queue.get())
+                    done, _ = await asyncio.wait(
+                        {received, disconnected}, timeout=KEEPALIVE_SECONDS,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    if received not in done:
+                        received.cancel()
+                        if disconnected in done:
+                            break
+                        await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+                        continue
+                    payload = received.result()
+                    if payload['id'] <= last_id:
+                        continue
+                    await send({'type': 'http.response.body', 'body': format_event(payload), 'more_body': True})
+            finally:
+                disconnected.cancel()
+        finally:
+            broker.unsubscribe(post_id, queue)
+
+    async def send_backlog(self, send, post_id, last_event_id):
+        """
+        last_event_idより後のコメントを送り、最後に送ったIDを返す
+        """
+        try:
+            last_id = int(last_event_id)
+        except (TypeError, ValueError):
+            return 0
+        from .models import Comment
+
+        comments = await database_sync_to_async(list)(
+            Comment.objects.filter(post_id=post_id, id__gt=last_id)
+            .select_related('author').order_by('id')[:BACKLOG_SIZE]
+        )
+        for comment in comments:
+            await send({
+                'type': 'http.response.body', 'body': format_event(comment_payload(comment)), 'more_body': True,
+            })
+            last_id = comment.id
+        return last_id
+
+    async def is_authenticated(self, headers):
+        """
+        セッションのクッキーからログインしているか判定する
+        リクエストと同じくdjango.contrib.auth.get_userでユーザーを読み込み、
+        パスワードを変えて無効になったセッションや、無効にしたユーザーは受け付けない
+        """
+        session_key = parse_cookie(headers.get('cookie', '')).get(settings.SESSION_COOKIE_NAME)
+        if not session_key:
+            return False
+        request = HttpRequest()
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+        user = await database_sync_to_async(get_user)(request)
+        return user.is_authenticated
+
+    async def wait_for_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def respond(self, send, status):
+        await send({'type': 'http.response.start', 'status': status, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
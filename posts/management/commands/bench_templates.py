@@ -0,0 +1,99 @@
+import os
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.template.backends.django import DjangoTemplates
+from django.template.backends.jinja2 import Jinja2
+from django.test import RequestFactory
+
+from authentications.models import User
+from posts.models import Post, Skatepark
+from posts.templatetags.posts_tags import render_prefecture_sidebar
+
+
+class Command(BaseCommand):
+    help = (
+        '投稿一覧ページのテンプレートの描画時間を、サイドバーの使い回しとエンジンごとに計測する\n'
+        'Djangoのテンプレートはsettings.TEMPLATESの設定のまま(Django 4.1ではキャッシュするローダー)で描画する\n'
+        'データベースは使わず、メモリ上に作った投稿を描画する'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=50,
+            help='1ページに表示する投稿の数 (デフォルト: 50)'
+        )
+        parser.add_argument(
+            '--iterations', type=int, default=200,
+            help='描画する回数 (デフォルト: 200)'
+        )
+
+    def handle(self, *args, **options):
+        context = {'post_list': self.build_posts(options['posts'])}
+        request = RequestFactory().get('/posts/')
+        request.user = AnonymousUser()
+        django_render = self.django_renderer()
+        # (表示名, テンプレートを描画する関数, サイドバーを使い回すか)
+        cases = [
+            ('django', django_render, False),
+            ('django + sidebar', django_render, True),
+            ('jinja2 + sidebar', self.jinja2_renderer(), True),
+        ]
+        self.stdout.write(f"posts={options['posts']} iterations={options['iterations']}")
+        self.stdout.write(f"{'case':<24} {'p50 ms':>8} {'p95 ms':>8} {'renders/s':>10}")
+        for label, render, reuse_sidebar in cases:
+            timings = []
+            for _ in range(options['iterations']):
+                if not reuse_sidebar:
+                    render_prefecture_sidebar.cache_clear()
+                started = time.perf_counter()
+                render('posts/posts_list.html', context, request)
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+            self.stdout.write(
+                f'{label:<24} {statistics.median(timings) * 1000:>8.2f} '
+                f'{p95 * 1000:>8.2f} {len(timings) / sum(timings):>10.1f}'
+            )
+
+    def django_renderer(self):
+        """
+        settings.TEMPLATESと同じ設定で描画する関数を返す
+        毎回テンプレートを取得して、リクエストごとの処理と同じにする
+        """
+        config = next(
+            config for config in settings.TEMPLATES
+            if config['BACKEND'] == 'django.template.backends.django.DjangoTemplates'
+        )
+        params = {key: value for key, value in config.items() if key != 'BACKEND'}
+        backend = DjangoTemplates(dict(params, NAME='bench'))
+        return lambda name, context, request: backend.get_template(name).render(context, request)
+
+    def jinja2_renderer(self):
+        """
+        templates/jinja2のテンプレートをJinja2で描画する関数を返す
+        """
+        backend = Jinja2({
+            'NAME': 'bench-jinja2',
+            'DIRS': [os.path.join(settings.TEMPLATES_DIR, 'jinja2')],
+            'APP_DIRS': False,
+            'OPTIONS': {'environment': 'sukeb.jinja2.environment'},
+        })
+        return lambda name, context, request: backend.get_template(name).render(context, request)
+
+    def build_posts(self, count):
+        """
+        データベースに保存せずに、表示に必要な項目だけを持つ投稿を作る
+        """
+        author = User(id=1, username='benchmark', email='benchmark@mail.com')
+        posts = []
+        for index in range(1, count + 1):
+            skatepark = Skatepark(
+                id=index, name=f'スケートパーク{index}', prefecture='東京都', city='渋谷区',
+                skatepark_image=f'skateparks/benchmark{index}.jpg',
+            )
+            posts.append(Post(id=index, author=author, skatepark=skatepark, body='テスト投稿です。' * 20))
+        return posts
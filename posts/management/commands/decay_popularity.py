@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import popularity
+
+
+class Command(BaseCommand):
+    help = (
+        '投稿の人気度を経過時間に合わせて減らす\n'
+        'cronで--hoursと同じ間隔で実行する、--rebuildでコメントから計算し直す'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=float, default=1,
+            help='前回実行してからの時間 (デフォルト: 1)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='1回のUPDATEで更新する件数 (デフォルト: 5000)'
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help=f'全てのコメントから人気度を計算し直す (半減期: {settings.POPULARITY_HALF_LIFE_HOURS}時間)'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            count = popularity.rebuild(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'{count}件の投稿の人気度を計算し直しました'))
+            return
+        updated = popularity.decay(popularity.decay_factor(options['hours']), options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{updated}件の投稿の人気度を減らしました'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts.export import EXPORT_FORMATS, iter_export
+
+
+class Command(BaseCommand):
+    help = '全ての投稿をスケートパーク、投稿者、コメントと一緒にCSVかNDJSONで書き出す'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', dest='export_format', default='ndjson', choices=sorted(EXPORT_FORMATS),
+            help='出力形式 (デフォルト: ndjson)'
+        )
+        parser.add_argument(
+            '--output', '-o',
+            help='出力先のファイル、指定しない時は標準出力に書き出す'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='1回のフェッチで読み込む行数 (デフォルト: 2000)'
+        )
+
+    def handle(self, *args, **options):
+        chunks = iter_export(options['export_format'], chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import comment_buffer
+
+
+class Command(BaseCommand):
+    help = (
+        'ファイルに溜まっているコメントをデータベースに書き込む\n'
+        'ワーカーが落ちて残ったコメントも書き込み、書き込み済みのコメントは重複させない'
+    )
+
+    def handle(self, *args, **options):
+        written = comment_buffer.flush()
+        self.stdout.write(self.style.SUCCESS(f'{written}件のコメントを書き込みました'))
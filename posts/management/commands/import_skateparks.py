@@ -0,0 +1,199 @@
+import csv
+import json
+import os
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import clusters
+from posts.models import Skatepark
+from posts.prefectures import PREFECTURE_CHOICES
+
+
+PREFECTURES = {name for name, _ in PREFECTURE_CHOICES}
+
+
+class Command(BaseCommand):
+    help = (
+        'CSVかNDJSONのスケートパークのデータをまとめて登録する\n'
+        '列はname, prefecture, city, image(画像ディレクトリからの相対パス、省略可),\n'
+        'latitude, longitude(省略可)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='読み込むCSVかNDJSONのファイル')
+        parser.add_argument(
+            '--format', dest='input_format', choices=['csv', 'ndjson'],
+            help='入力形式、指定しない時は拡張子で判定する'
+        )
+        parser.add_argument(
+            '--images-dir',
+            help='image列の画像ファイルがあるディレクトリ'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='1トランザクションで登録する件数 (デフォルト: 1000)'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='進捗を保存するファイル、デフォルトは入力ファイル名に.checkpointをつけたもの'
+        )
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options['path'])
+        if not os.path.exists(path):
+            raise CommandError(f'ファイルが見つかりません: {path}')
+        input_format = options['input_format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+        self.images_dir = options['images_dir']
+        batch_size = options['batch_size']
+
+        # 前回失敗した時は、登録済みの行を読み飛ばして再開する
+        done = self.read_checkpoint(checkpoint_path, path)
+        if done:
+            self.stdout.write(f'{done}行目まで登録済みなので、続きから再開します')
+
+        imported = skipped = 0
+        batch = []
+        line_number = 0
+        for line_number, row in enumerate(self.read_rows(path, input_format), start=1):
+            if line_number <= done:
+                continue
+            try:
+                batch.append(self.build_skatepark(row))
+            except ValueError as err:
+                skipped += 1
+                self.stderr.write(f'{line_number}行目をスキップしました: {err}')
+            if len(batch) >= batch_size:
+                imported += self.save_batch(batch, checkpoint_path, path, line_number)
+                batch = []
+        imported += self.save_batch(batch, checkpoint_path, path, line_number)
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(f'{imported}件登録しました (スキップ: {skipped}件)'))
+
+    def read_rows(self, path, input_format):
+        """
+        ファイルを1行ずつdictにして返す
+        """
+        with open(path, encoding='utf-8', newline='') as input_file:
+            if input_format == 'csv':
+                yield from csv.DictReader(input_file)
+                return
+            for line in input_file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as err:
+                    row = {'_error': f'JSONとして読み込めません ({err})'}
+                yield row
+
+    def build_skatepark(self, row):
+        """
+        1行のデータを検証してSkateparkのインスタンスを作る
+        不正なデータの時はValueErrorをあげる
+        """
+        if '_error' in row:
+            raise ValueError(row['_error'])
+        name = (row.get('name') or '').strip()
+        prefecture = (row.get('prefecture') or '').strip()
+        city = (row.get('city') or '').strip()
+        if not name or len(name) > Skatepark._meta.get_field('name').max_length:
+            raise ValueError(f'パーク名が不正です: {name!r}')
+        if prefecture not in PREFECTURES:
+            raise ValueError(f'都道府県名が不正です: {prefecture!r}')
+        if not city or len(city) > Skatepark._meta.get_field('city').max_length:
+            raise ValueError(f'市名が不正です: {city!r}')
+        latitude, longitude = self.parse_location(row)
+        skatepark = Skatepark(
+            name=name, prefecture=prefecture, city=city, latitude=latitude, longitude=longitude
+        )
+        # bulk_createではsaveが呼ばれないので、ここでグリッドのマス番号を設定する
+        skatepark.set_grid_cell()
+        image = (row.get('image') or '').strip()
+        # 画像はバッチを登録する時にコピーする
+        skatepark._image_source = self.find_image(image) if image else None
+        return skatepark
+
+    def parse_location(self, row):
+        """
+        latitudeとlongitudeの列を数値にして返す、両方空の時は(None, None)を返す
+        """
+        latitude = row.get('latitude')
+        longitude = row.get('longitude')
+        if latitude in (None, '') and longitude in (None, ''):
+            return None, None
+        try:
+            latitude, longitude = float(latitude), float(longitude)
+        except (TypeError, ValueError):
+            raise ValueError(f'緯度経度が不正です: {latitude!r}, {longitude!r}')
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError(f'緯度経度が範囲外です: {latitude}, {longitude}')
+        return latitude, longitude
+
+    def find_image(self, image):
+        """
+        画像ディレクトリの画像のパスを返す、見つからない時はValueErrorをあげる
+        """
+        if not self.images_dir:
+            raise ValueError('画像を登録するには--images-dirを指定してください')
+        source = os.path.join(self.images_dir, image)
+        if not os.path.isfile(source):
+            raise ValueError(f'画像が見つかりません: {image}')
+        return source
+
+    def store_image(self, source):
+        """
+        画像をメディアのストレージにコピーし、保存したパスを返す
+        """
+        field = Skatepark._meta.get_field('skatepark_image')
+        with open(source, 'rb') as image_file:
+            return field.storage.save(
+                field.generate_filename(None, os.path.basename(source)), File(image_file)
+            )
+
+    def save_batch(self, batch, checkpoint_path, path, line_number):
+        """
+        1トランザクションでまとめて登録し、コミットしたら進捗を保存する
+        登録できなかった時はコピーした画像を削除し、再開した時に同じ画像が重複して残らないようにする
+        """
+        stored = []
+        try:
+            for skatepark in batch:
+                if skatepark._image_source:
+                    skatepark.skatepark_image = self.store_image(skatepark._image_source)
+                    stored.append(skatepark.skatepark_image.name)
+            if batch:
+                with transaction.atomic():
+                    Skatepark.objects.bulk_create(batch)
+                    # bulk_createではシグナルが送られないので、地図のクラスタをまとめて更新する
+                    clusters.add_locations(
+                        (skatepark.latitude, skatepark.longitude) for skatepark in batch
+                    )
+        except BaseException:
+            storage = Skatepark._meta.get_field('skatepark_image').storage
+            for name in stored:
+                storage.delete(name)
+            raise
+        self.write_checkpoint(checkpoint_path, path, line_number)
+        return len(batch)
+
+    def read_checkpoint(self, checkpoint_path, path):
+        if not os.path.exists(checkpoint_path):
+            return 0
+        with open(checkpoint_path, encoding='utf-8') as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if checkpoint.get('path') != path:
+            raise CommandError(f'{checkpoint_path}は別のファイルの進捗です')
+        return checkpoint['line']
+
+    def write_checkpoint(self, checkpoint_path, path, line_number):
+        # 途中で落ちても壊れたファイルが残らないように、書き込んでから置き換える
+        temporary_path = f'{checkpoint_path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as checkpoint_file:
+            json.dump({'path': path, 'line': line_number}, checkpoint_file)
+        os.replace(temporary_path, checkpoint_path)
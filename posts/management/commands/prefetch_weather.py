@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Skatepark
+from posts.weather import city_codes_for, fetch_forecasts
+
+
+class Command(BaseCommand):
+    help = 'スケートパークがある地域の天気予報をまとめて取得し、キャッシュに保存する'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='同時に天気予報APIにリクエストを送る数 (デフォルト: 8)'
+        )
+
+    def handle(self, *args, **options):
+        locations = Skatepark.objects.values_list('prefecture', 'city').distinct()
+        city_codes = set(city_codes_for(locations).values())
+        forecasts = fetch_forecasts(city_codes, max_workers=options['workers'])
+        failed = len(city_codes) - len(forecasts)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(forecasts)}地域の天気予報をキャッシュしました (失敗: {failed}地域)'
+        ))
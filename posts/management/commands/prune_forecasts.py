@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.models import ForecastRecord
+
+
+class Command(BaseCommand):
+    help = (
+        '保存期間を過ぎた天気予報の履歴を削除する\n'
+        '古い順に期間を区切って削除し、1回のDELETEでロックする行を少なくする'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.WEATHER_HISTORY_DAYS,
+            help=f'履歴を残す日数 (デフォルト: {settings.WEATHER_HISTORY_DAYS})'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='1回のDELETEで削除するおおよその件数 (デフォルト: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        batch_size = options['batch_size']
+        expired = ForecastRecord.objects.filter(fetched_at__lt=cutoff)
+        deleted = 0
+        while True:
+            # 古い方からbatch_size件目の取得日時までを1つの期間として削除する
+            # 取得日時のインデックスで範囲を決めるので、削除する行だけをロックする
+            bound = list(
+                expired.order_by('fetched_at')
+                .values_list('fetched_at', flat=True)[batch_size - 1:batch_size]
+            )
+            if not bound:
+                count, _ = expired.delete()
+                deleted += count
+                break
+            count, _ = expired.filter(fetched_at__lte=bound[0]).delete()
+            deleted += count
+        self.stdout.write(self.style.SUCCESS(f'{deleted}件の天気予報の履歴を削除しました'))
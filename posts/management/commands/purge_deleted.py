@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from posts.deletion import purge_deleted
+
+
+class Command(BaseCommand):
+    help = (
+        '削除済みの投稿と退会済みのユーザーを、コメント、スケートパーク、画像ファイルと一緒に削除する\n'
+        'batch-size件ずつ削除するので、定期的に実行しても長いロックをかけない'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='1回のDELETEで削除する件数 (デフォルト: 500)'
+        )
+        parser.add_argument(
+            '--sweep-images', action='store_true',
+            help='どのスケートパークも使っていない画像ファイルも探して削除する'
+        )
+        parser.add_argument(
+            '--min-age-hours', type=int, default=1,
+            help='--sweep-imagesで削除するファイルの最低限の経過時間 (デフォルト: 1)'
+        )
+
+    def handle(self, *args, **options):
+        result = purge_deleted(
+            options['batch_size'], sweep=options['sweep_images'],
+            min_age=timedelta(hours=options['min_age_hours']),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['users']}人のユーザー、{result['posts']}件の投稿、"
+            f"{result['images']}個の画像ファイルを削除しました"
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts.clusters import rebuild_clusters
+from posts.models import SkateparkCluster
+
+
+class Command(BaseCommand):
+    help = '全てのスケートパークから地図のクラスタを作り直す'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='1回のフェッチで読み込む行数 (デフォルト: 2000)'
+        )
+
+    def handle(self, *args, **options):
+        rebuild_clusters(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{SkateparkCluster.objects.count()}件のクラスタを作成しました'
+        ))
@@ -0,0 +1,67 @@
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from authentications.models import User
+from posts.models import Comment, Post, Skatepark
+from posts.prefectures import PREFECTURE_CHOICES
+
+
+class Command(BaseCommand):
+    help = '負荷試験用に、ユーザー、スケートパーク、投稿、コメントのダミーデータをまとめて作る'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='作るユーザーの数 (デフォルト: 100)')
+        parser.add_argument('--posts', type=int, default=5000, help='作る投稿の数 (デフォルト: 5000)')
+        parser.add_argument(
+            '--comments', type=int, default=3,
+            help='1投稿あたりのコメントの数 (デフォルト: 3)'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='1回で登録する件数 (デフォルト: 1000)')
+        parser.add_argument('--seed', type=int, default=0, help='乱数のシード (デフォルト: 0)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        prefectures = [name for name, _ in PREFECTURE_CHOICES]
+        # 全員同じパスワードなので、ハッシュ計算は1回だけにする
+        password = make_password('seedpassword')
+        start = User.objects.count()
+
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                [
+                    User(username=f'seed{start + i}', email=f'seed{start + i}@mail.com', password=password)
+                    for i in range(options['users'])
+                ],
+                batch_size=batch_size,
+            )
+            skateparks = Skatepark.objects.bulk_create(
+                [
+                    Skatepark(
+                        name=f'シードパーク{i}', prefecture=rng.choice(prefectures), city='シード市',
+                        skatepark_image='skateparks/seed.jpg',
+                    )
+                    for i in range(options['posts'])
+                ],
+                batch_size=batch_size,
+            )
+            posts = Post.objects.bulk_create(
+                [
+                    Post(author=rng.choice(users), skatepark=skatepark, body=f'シードの投稿です。{skatepark.name}')
+                    for skatepark in skateparks
+                ],
+                batch_size=batch_size,
+            )
+            Comment.objects.bulk_create(
+                (
+                    Comment(post=post, author=rng.choice(users), body=f'シードのコメント{i}')
+                    for post in posts for i in range(options['comments'])
+                ),
+                batch_size=batch_size,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"ユーザー{len(users)}人、投稿{len(posts)}件、コメント{len(posts) * options['comments']}件を作成しました"
+        ))
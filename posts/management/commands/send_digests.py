@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import notifications
+
+
+class Command(BaseCommand):
+    help = (
+        'まだメールで送っていない未読の通知を、ユーザーごとに1通のメールにまとめて送る\n'
+        'cronで定期的に実行する、送る方法はEMAIL_BACKENDで切り替える'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='1回の接続でメールを送るユーザーの数 (デフォルト: 100)'
+        )
+
+    def handle(self, *args, **options):
+        users, sent = notifications.send_digests(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{users}人に{sent}件の通知をメールで送りました'))
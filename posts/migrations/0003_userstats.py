@@ -0,0 +1,29 @@
+# Generated by Django 4.1 on 2026-10-19 01:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentications', '0003_user_email_lower_unique'),
+        ('posts', '0002_comment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='ユーザー')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='投稿数')),
+                ('comment_count', models.PositiveIntegerField(default=0, verbose_name='コメント数')),
+                ('prefecture_count', models.PositiveIntegerField(default=0, verbose_name='投稿した都道府県数')),
+            ],
+            options={
+                'verbose_name': 'ユーザー集計',
+                'verbose_name_plural': 'ユーザー集計',
+            },
+        ),
+    ]
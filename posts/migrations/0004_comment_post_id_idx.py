@@ -0,0 +1,17 @@
+# Generated by Django 4.1 on 2026-10-19 01:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_userstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'id'], name='posts_comment_post_id_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1 on 2026-10-19 01:10
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_comment_post_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skatepark',
+            name='grid_lat',
+            field=models.IntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='skatepark',
+            name='grid_lng',
+            field=models.IntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='skatepark',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)], verbose_name='緯度'),
+        ),
+        migrations.AddField(
+            model_name='skatepark',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)], verbose_name='経度'),
+        ),
+        migrations.AddIndex(
+            model_name='skatepark',
+            index=models.Index(fields=['grid_lat', 'grid_lng'], name='posts_skatepark_grid_idx'),
+        ),
+    ]
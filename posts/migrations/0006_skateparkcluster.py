@@ -0,0 +1,34 @@
+# Generated by Django 4.1 on 2026-10-19 01:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_skatepark_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkateparkCluster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.PositiveSmallIntegerField(verbose_name='ズームレベル')),
+                ('tile_x', models.PositiveIntegerField(verbose_name='タイルのx')),
+                ('tile_y', models.PositiveIntegerField(verbose_name='タイルのy')),
+                ('cell', models.PositiveSmallIntegerField(verbose_name='タイル内のマス')),
+                ('count', models.IntegerField(default=0, verbose_name='件数')),
+                ('latitude_sum', models.FloatField(default=0, verbose_name='緯度の合計')),
+                ('longitude_sum', models.FloatField(default=0, verbose_name='経度の合計')),
+            ],
+            options={
+                'verbose_name': 'スケートパークのクラスタ',
+                'verbose_name_plural': 'スケートパークのクラスタ',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='skateparkcluster',
+            constraint=models.UniqueConstraint(fields=('zoom', 'tile_x', 'tile_y', 'cell'), name='posts_skateparkcluster_unique'),
+        ),
+    ]
@@ -0,0 +1,96 @@
+from django.db import migrations
+
+
+# 天気予報APIの地域(一次細分区域)ごとのID番号
+# 後からアプリのコードが変わっても同じ行を入れるように、マイグレーションに書いておく
+# (都道府県名, 地域の代表都市名, ID番号)
+WEATHER_CITY_CODES = [
+    ('北海道', '稚内', '011000'), ('北海道', '旭川', '012010'), ('北海道', '留萌', '012020'),
+    ('北海道', '網走', '013010'), ('北海道', '北見', '013020'), ('北海道', '紋別', '013030'),
+    ('北海道', '根室', '014010'), ('北海道', '釧路', '014020'), ('北海道', '帯広', '014030'),
+    ('北海道', '室蘭', '015010'), ('北海道', '浦河', '015020'), ('北海道', '札幌', '016010'),
+    ('北海道', '岩見沢', '016020'), ('北海道', '倶知安', '016030'), ('北海道', '函館', '017010'),
+    ('北海道', '江差', '017020'),
+    ('青森県', '青森', '020010'), ('青森県', 'むつ', '020020'), ('青森県', '八戸', '020030'),
+    ('岩手県', '盛岡', '030010'), ('岩手県', '宮古', '030020'), ('岩手県', '大船渡', '030030'),
+    ('宮城県', '仙台', '040010'), ('宮城県', '白石', '040020'),
+    ('秋田県', '秋田', '050010'), ('秋田県', '横手', '050020'),
+    ('山形県', '山形', '060010'), ('山形県', '米沢', '060020'), ('山形県', '酒田', '060030'),
+    ('山形県', '新庄', '060040'),
+    ('福島県', '福島', '070010'), ('福島県', 'いわき', '070020'), ('福島県', '会津若松', '070030'),
+    ('茨城県', '水戸', '080010'), ('茨城県', '土浦', '080020'),
+    ('栃木県', '宇都宮', '090010'), ('栃木県', '大田原', '090020'),
+    ('群馬県', '前橋', '100010'), ('群馬県', 'みなかみ', '100020'),
+    ('埼玉県', 'さいたま', '110010'), ('埼玉県', '熊谷', '110020'), ('埼玉県', '秩父', '110030'),
+    ('千葉県', '千葉', '120010'), ('千葉県', '銚子', '120020'), ('千葉県', '館山', '120030'),
+    ('東京都', '東京', '130010'), ('東京都', '大島', '130020'), ('東京都', '八丈島', '130030'),
+    ('東京都', '父島', '130040'),
+    ('神奈川県', '横浜', '140010'), ('神奈川県', '小田原', '140020'),
+    ('新潟県', '新潟', '150010'), ('新潟県', '長岡', '150020'), ('新潟県', '上越', '150030'),
+    ('新潟県', '佐渡', '150040'),
+    ('富山県', '富山', '160010'), ('富山県', '高岡', '160020'),
+    ('石川県', '金沢', '170010'), ('石川県', '輪島', '170020'),
+    ('福井県', '福井', '180010'), ('福井県', '敦賀', '180020'),
+    ('山梨県', '甲府', '190010'), ('山梨県', '富士河口湖', '190020'),
+    ('長野県', '長野', '200010'), ('長野県', '松本', '200020'), ('長野県', '飯田', '200030'),
+    ('岐阜県', '岐阜', '210010'), ('岐阜県', '高山', '210020'),
+    ('静岡県', '静岡', '220010'), ('静岡県', '熱海', '220020'), ('静岡県', '三島', '220030'),
+    ('静岡県', '浜松', '220040'),
+    ('愛知県', '名古屋', '230010'), ('愛知県', '豊橋', '230020'),
+    ('三重県', '津', '240010'), ('三重県', '尾鷲', '240020'),
+    ('滋賀県', '大津', '250010'), ('滋賀県', '彦根', '250020'),
+    ('京都府', '京都', '260010'), ('京都府', '舞鶴', '260020'),
+    ('大阪府', '大阪', '270000'),
+    ('兵庫県', '神戸', '280010'), ('兵庫県', '豊岡', '280020'),
+    ('奈良県', '奈良', '290010'), ('奈良県', '十津川', '290020'),
+    ('和歌山県', '和歌山', '300010'), ('和歌山県', '串本', '300020'),
+    ('鳥取県', '鳥取', '310010'), ('鳥取県', '米子', '310020'),
+    ('島根県', '松江', '320010'), ('島根県', '浜田', '320020'), ('島根県', '隠岐の島', '320030'),
+    ('岡山県', '岡山', '330010'), ('岡山県', '津山', '330020'),
+    ('広島県', '広島', '340010'), ('広島県', '庄原', '340020'),
+    ('山口県', '下関', '350010'), ('山口県', '山口', '350020'), ('山口県', '柳井', '350030'),
+    ('山口県', '萩', '350040'),
+    ('徳島県', '徳島', '360010'), ('徳島県', '美波', '360020'),
+    ('香川県', '高松', '370000'),
+    ('愛媛県', '松山', '380010'), ('愛媛県', '新居浜', '380020'), ('愛媛県', '宇和島', '380030'),
+    ('高知県', '高知', '390010'), ('高知県', '室戸', '390020'), ('高知県', '土佐清水', '390030'),
+    ('福岡県', '福岡', '400010'), ('福岡県', '北九州', '400020'), ('福岡県', '飯塚', '400030'),
+    ('福岡県', '久留米', '400040'),
+    ('佐賀県', '佐賀', '410010'), ('佐賀県', '伊万里', '410020'),
+    ('長崎県', '長崎', '420010'), ('長崎県', '佐世保', '420020'), ('長崎県', '対馬', '420030'),
+    ('長崎県', '五島', '420040'),
+    ('熊本県', '熊本', '430010'), ('熊本県', '阿蘇', '430020'), ('熊本県', '天草', '430030'),
+    ('熊本県', '人吉', '430040'),
+    ('大分県', '大分', '440010'), ('大分県', '中津', '440020'), ('大分県', '日田', '440030'),
+    ('大分県', '佐伯', '440040'),
+    ('宮崎県', '宮崎', '450010'), ('宮崎県', '延岡', '450020'), ('宮崎県', '都城', '450030'),
+    ('宮崎県', '高千穂', '450040'),
+    ('鹿児島県', '鹿児島', '460010'), ('鹿児島県', '鹿屋', '460020'), ('鹿児島県', '西之表', '460030'),
+    ('鹿児島県', '奄美', '460040'),
+    ('沖縄県', '那覇', '471010'), ('沖縄県', '名護', '471020'), ('沖縄県', '久米島', '471030'),
+    ('沖縄県', '南大東', '472000'), ('沖縄県', '宮古島', '473000'), ('沖縄県', '石垣', '474010'),
+    ('沖縄県', '与那国', '474020'),
+]
+
+
+def seed_weather_cities(apps, schema_editor):
+    WeatherCity = apps.get_model('posts', 'WeatherCity')
+    db_alias = schema_editor.connection.alias
+    WeatherCity.objects.using(db_alias).bulk_create(
+        [
+            WeatherCity(prefecture=prefecture, name=name, city_code=city_code)
+            for prefecture, name, city_code in WEATHER_CITY_CODES
+        ],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_weathercity'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_weather_cities, migrations.RunPython.noop),
+    ]
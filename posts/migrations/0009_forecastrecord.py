@@ -0,0 +1,35 @@
+# Generated by Django 4.1 on 2026-10-19 01:14
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_seed_weathercity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city_code', models.CharField(max_length=6, verbose_name='地域のID番号')),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='取得日時')),
+                ('telop', models.CharField(max_length=30, verbose_name='天候')),
+            ],
+            options={
+                'verbose_name': '天気予報の履歴',
+                'verbose_name_plural': '天気予報の履歴',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='forecastrecord',
+            index=models.Index(fields=['city_code', '-fetched_at'], name='posts_forecast_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='forecastrecord',
+            index=models.Index(fields=['fetched_at'], name='posts_forecast_fetched_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-19 01:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_forecastrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='buffer_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
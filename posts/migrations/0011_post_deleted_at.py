@@ -0,0 +1,22 @@
+# Generated by Django 4.1 on 2026-10-19 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_comment_buffer_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='削除日時'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='posts_post_deleted_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.1 on 2026-10-19 01:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='popularity',
+            field=models.FloatField(default=0, editable=False, verbose_name='人気度'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['-popularity', '-id'], name='posts_post_popular_idx'),
+        ),
+    ]
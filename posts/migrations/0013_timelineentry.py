@@ -0,0 +1,35 @@
+# Generated by Django 4.1 on 2026-10-19 01:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('feed', models.CharField(max_length=32, verbose_name='タイムライン')),
+                ('source', models.CharField(max_length=32, verbose_name='フォローしている対象')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='posts.post', verbose_name='投稿')),
+            ],
+            options={
+                'verbose_name': 'タイムライン',
+                'verbose_name_plural': 'タイムライン',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['feed', '-post'], name='posts_timeline_feed_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('feed', 'source', 'post'), name='posts_timeline_unique'),
+        ),
+    ]
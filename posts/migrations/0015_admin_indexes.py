@@ -0,0 +1,25 @@
+# Generated by Django 4.1 on 2026-10-19 01:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_notification'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['created_at'], name='posts_comment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['created_at'], name='posts_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='skatepark',
+            index=models.Index(fields=['name'], name='posts_skatepark_name_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1 on 2026-10-19 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='skatepark',
+            index=models.Index(fields=['prefecture', '-id'], name='posts_skatepark_pref_idx'),
+        ),
+    ]
@@ -1,7 +1,10 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.urls import reverse
 
+from .geo import grid_cell
 from .prefectures import PREFECTURE_CHOICES
 
 
@@ -28,14 +31,62 @@ class Skatepark(models.Model):
     prefecture = models.CharField(max_length=4, choices=PREFECTURE_CHOICES, verbose_name='県名')
     city = models.CharField(max_length=10, verbose_name='市名')
     skatepark_image = models.ImageField(upload_to='images/', verbose_name='写真')
+    latitude = models.FloatField(
+        null=True, blank=True, verbose_name='緯度',
+        validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    longitude = models.FloatField(
+        null=True, blank=True, verbose_name='経度',
+        validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
+    # 近くのスケートパークを検索するためのグリッドのマス番号、緯度経度から計算する
+    grid_lat = models.IntegerField(null=True, editable=False)
+    grid_lng = models.IntegerField(null=True, editable=False)
 
     class Meta:
         verbose_name = 'スケートパーク'
         verbose_name_plural = 'スケートパーク'
+        indexes = [
+            models.Index(fields=['grid_lat', 'grid_lng'], name='posts_skatepark_grid_idx'),
+            # 県名で絞り込んだスケートパークをIDの降順に読むためのインデックス
+            models.Index(fields=['prefecture', '-id'], name='posts_skatepark_pref_idx'),
+            # 管理画面でパーク名を前方一致で探すためのインデックス
+            models.Index(fields=['name'], name='posts_skatepark_name_idx', opclasses=['varchar_pattern_ops']),
+        ]
 
     def __str__(self):
         return f'{self.name}({self.prefecture})'
 
+    def save(self, *args, **kwargs):
+        self.set_grid_cell()
+        super().save(*args, **kwargs)
+
+    def set_grid_cell(self):
+        """
+        緯度経度からグリッドのマス番号を設定する
+        bulk_createではsaveが呼ばれないので、登録する前に呼び出す
+        """
+        if self.latitude is None or self.longitude is None:
+            self.grid_lat = self.grid_lng = None
+        else:
+            self.grid_lat, self.grid_lng = grid_cell(self.latitude, self.longitude)
+
+
+class PostQuerySet(models.QuerySet):
+    def filter_prefecture(self, query_keyword):
+        """
+        スケートパークの県名にquery_keywordが含まれる投稿に絞り込む
+        """
+        return self.filter(skatepark__prefecture__contains=query_keyword)
+
+
+class PostManager(models.Manager.from_queryset(PostQuerySet)):
+    """
+    削除済みの投稿を除くマネージャー
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 
 class Post(Common):
     """ 
@@ -46,10 +97,32 @@ class Post(Common):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='投稿日')
     skatepark = models.OneToOneField(Skatepark, on_delete=models.CASCADE, verbose_name='スケートパーク')
     body = models.CharField(max_length=300, verbose_name='内容')
+    # 削除済みにした日時、purge_deletedコマンドがコメント、スケートパーク、画像と一緒に削除する
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='削除日時')
+    # コメントのたびに増え、decay_popularityコマンドで時間とともに減る人気度
+    popularity = models.FloatField(default=0, editable=False, verbose_name='人気度')
+
+    objects = PostManager()
+    # 削除済みの投稿も含めたマネージャー
+    all_objects = PostQuerySet.as_manager()
 
     class Meta:
         verbose_name = '投稿'
         verbose_name_plural = '投稿'
+        indexes = [
+            # 削除待ちの投稿だけを持つ小さなインデックス
+            models.Index(
+                fields=['deleted_at'], name='posts_post_deleted_idx',
+                condition=models.Q(deleted_at__isnull=False),
+            ),
+            # 人気の投稿を上から順に読むためのインデックス
+            models.Index(
+                fields=['-popularity', '-id'], name='posts_post_popular_idx',
+                condition=models.Q(deleted_at__isnull=True),
+            ),
+            # 管理画面で投稿日の範囲を絞り込むためのインデックス
+            models.Index(fields=['created_at'], name='posts_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.body[:50]
@@ -67,10 +140,162 @@ class Comment(Common):
     """
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
     body = models.CharField(max_length=150, verbose_name='コメント内容')
+    # まとめて書き込んだコメントの受付ID、書き込みをやり直した時に重複させない
+    buffer_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
 
     class Meta:
         verbose_name = 'コメント'
         verbose_name_plural = 'コメント'
+        indexes = [
+            # 投稿ごとのコメントを順番に読み込むためのインデックス
+            models.Index(fields=['post', 'id'], name='posts_comment_post_id_idx'),
+            # 管理画面で投稿日の範囲を絞り込むためのインデックス
+            models.Index(fields=['created_at'], name='posts_comment_created_idx'),
+        ]
     
     def __str__(self):
-        return self.body[:50]
\ No newline at end of file
+        return self.body[:50]
+
+class UserStats(models.Model):
+    """
+    ユーザーごとの集計値を保存するモデル
+    投稿、コメントの作成と削除の時に差分だけ更新する
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True,
+        related_name='stats', verbose_name='ユーザー'
+    )
+    post_count = models.PositiveIntegerField(default=0, verbose_name='投稿数')
+    comment_count = models.PositiveIntegerField(default=0, verbose_name='コメント数')
+    prefecture_count = models.PositiveIntegerField(default=0, verbose_name='投稿した都道府県数')
+
+    class Meta:
+        verbose_name = 'ユーザー集計'
+        verbose_name_plural = 'ユーザー集計'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class SkateparkCluster(models.Model):
+    """
+    地図に表示するスケートパークのクラスタを、ズームレベルとタイルごとに事前に集計したモデル
+    スケートパークの作成、変更、削除の時に差分だけ更新する
+    """
+    zoom = models.PositiveSmallIntegerField(verbose_name='ズームレベル')
+    tile_x = models.PositiveIntegerField(verbose_name='タイルのx')
+    tile_y = models.PositiveIntegerField(verbose_name='タイルのy')
+    cell = models.PositiveSmallIntegerField(verbose_name='タイル内のマス')
+    count = models.IntegerField(default=0, verbose_name='件数')
+    latitude_sum = models.FloatField(default=0, verbose_name='緯度の合計')
+    longitude_sum = models.FloatField(default=0, verbose_name='経度の合計')
+
+    class Meta:
+        verbose_name = 'スケートパークのクラスタ'
+        verbose_name_plural = 'スケートパークのクラスタ'
+        constraints = [
+            # 1タイル分のクラスタをインデックスだけで取得できるように、タイルの列を先頭にする
+            models.UniqueConstraint(
+                fields=['zoom', 'tile_x', 'tile_y', 'cell'], name='posts_skateparkcluster_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.zoom}/{self.tile_x}/{self.tile_y}#{self.cell} ({self.count})'
+
+
+class WeatherCity(models.Model):
+    """
+    スケートパークの市名と天気予報APIの地域のID番号の対応
+    """
+    prefecture = models.CharField(max_length=4, choices=PREFECTURE_CHOICES, verbose_name='県名')
+    name = models.CharField(max_length=10, verbose_name='市名')
+    city_code = models.CharField(max_length=6, verbose_name='地域のID番号')
+
+    class Meta:
+        verbose_name = '天気予報の地域'
+        verbose_name_plural = '天気予報の地域'
+        constraints = [
+            models.UniqueConstraint(fields=['prefecture', 'name'], name='posts_weathercity_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.name}({self.prefecture}) {self.city_code}'
+
+
+
+class ForecastRecord(models.Model):
+    """
+    天気予報APIから取得した天候の履歴、1回の取得で地域ごとに1行保存する
+    """
+    city_code = models.CharField(max_length=6, verbose_name='地域のID番号')
+    fetched_at = models.DateTimeField(default=timezone.now, verbose_name='取得日時')
+    telop = models.CharField(max_length=30, verbose_name='天候')
+
+    class Meta:
+        verbose_name = '天気予報の履歴'
+        verbose_name_plural = '天気予報の履歴'
+        indexes = [
+            # 地域ごとの最新の履歴をインデックスだけで取得する
+            models.Index(fields=['city_code', '-fetched_at'], name='posts_forecast_city_idx'),
+            # 古い履歴を期間ごとに削除する
+            models.Index(fields=['fetched_at'], name='posts_forecast_fetched_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.city_code} {self.fetched_at:%Y-%m-%d %H:%M} {self.telop}'
+
+
+class TimelineEntry(models.Model):
+    """
+    タイムラインに並べる投稿
+    feedはタイムラインの持ち主で、フォロワーの少ない投稿者と都道府県の投稿は
+    フォロワーごとの'u:<ユーザーのID>'に、フォロワーの多い投稿者と都道府県の投稿は
+    sourceと同じ'a:<投稿者のID>'か'p:<県名>'に1件だけ保存する
+    """
+    feed = models.CharField(max_length=32, verbose_name='タイムライン')
+    source = models.CharField(max_length=32, verbose_name='フォローしている対象')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, verbose_name='投稿')
+
+    class Meta:
+        verbose_name = 'タイムライン'
+        verbose_name_plural = 'タイムライン'
+        constraints = [
+            models.UniqueConstraint(fields=['feed', 'source', 'post'], name='posts_timeline_unique'),
+        ]
+        indexes = [
+            # タイムラインを新しい順に読むためのインデックス
+            models.Index(fields=['feed', '-post'], name='posts_timeline_feed_idx'),
+        ]
+
+
+class Notification(models.Model):
+    """
+    投稿にコメントされたことを投稿者に知らせる通知
+    """
+    recipient = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='notifications', verbose_name='通知先'
+    )
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, verbose_name='コメント')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='作成日時')
+    read_at = models.DateTimeField(null=True, blank=True, verbose_name='既読日時')
+    # まとめてメールで送った日時、送る前の通知はNone
+    emailed_at = models.DateTimeField(null=True, blank=True, verbose_name='メール送信日時')
+
+    class Meta:
+        verbose_name = '通知'
+        verbose_name_plural = '通知'
+        indexes = [
+            # ユーザーの通知を新しい順に読むためのインデックス
+            models.Index(fields=['recipient', '-id'], name='posts_notification_user_idx'),
+            # 未読の件数を数えるためのインデックス
+            models.Index(
+                fields=['recipient'], name='posts_notification_unread_idx',
+                condition=models.Q(read_at__isnull=True),
+            ),
+            # まだメールで送っていない未読の通知を探すためのインデックス
+            models.Index(
+                fields=['recipient', 'id'], name='posts_notification_digest_idx',
+                condition=models.Q(read_at__isnull=True, emailed_at__isnull=True),
+            ),
+        ]
@@ -0,0 +1,146 @@
+"""
+コメントの通知
+
+コメントが作成されると、comments_createdシグナル1回につき1回のINSERTで投稿者への通知を作る
+メールはリクエストの中では送らず、send_digestsコマンドがユーザーごとに未読の通知をまとめて送る
+未読の件数はキャッシュした数を表示し、ページを表示するたびに数えない
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from authentications.models import User
+
+from .models import Notification, Post
+
+
+def unread_count_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def record_comments_created(comments):
+    """
+    コメントされた投稿の投稿者への通知を、1回のbulk_createでまとめて作る
+    自分の投稿へのコメントは通知しない
+    """
+    comments = list(comments)
+    post_authors = dict(
+        Post.all_objects.filter(id__in={comment.post_id for comment in comments})
+        .values_list('id', 'author_id')
+    )
+    notifications = [
+        Notification(recipient_id=post_authors[comment.post_id], comment=comment)
+        for comment in comments
+        if comment.post_id in post_authors and post_authors[comment.post_id] != comment.author_id
+    ]
+    if not notifications:
+        return
+    Notification.objects.bulk_create(notifications)
+
+    counts = defaultdict(int)
+    for notification in notifications:
+        counts[notification.recipient_id] += 1
+
+    def increment():
+        for user_id, count in counts.items():
+            try:
+                cache.incr(unread_count_key(user_id), count)
+            except ValueError:
+                # キャッシュにない時は、次に表示する時に数え直す
+                pass
+
+    transaction.on_commit(increment)
+
+
+def unread_count(user):
+    """
+    ユーザーの未読の通知の件数を返す
+    キャッシュにない時だけ数えて、NOTIFICATION_COUNT_CACHE_TIMEOUT秒キャッシュする
+    """
+    key = unread_count_key(user.id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient=user, read_at__isnull=True).count()
+        cache.set(key, count, settings.NOTIFICATION_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def mark_all_read(user):
+    """
+    ユーザーの未読の通知を全て既読にする
+
+    戻り値:
+        int: 既読にした件数
+    """
+    updated = Notification.objects.filter(recipient=user, read_at__isnull=True).update(read_at=timezone.now())
+    transaction.on_commit(
+        lambda: cache.set(unread_count_key(user.id), 0, settings.NOTIFICATION_COUNT_CACHE_TIMEOUT)
+    )
+    return updated
+
+
+def digest_message(user, notifications):
+    """
+    1人のユーザーに送る、通知をまとめたメールを作る
+    """
+    lines = [f'{user.username}さん、あなたの投稿に{len(notifications)}件のコメントがありました', '']
+    for notification in notifications:
+        comment = notification.comment
+        lines.append(f'{comment.author.username}さんが{comment.post.skatepark.name}にコメントしました')
+        lines.append(f'  {comment.body}')
+    return EmailMessage(
+        subject=f'[スケ場] {len(notifications)}件の新しいコメント',
+        body='\n'.join(lines),
+        to=[user.email],
+    )
+
+
+def send_digests(batch_size, connection=None):
+    """
+    まだメールで送っていない未読の通知を、ユーザーごとに1通のメールにまとめて送る
+    batch_size人ずつ読み込み、1回の接続でまとめて送ってから送信済みにする
+    送る方法はEMAIL_BACKENDで切り替える
+
+    引数:
+        batch_size (int): 1回に送るユーザーの数
+        connection: メールの送信に使う接続、Noneの時はEMAIL_BACKENDの接続を使う
+    戻り値:
+        tuple: (メールを送ったユーザーの数, 送った通知の数)
+    """
+    connection = connection or get_connection()
+    # 削除済みの投稿へのコメントは送らない
+    pending = Notification.objects.filter(
+        read_at__isnull=True, emailed_at__isnull=True, comment__post__deleted_at__isnull=True
+    )
+    recipients = (
+        User.objects.filter(is_active=True, deleted_at__isnull=True, id__in=pending.values('recipient_id'))
+        .order_by('id')
+    )
+    users = 0
+    sent = 0
+    last_id = 0
+    while True:
+        batch = list(recipients.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return users, sent
+        last_id = batch[-1].id
+        grouped = defaultdict(list)
+        notifications = (
+            pending.filter(recipient__in=batch)
+            .select_related('comment__author', 'comment__post__skatepark')
+            .order_by('recipient_id', 'id')
+        )
+        for notification in notifications:
+            grouped[notification.recipient_id].append(notification)
+        messages = [digest_message(user, grouped[user.id]) for user in batch if grouped[user.id]]
+        connection.send_messages(messages)
+        # 送った後で送信済みにする、途中で失敗した時は次の実行で同じ通知をもう一度送る
+        Notification.objects.filter(
+            id__in=[notification.id for items in grouped.values() for notification in items]
+        ).update(emailed_at=timezone.now())
+        users += len(messages)
+        sent += sum(len(items) for items in grouped.values())
@@ -0,0 +1,44 @@
+"""
+IDのカーソルを使うページ送り
+"""
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+def encode_cursor(pk):
+    """
+    最後に返したオブジェクトのIDを、クライアントに渡すカーソル文字列に変換する
+    """
+    return urlsafe_base64_encode(force_bytes(pk))
+
+
+def decode_cursor(cursor):
+    """
+    カーソル文字列をIDに戻す、不正な値の時はValueErrorをあげる
+    """
+    try:
+        return int(force_str(urlsafe_base64_decode(cursor)))
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('cursorが不正です')
+
+
+def keyset_page(queryset, cursor, limit):
+    """
+    IDの降順で、cursorより後ろのオブジェクトをlimit件返す
+    OFFSETを使わないので、何ページ目でもインデックスを使う同じ速さのクエリになる
+
+    引数:
+        queryset (QuerySet): 絞り込み済みのクエリセット
+        cursor (str): 前のページの最後のオブジェクトのカーソル、最初のページの時はNone
+        limit (int): 1ページの件数
+    戻り値:
+        tuple: (オブジェクトのリスト, 次のページのカーソル、最後のページの時はNone)
+    """
+    queryset = queryset.order_by('-id')
+    if cursor:
+        queryset = queryset.filter(id__lt=decode_cursor(cursor))
+    # 次のページがあるか判定するため1件多く取得する
+    objects = list(queryset[:limit + 1])
+    if len(objects) > limit:
+        return objects[:limit], encode_cursor(objects[limit - 1].id)
+    return objects, None
@@ -0,0 +1,86 @@
+"""
+人気の投稿の並び順に使う人気度
+
+コメント1件ごとに投稿の人気度に1を足し、decay_popularityコマンドが定期的に
+半減期に合わせて全ての人気度を減らす
+並び替えはインデックスのついた列だけで行い、リクエストのたびにコメントを集計しない
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.utils import timezone
+
+from .models import Comment, Post
+
+
+# これより小さくなった人気度は0にして、減らす対象から外す
+MIN_POPULARITY = 0.01
+
+
+def record_comments_created(comments):
+    """
+    コメントされた投稿の人気度を、1回のUPDATEでまとめて増やす
+    """
+    counts = Counter(comment.post_id for comment in comments)
+    if not counts:
+        return
+    Post.all_objects.filter(id__in=counts).update(popularity=F('popularity') + Case(
+        *(When(id=post_id, then=Value(float(count))) for post_id, count in counts.items()),
+        output_field=FloatField(),
+    ))
+
+
+def decay_factor(hours, half_life_hours=None):
+    """
+    hours時間で人気度に掛ける係数を返す
+    """
+    if half_life_hours is None:
+        half_life_hours = settings.POPULARITY_HALF_LIFE_HOURS
+    return 0.5 ** (hours / half_life_hours)
+
+
+def decay(factor, batch_size):
+    """
+    人気度が0より大きい投稿の人気度に、IDの順にbatch_size件ずつfactorを掛ける
+    MIN_POPULARITYより小さくなる人気度は0にする
+
+    戻り値:
+        int: 更新した件数
+    """
+    scored = Post.all_objects.filter(popularity__gt=0).order_by('id')
+    updated = 0
+    last_id = 0
+    while True:
+        ids = list(scored.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return updated
+        updated += Post.all_objects.filter(id__in=ids).update(popularity=Case(
+            When(popularity__lt=MIN_POPULARITY / factor, then=Value(0.0)),
+            default=F('popularity') * factor,
+            output_field=FloatField(),
+        ))
+        last_id = ids[-1]
+
+
+def rebuild(batch_size, half_life_hours=None):
+    """
+    全てのコメントの投稿日時から人気度を計算し直す
+    コメントを1回だけ順に読み、投稿ごとに経過時間で減らした点数を足す
+
+    戻り値:
+        int: 人気度が0より大きい投稿の数
+    """
+    now = timezone.now()
+    scores = Counter()
+    comments = Comment.objects.values_list('post_id', 'created_at').iterator(chunk_size=batch_size)
+    for post_id, created_at in comments:
+        scores[post_id] += decay_factor((now - created_at).total_seconds() / 3600, half_life_hours)
+    posts = [
+        Post(id=post_id, popularity=score) for post_id, score in scores.items() if score >= MIN_POPULARITY
+    ]
+    with transaction.atomic():
+        Post.all_objects.filter(popularity__gt=0).update(popularity=0)
+        Post.all_objects.bulk_update(posts, ['popularity'], batch_size=batch_size)
+    return len(posts)
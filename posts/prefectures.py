@@ -22,4 +22,4 @@ PREFECTURE_ID = {
     '徳島県': '360010', '香川県': '370000', '愛媛県': '380010', '高知県': '390010', '福岡県': '400010',
     '佐賀県': '410010', '長崎県': '420010', '熊本県': '430010', '大分県': '440010', '宮崎県': '450010',
     '鹿児島県': '460010', '沖縄県': '471010'
-}
\ No newline at end of file
+}
@@ -0,0 +1,91 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from . import clusters, live, notifications, popularity, stats, timeline
+from .models import Comment, Post, Skatepark
+
+
+# コメントが作成された時に送られるシグナル
+# 1件ずつ保存した時も、まとめて保存した時もcommentsにリストで渡す
+comments_created = Signal()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.record_post_created(instance)
+        # コミットしてからフォロワーのタイムラインに配る
+        transaction.on_commit(lambda: timeline.fan_out(instance))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    # 削除済みにした投稿は、その時に集計値を更新している
+    if instance.deleted_at is None:
+        stats.record_post_deleted(instance)
+
+
+@receiver(pre_save, sender=Skatepark)
+def remember_skatepark_location(sender, instance, raw=False, **kwargs):
+    # 緯度経度が変わったか判定するため、保存前の値を取っておく
+    instance._saved_location = None
+    if instance.pk and not raw:
+        instance._saved_location = (
+            Skatepark.objects.filter(pk=instance.pk).values_list('latitude', 'longitude').first()
+        )
+
+
+@receiver(post_save, sender=Skatepark)
+def skatepark_saved(sender, instance, **kwargs):
+    location = (instance.latitude, instance.longitude)
+    saved_location = getattr(instance, '_saved_location', None)
+    if location == saved_location:
+        return
+    if saved_location is not None:
+        clusters.remove_locations([saved_location])
+    clusters.add_locations([location])
+
+
+@receiver(post_delete, sender=Skatepark)
+def skatepark_deleted(sender, instance, **kwargs):
+    clusters.remove_locations([(instance.latitude, instance.longitude)])
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        comments_created.send(sender=Comment, comments=[instance])
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    stats.record_comment_deleted(instance)
+
+
+@receiver(comments_created)
+def update_comment_stats(sender, comments, **kwargs):
+    stats.record_comments_created(comments)
+
+
+@receiver(comments_created)
+def update_popularity(sender, comments, **kwargs):
+    popularity.record_comments_created(comments)
+
+
+@receiver(comments_created)
+def notify_post_authors(sender, comments, **kwargs):
+    notifications.record_comments_created(comments)
+
+
+@receiver(comments_created)
+def publish_live_comments(sender, comments, **kwargs):
+    # コミットしてから配り、ロールバックしたコメントや再接続時に読めないコメントを送らない
+    payloads = [live.comment_payload(comment) for comment in comments]
+
+    def publish():
+        broker = live.get_broker()
+        for payload in payloads:
+            broker.publish(payload)
+
+    transaction.on_commit(publish)
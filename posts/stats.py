@@ -0,0 +1,156 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Comment, Post, UserStats
+
+
+_grouped = threading.local()
+
+
+def _count_user_stats(user_id):
+    """
+    ユーザーの集計値を最初から数える
+    """
+    posts = Post.objects.filter(author_id=user_id)
+    return {
+        'post_count': posts.count(),
+        'comment_count': Comment.objects.filter(author_id=user_id).count(),
+        'prefecture_count': posts.values('skatepark__prefecture').distinct().count(),
+    }
+
+
+def refresh_user_stats(user_id):
+    """
+    ユーザーの集計値を最初から計算し直して保存する
+
+    引数:
+        user_id (int): ユーザーのID
+    戻り値:
+        UserStats: 保存した集計値
+    """
+    stats, _ = UserStats.objects.update_or_create(user_id=user_id, defaults=_count_user_stats(user_id))
+    return stats
+
+
+def get_user_stats(user):
+    """
+    ユーザーの集計値を返す、まだ集計がなければその場で作成する
+
+    引数:
+        user (User): ユーザー
+    戻り値:
+        UserStats: 集計値
+    """
+    try:
+        return UserStats.objects.get(user=user)
+    except UserStats.DoesNotExist:
+        return refresh_user_stats(user.id)
+
+
+def _apply_deltas(user_id, create_if_missing=True, **deltas):
+    """
+    集計値に差分を足す
+    集計がまだないユーザーの場合は、作成時だけ最初から数えて作成する
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    expressions = {field: F(field) + delta for field, delta in deltas.items()}
+    if UserStats.objects.filter(user_id=user_id).update(**expressions) or not create_if_missing:
+        return
+    try:
+        with transaction.atomic():
+            _, created = UserStats.objects.get_or_create(user_id=user_id, defaults=_count_user_stats(user_id))
+    except IntegrityError:
+        created = False
+    if not created:
+        # 同時に別のリクエストが作成した集計には、まだコミットしていないこの変更が入っていない
+        UserStats.objects.filter(user_id=user_id).update(**expressions)
+
+
+def _has_other_post_in_prefecture(post):
+    return Post.objects.filter(
+        author_id=post.author_id, skatepark__prefecture=post.skatepark.prefecture
+    ).exclude(pk=post.pk).exists()
+
+
+def record_post_created(post):
+    """
+    投稿が作成された時に投稿者の集計値を更新する
+    """
+    prefecture_delta = 0 if _has_other_post_in_prefecture(post) else 1
+    _apply_deltas(post.author_id, post_count=1, prefecture_count=prefecture_delta)
+
+
+def record_post_deleted(post):
+    """
+    投稿が削除された時に投稿者の集計値を更新する
+    """
+    prefecture_delta = 0 if _has_other_post_in_prefecture(post) else -1
+    _apply_deltas(
+        post.author_id, create_if_missing=False,
+        post_count=-1, prefecture_count=prefecture_delta
+    )
+
+
+def record_posts_deleted(rows):
+    """
+    まとめて削除済みにした投稿の集計値を、投稿者ごとに1回の更新にまとめる
+    投稿を削除済みにした後で呼ぶ
+
+    引数:
+        rows (list): 削除済みにした投稿の(投稿者のID, 都道府県)のリスト
+    """
+    counts = Counter(author_id for author_id, _ in rows)
+    prefectures = set(rows)
+    # 削除済みにしていない投稿が同じ都道府県に残っていれば、都道府県の数は減らさない
+    remaining = set(
+        Post.objects.filter(
+            author_id__in=counts, skatepark__prefecture__in={prefecture for _, prefecture in prefectures}
+        ).values_list('author_id', 'skatepark__prefecture').distinct()
+    )
+    lost = Counter(author_id for author_id, prefecture in prefectures - remaining)
+    for author_id, count in counts.items():
+        _apply_deltas(
+            author_id, create_if_missing=False,
+            post_count=-count, prefecture_count=-lost[author_id]
+        )
+
+
+def record_comments_created(comments):
+    """
+    コメントが作成された時に、コメントした人ごとにまとめて集計値を更新する
+    """
+    for author_id, count in Counter(comment.author_id for comment in comments).items():
+        _apply_deltas(author_id, comment_count=count)
+
+
+def record_comment_deleted(comment):
+    """
+    コメントが削除された時にコメントした人の集計値を更新する
+    grouped_comment_deletesの中では、最後にまとめて更新する
+    """
+    counts = getattr(_grouped, 'comment_deletes', None)
+    if counts is not None:
+        counts[comment.author_id] += 1
+        return
+    _apply_deltas(comment.author_id, create_if_missing=False, comment_count=-1)
+
+
+@contextmanager
+def grouped_comment_deletes():
+    """
+    この中で削除したコメントの集計値を、コメントした人ごとに1回の更新にまとめる
+    例外が起きた時は更新しない
+    """
+    counts = _grouped.comment_deletes = Counter()
+    try:
+        yield
+    finally:
+        del _grouped.comment_deletes
+    for author_id, count in counts.items():
+        _apply_deltas(author_id, create_if_missing=False, comment_count=-count)
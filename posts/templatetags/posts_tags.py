@@ -0,0 +1,28 @@
+from functools import lru_cache
+
+from django import template
+from django.template.loader import render_to_string
+from django.urls import get_script_prefix
+from django.utils.safestring import mark_safe
+
+from posts.prefectures import PREFECTURE_CHOICES
+
+
+register = template.Library()
+
+
+@lru_cache(maxsize=None)
+def render_prefecture_sidebar(script_prefix):
+    """
+    都道府県名検索のサイドバーを描画する
+    全てのユーザーで同じHTMLになるので、URLの接頭辞ごとに1回だけ描画して使い回す
+    """
+    return mark_safe(render_to_string('posts/prefectures.html', {'prefectures': PREFECTURE_CHOICES}))
+
+
+@register.simple_tag
+def prefecture_sidebar():
+    """
+    描画済みの都道府県名検索のサイドバーを返す
+    """
+    return render_prefecture_sidebar(get_script_prefix())
@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Skatepark, Post, Comment
+from authentications.models import User
+from sukeb.admin import EstimatedCountPaginator
+from sukeb.db import estimated_count
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='admin@mail.com', username='admin', password='testpassword'
+        )
+        cls.user = User.objects.create(username='skater', email='Skater@Mail.com', password='testpassword')
+        cls.create_posts(cls.user, ['渋谷パーク', '新宿パーク'])
+
+    @classmethod
+    def create_posts(cls, author, names):
+        for name in names:
+            skatepark = Skatepark.objects.create(
+                name=name, prefecture='東京都', city='渋谷', skatepark_image='test'
+            )
+            post = Post.objects.create(author=author, skatepark=skatepark, body=name)
+            Comment.objects.create(post=post, author=author, body=f'{name}のコメント')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist(self, model, **params):
+        url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+        return self.client.get(url, params)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """
+        一覧の行が増えても、投稿者やスケートパークを読むクエリが増えないかテスト
+        """
+        for model in (Post, Comment, User):
+            with CaptureQueriesContext(connection) as before:
+                self.assertEqual(self.changelist(model).status_code, 200)
+            author = User.objects.create(username=model.__name__, email=f'{model.__name__}@mail.com')
+            self.create_posts(author, [f'{model.__name__}{i}' for i in range(3)])
+            with CaptureQueriesContext(connection) as after:
+                self.assertEqual(self.changelist(model).status_code, 200)
+            self.assertEqual(len(before), len(after), model)
+
+    def test_search_by_email_ignores_case(self):
+        """
+        メールアドレスでの検索は、大文字と小文字を区別せずに完全一致で探すかテスト
+        """
+        response = self.changelist(Post, q='skater@mail.com')
+        self.assertEqual(response.context['cl'].result_count, 2)
+        response = self.changelist(Post, q='skater@mail')
+        self.assertEqual(response.context['cl'].result_count, 0)
+        response = self.changelist(User, q='SKATER@mail.com')
+        self.assertEqual(list(response.context['cl'].result_list), [self.user])
+
+    def test_search_by_name_prefix(self):
+        """
+        @を含まない語は、パーク名とユーザーネームの前方一致で探すかテスト
+        """
+        self.assertEqual(self.changelist(Post, q='渋谷').context['cl'].result_count, 1)
+        self.assertEqual(self.changelist(Post, q='パーク').context['cl'].result_count, 0)
+        self.assertEqual(self.changelist(Comment, q='新宿').context['cl'].result_count, 1)
+        self.assertEqual(list(self.changelist(User, q='ska').context['cl'].result_list), [self.user])
+
+    def test_filter_by_created_at_range(self):
+        """
+        投稿日の範囲で絞り込め、一覧で日付をDISTINCTで集めるクエリが走らないかテスト
+        """
+        created_at = Post.objects.first().created_at
+        start = created_at - timedelta(days=1)
+        end = created_at + timedelta(days=1)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.changelist(Post, created_at__gte=start.isoformat(), created_at__lt=end.isoformat())
+        self.assertEqual(response.context['cl'].result_count, 2)
+        self.assertFalse([q for q in queries.captured_queries if 'DISTINCT' in q['sql']])
+        response = self.changelist(Comment, created_at__lt=start.isoformat())
+        self.assertEqual(response.context['cl'].result_count, 0)
+
+    def test_paginator_counts_exactly_without_estimate(self):
+        """
+        見積もれないデータベースや少ない件数では、正確な件数を返すかテスト
+        """
+        if connection.vendor != 'postgresql':
+            self.assertIsNone(estimated_count(Post.objects.all()))
+        self.assertEqual(EstimatedCountPaginator(Post.objects.order_by('id'), 1).count, 2)
+        self.assertEqual(EstimatedCountPaginator(Post.objects.filter(body='渋谷パーク').order_by('id'), 1).count, 1)
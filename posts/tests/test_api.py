@@ -0,0 +1,193 @@
+import json
+
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from posts.models import Skatepark, Post, Comment
+from posts.prefectures import PREFECTURE_CHOICES
+from posts.clusters import cluster_key
+from authentications.models import User
+
+
+def read_json(response):
+    """
+    ストリーミングレスポンスを読み込んでJSONとして返す
+    """
+    return json.loads(b''.join(response.streaming_content))
+
+
+class PostsApiViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='test1', email='test1@mail.com', password='testpassword')
+        for i, prefecture in enumerate(['神奈川県', '東京都', '神奈川県']):
+            skatepark = Skatepark.objects.create(
+                name=f'park{i}', prefecture=prefecture, city='横浜市', skatepark_image=f'images/test{i}.jpg'
+            )
+            Post.objects.create(author=user, skatepark=skatepark, body=f'This is test{i}')
+
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('api:posts')
+
+    def test_returns_posts_newest_first(self):
+        """
+        投稿を新しい順に返すテスト
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        data = read_json(response)
+        self.assertEqual([post['body'] for post in data['results']], ['This is test2', 'This is test1', 'This is test0'])
+        self.assertIsNone(data['next'])
+
+    def test_returns_only_requested_fields(self):
+        """
+        fieldsパラメーターで指定した項目だけを返すテスト
+        """
+        data = read_json(self.client.get(self.url, {'fields': 'id,prefecture'}))
+        self.assertEqual(set(data['results'][0]), {'id', 'prefecture'})
+
+    def test_unknown_field_returns_400(self):
+        """
+        公開していない項目を指定すると400を返すテスト
+        """
+        response = self.client.get(self.url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pagination(self):
+        """
+        nextのカーソルで次のページを取得できるテスト
+        """
+        first = read_json(self.client.get(self.url, {'limit': 2, 'fields': 'body'}))
+        self.assertEqual(len(first['results']), 2)
+        self.assertIsNotNone(first['next'])
+        second = read_json(self.client.get(self.url, {'limit': 2, 'fields': 'body', 'cursor': first['next']}))
+        self.assertEqual([post['body'] for post in second['results']], ['This is test0'])
+        self.assertIsNone(second['next'])
+
+    def test_invalid_cursor_returns_400(self):
+        """
+        不正なカーソルの時400を返すテスト
+        """
+        response = self.client.get(self.url, {'cursor': '!!!'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_filter_by_prefecture(self):
+        """
+        queryパラメーターで県名を絞り込めるテスト
+        """
+        data = read_json(self.client.get(self.url, {'query': '神奈川県'}))
+        self.assertEqual(len(data['results']), 2)
+        for post in data['results']:
+            self.assertEqual(post['prefecture'], '神奈川県')
+
+    def test_image_is_returned_as_url(self):
+        """
+        画像はURLに変換して返すテスト
+        """
+        data = read_json(self.client.get(self.url, {'fields': 'image', 'limit': 1}))
+        self.assertTrue(data['results'][0]['image'].endswith('images/test2.jpg'))
+
+
+class CommentsApiViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='test1', email='test1@mail.com', password='testpassword')
+        skatepark = Skatepark.objects.create(name='park', prefecture='東京都', city='渋谷', skatepark_image='test')
+        cls.post = Post.objects.create(author=user, skatepark=skatepark, body='post')
+        other_skatepark = Skatepark.objects.create(name='park', prefecture='東京都', city='渋谷', skatepark_image='test')
+        other_post = Post.objects.create(author=user, skatepark=other_skatepark, body='post')
+        Comment.objects.create(author=user, post=cls.post, body='comment1')
+        Comment.objects.create(author=user, post=other_post, body='comment2')
+
+    def test_filter_by_post(self):
+        """
+        postパラメーターで投稿ごとのコメントに絞り込めるテスト
+        """
+        data = read_json(self.client.get(reverse('api:comments'), {'post': self.post.pk}))
+        self.assertEqual([comment['body'] for comment in data['results']], ['comment1'])
+
+
+class SkateparksApiViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i, prefecture in enumerate(['神奈川県', '東京都', '神奈川県']):
+            Skatepark.objects.create(
+                name=f'park{i}', prefecture=prefecture, city='横浜市', skatepark_image='test'
+            )
+
+    def test_filter_by_exact_prefecture(self):
+        """
+        queryパラメーターの県名と完全に一致するスケートパークだけを返すテスト
+        """
+        data = read_json(self.client.get(reverse('api:skateparks'), {'query': '神奈川県'}))
+        self.assertEqual([park['name'] for park in data['results']], ['park2', 'park0'])
+        data = read_json(self.client.get(reverse('api:skateparks'), {'query': '神奈川'}))
+        self.assertEqual(data['results'], [])
+
+
+class PrefecturesApiViewTest(TestCase):
+    def test_returns_all_prefectures(self):
+        """
+        全都道府県を返すテスト
+        """
+        response = self.client.get(reverse('api:prefectures'))
+        data = response.json()
+        self.assertEqual(len(data['results']), len(PREFECTURE_CHOICES))
+
+
+class NearbySkateparksApiViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Skatepark.objects.create(
+            name='shibuya', prefecture='東京都', city='渋谷', skatepark_image='test',
+            latitude=35.658, longitude=139.701
+        )
+        Skatepark.objects.create(
+            name='yokohama', prefecture='神奈川県', city='横浜市', skatepark_image='test',
+            latitude=35.444, longitude=139.638
+        )
+
+    def test_returns_nearest_skateparks_with_distance(self):
+        """
+        近い順にスケートパークと距離を返すテスト
+        """
+        response = self.client.get(reverse('api:skateparks_nearby'), {'lat': 35.45, 'lng': 139.63, 'k': 1})
+        results = response.json()['results']
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['name'], 'yokohama')
+        self.assertLess(results[0]['distance_km'], 1)
+
+    def test_missing_location_returns_400(self):
+        """
+        latとlngがない時400を返すテスト
+        """
+        response = self.client.get(reverse('api:skateparks_nearby'))
+        self.assertEqual(response.status_code, 400)
+
+
+class ClustersApiViewTest(TestCase):
+    def test_returns_clusters_for_a_tile(self):
+        """
+        タイルに含まれるクラスタの件数と中心を返すテスト
+        """
+        for latitude, longitude in [(35.658, 139.701), (35.6581, 139.7011), (34.693, 135.502)]:
+            Skatepark.objects.create(
+                name='park', prefecture='東京都', city='渋谷', skatepark_image='test',
+                latitude=latitude, longitude=longitude
+            )
+        response = self.client.get(reverse('api:clusters', kwargs={'zoom': 0, 'x': 0, 'y': 0}))
+        clusters = response.json()['clusters']
+        self.assertEqual(sum(cluster['count'] for cluster in clusters), 3)
+        zoom, x, y, _ = cluster_key(35.658, 139.701, 12)
+        response = self.client.get(reverse('api:clusters', kwargs={'zoom': zoom, 'x': x, 'y': y}))
+        clusters = response.json()['clusters']
+        self.assertEqual([cluster['count'] for cluster in clusters], [2])
+        self.assertAlmostEqual(clusters[0]['latitude'], 35.65805)
+
+    def test_out_of_range_tile_returns_404(self):
+        """
+        存在しないタイルの時404を返すテスト
+        """
+        response = self.client.get(reverse('api:clusters', kwargs={'zoom': 1, 'x': 2, 'y': 0}))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,156 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from posts.models import Skatepark, Post, Comment
+from authentications.models import User
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='test1', email='test1@mail.com', password='testpassword')
+        cls.posts = []
+        for i in range(3):
+            skatepark = Skatepark.objects.create(
+                name=f'park{i}', prefecture='東京都', city='渋谷', skatepark_image='test'
+            )
+            cls.posts.append(Post.objects.create(author=user, skatepark=skatepark, body=f'post{i}'))
+        Comment.objects.create(author=user, post=cls.posts[0], body='comment0-1')
+        Comment.objects.create(author=user, post=cls.posts[2], body='comment2-1')
+        Comment.objects.create(author=user, post=cls.posts[0], body='comment0-2')
+
+    def test_export_ndjson_groups_comments_by_post(self):
+        """
+        NDJSONで1投稿1行になり、コメントがその投稿に入るテスト
+        """
+        out = io.StringIO()
+        call_command('export_posts', '--format', 'ndjson', '--chunk-size', '1', stdout=out)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([line['body'] for line in lines], ['post0', 'post1', 'post2'])
+        self.assertEqual([comment['body'] for comment in lines[0]['comments']], ['comment0-1', 'comment0-2'])
+        self.assertEqual(lines[1]['comments'], [])
+        self.assertEqual(lines[2]['skatepark_name'], 'park2')
+
+    def test_export_csv_writes_a_row_per_comment(self):
+        """
+        CSVでコメントごとに1行、コメントがない投稿も1行書き出すテスト
+        """
+        out = io.StringIO()
+        call_command('export_posts', '--format', 'csv', stdout=out)
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[2]['post_body'], 'post1')
+        self.assertEqual(rows[2]['comment_body'], '')
+
+    def test_export_view_is_staff_only(self):
+        """
+        スタッフ以外はエクスポートできないテスト
+        """
+        client = Client()
+        User.objects.create_user(email='user@mail.com', username='user', password='testpassword')
+        client.login(email='user@mail.com', password='testpassword')
+        response = client.get(reverse('posts:export'))
+        self.assertNotEqual(response.status_code, 200)
+
+    def test_export_view_streams_for_staff(self):
+        """
+        スタッフはストリーミングでエクスポートできるテスト
+        """
+        client = Client()
+        User.objects.create_superuser(email='staff@mail.com', username='staff', password='testpassword')
+        client.login(email='staff@mail.com', password='testpassword')
+        response = client.get(reverse('posts:export'), {'format': 'ndjson'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+
+
+class ImportSkateparksTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(content)
+        return path
+
+    def test_import_csv_in_batches(self):
+        """
+        CSVを読み込んで全ての行を登録するテスト
+        """
+        rows = ''.join(f'park{i},東京都,渋谷\n' for i in range(5))
+        path = self.write_file('parks.csv', 'name,prefecture,city\n' + rows)
+        call_command('import_skateparks', path, '--batch-size', '2', stdout=io.StringIO())
+        self.assertEqual(Skatepark.objects.count(), 5)
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+    def test_invalid_rows_are_skipped(self):
+        """
+        都道府県名が不正な行はスキップされるテスト
+        """
+        path = self.write_file('parks.ndjson', '\n'.join([
+            json.dumps({'name': 'park1', 'prefecture': '東京都', 'city': '渋谷'}),
+            json.dumps({'name': 'park2', 'prefecture': '東京', 'city': '渋谷'}),
+            'not json',
+        ]))
+        err = io.StringIO()
+        call_command('import_skateparks', path, stdout=io.StringIO(), stderr=err)
+        self.assertEqual(list(Skatepark.objects.values_list('name', flat=True)), ['park1'])
+        self.assertIn('2行目', err.getvalue())
+        self.assertIn('3行目', err.getvalue())
+
+    def test_resume_from_checkpoint(self):
+        """
+        進捗ファイルがある時は登録済みの行を読み飛ばすテスト
+        """
+        rows = ''.join(f'park{i},東京都,渋谷\n' for i in range(4))
+        path = self.write_file('parks.csv', 'name,prefecture,city\n' + rows)
+        with open(path + '.checkpoint', 'w', encoding='utf-8') as checkpoint:
+            json.dump({'path': os.path.abspath(path), 'line': 2}, checkpoint)
+        call_command('import_skateparks', path, stdout=io.StringIO())
+        self.assertEqual(list(Skatepark.objects.order_by('id').values_list('name', flat=True)), ['park2', 'park3'])
+
+    def test_attach_images_from_directory(self):
+        """
+        画像ディレクトリの画像がメディアに保存されるテスト
+        """
+        images_dir = os.path.join(self.directory.name, 'images')
+        os.mkdir(images_dir)
+        with open(os.path.join(images_dir, 'park.jpg'), 'wb') as image:
+            image.write(b'image')
+        path = self.write_file('parks.csv', 'name,prefecture,city,image\npark,東京都,渋谷,park.jpg\n')
+        with self.settings(MEDIA_ROOT=os.path.join(self.directory.name, 'media')):
+            call_command('import_skateparks', path, '--images-dir', images_dir, stdout=io.StringIO())
+            skatepark = Skatepark.objects.get()
+            self.assertTrue(skatepark.skatepark_image.name.startswith('images/park'))
+            self.assertTrue(skatepark.skatepark_image.storage.exists(skatepark.skatepark_image.name))
+
+    def test_images_are_removed_when_batch_fails(self):
+        """
+        登録に失敗したバッチの画像はメディアに残らず、再開した時に1つだけ保存されるテスト
+        """
+        images_dir = os.path.join(self.directory.name, 'images')
+        os.mkdir(images_dir)
+        with open(os.path.join(images_dir, 'park.jpg'), 'wb') as image:
+            image.write(b'image')
+        path = self.write_file('parks.csv', 'name,prefecture,city,image\npark,東京都,渋谷,park.jpg\n')
+        media_root = os.path.join(self.directory.name, 'media')
+        with self.settings(MEDIA_ROOT=media_root):
+            with mock.patch('posts.clusters.add_locations', side_effect=RuntimeError):
+                with self.assertRaises(RuntimeError):
+                    call_command('import_skateparks', path, '--images-dir', images_dir, stdout=io.StringIO())
+            self.assertFalse(Skatepark.objects.exists())
+            self.assertEqual(os.listdir(os.path.join(media_root, 'images')), [])
+            call_command('import_skateparks', path, '--images-dir', images_dir, stdout=io.StringIO())
+            self.assertEqual(len(os.listdir(os.path.join(media_root, 'images'))), 1)
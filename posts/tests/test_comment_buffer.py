@@ -0,0 +1,153 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import comment_buffer, deletion
+from posts.models import Skatepark, Post, Comment, UserStats
+from posts.signals import comments_created
+from authentications.models import User
+
+
+class CommentBufferTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user1 = User.objects.create(username='test1', email='test1@mail.com', password='testpassword')
+        cls.user2 = User.objects.create(username='test2', email='test2@mail.com', password='testpassword')
+        skatepark = Skatepark.objects.create(
+            name='test', prefecture='東京都', city='渋谷', skatepark_image='test'
+        )
+        cls.post = Post.objects.create(author=cls.user1, skatepark=skatepark, body='test')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        patcher = override_settings(
+            COMMENT_BUFFER_DIR=self.directory, COMMENT_BUFFER_INTERVAL=0, COMMENT_BUFFER_BATCH_SIZE=3
+        )
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def test_accept_does_not_write_to_database(self):
+        """
+        受け付けたコメントはファイルに置かれ、書き込むまでデータベースにないかテスト
+        """
+        comment_buffer.accept(self.post.id, self.user1.id, 'hello')
+        self.assertEqual(Comment.objects.count(), 0)
+        self.assertEqual(len(comment_buffer.pending_names(self.directory)), 1)
+
+    def test_flush_keeps_order_and_sends_signal_per_batch(self):
+        """
+        受け付けた順に書き込み、バッチごとに1回だけcomments_createdを送るかテスト
+        """
+        for i in range(5):
+            author = self.user1 if i % 2 else self.user2
+            comment_buffer.accept(self.post.id, author.id, f'comment{i}')
+        handler = mock.Mock()
+        comments_created.connect(handler)
+        self.addCleanup(comments_created.disconnect, handler)
+
+        self.assertEqual(comment_buffer.flush(), 5)
+        self.assertEqual(
+            list(Comment.objects.order_by('id').values_list('body', flat=True)),
+            [f'comment{i}' for i in range(5)]
+        )
+        self.assertEqual([len(call.kwargs['comments']) for call in handler.call_args_list], [3, 2])
+        self.assertEqual(comment_buffer.pending_names(self.directory), [])
+        self.assertEqual(UserStats.objects.get(user=self.user2).comment_count, 3)
+
+    def test_flush_skips_comments_already_written(self):
+        """
+        書き込んだ後にファイルが残っていても、同じコメントを重複して書き込まないかテスト
+        """
+        buffer_id = comment_buffer.accept(self.post.id, self.user1.id, 'hello')
+        Comment.objects.create(post=self.post, author=self.user1, body='hello', buffer_id=buffer_id)
+        self.assertEqual(comment_buffer.flush(), 0)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(comment_buffer.pending_names(self.directory), [])
+
+    def test_flush_drops_comments_for_deleted_posts(self):
+        """
+        書き込む前に投稿が削除されたコメントは書き込まないかテスト
+        """
+        comment_buffer.accept(self.post.id + 100, self.user1.id, 'orphan')
+        comment_buffer.accept(self.post.id, self.user1.id, 'hello')
+        with self.assertLogs(comment_buffer.logger, 'WARNING') as logs:
+            self.assertEqual(comment_buffer.flush(), 1)
+        self.assertIn(f'post_id={self.post.id + 100}', logs.output[0])
+        self.assertEqual(list(Comment.objects.values_list('body', flat=True)), ['hello'])
+
+    def test_unfinished_files_are_ignored(self):
+        """
+        書き込み途中の一時ファイルは読まないかテスト
+        """
+        with open(os.path.join(self.directory, '.partial.tmp'), 'w') as f:
+            json.dump({}, f)
+        self.assertEqual(comment_buffer.flush(), 0)
+
+    def test_broken_files_are_quarantined(self):
+        """
+        読めないファイルは隔離用のディレクトリに移し、他のコメントは書き込むかテスト
+        """
+        comment_buffer.accept(self.post.id, self.user1.id, 'hello')
+        broken = {
+            '00000000000000000001-json.json': '{',
+            '00000000000000000002-key.json': json.dumps({'post_id': self.post.id}),
+            '00000000000000000003-uuid.json': json.dumps(
+                {'buffer_id': 'bad', 'post_id': self.post.id, 'author_id': self.user1.id, 'body': 'x'}
+            ),
+        }
+        for name, content in broken.items():
+            with open(os.path.join(self.directory, name), 'w') as f:
+                f.write(content)
+        with self.assertLogs(comment_buffer.logger, 'ERROR'):
+            self.assertEqual(comment_buffer.flush(), 1)
+        self.assertEqual(list(Comment.objects.values_list('body', flat=True)), ['hello'])
+        self.assertEqual(comment_buffer.pending_names(self.directory), [])
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.directory, comment_buffer.QUARANTINE_DIR))), sorted(broken)
+        )
+
+    def test_created_at_is_accept_time(self):
+        """
+        コメントの投稿日が、書き込んだ時刻ではなく受け付けた時刻になるかテスト
+        """
+        accepted_at = timezone.now() - timedelta(minutes=5)
+        with mock.patch.object(comment_buffer.timezone, 'now', return_value=accepted_at):
+            comment_buffer.accept(self.post.id, self.user1.id, 'hello')
+        comment_buffer.flush()
+        self.assertEqual(Comment.objects.get().created_at, accepted_at)
+
+    @override_settings(COMMENT_BUFFER_ENABLED=True)
+    def test_detail_view_buffers_comments(self):
+        """
+        有効な時は、投稿詳細ページのコメントをファイルに溜めてリダイレクトするかテスト
+        """
+        client = Client()
+        client.force_login(self.user1)
+        url = reverse('posts:detail', kwargs={'pk': self.post.pk})
+        response = client.post(url, {'body': 'buffered'})
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertEqual(Comment.objects.count(), 0)
+        comment_buffer.flush()
+        self.assertEqual(Comment.objects.get().author, self.user1)
+
+    @override_settings(COMMENT_BUFFER_ENABLED=True)
+    def test_detail_view_rejects_comments_for_deleted_posts(self):
+        """
+        有効な時も、ない投稿と削除済みの投稿へのコメントは受け付けずに404を返すかテスト
+        """
+        client = Client()
+        client.force_login(self.user1)
+        response = client.post(reverse('posts:detail', kwargs={'pk': self.post.pk + 100}), {'body': 'missing'})
+        self.assertEqual(response.status_code, 404)
+        deletion.soft_delete_post(self.post)
+        response = client.post(reverse('posts:detail', kwargs={'pk': self.post.pk}), {'body': 'deleted'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(comment_buffer.pending_names(self.directory), [])
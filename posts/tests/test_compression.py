@@ -0,0 +1,66 @@
+import gzip
+import json
+import zlib
+
+import brotli
+from django.test import TestCase
+from django.urls import reverse
+
+from sukeb.middleware import compress_brotli_sequence, compress_gzip_sequence
+
+from posts.models import Skatepark, Post
+from authentications.models import User
+
+
+class CompressionMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='test1', email='test1@mail.com', password='testpassword')
+        for i in range(20):
+            skatepark = Skatepark.objects.create(
+                name=f'park{i}', prefecture='東京都', city='渋谷', skatepark_image='test'
+            )
+            Post.objects.create(author=user, skatepark=skatepark, body=f'post{i}')
+
+    def test_html_is_compressed_with_brotli(self):
+        """
+        brotliに対応しているブラウザには、HTMLをbrotliで圧縮して返すかテスト
+        """
+        response = self.client.get(reverse('posts:list'), HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn('post19', brotli.decompress(response.content).decode())
+
+    def test_json_is_compressed_with_gzip(self):
+        """
+        gzipだけに対応しているブラウザには、JSONをgzipで圧縮して返すかテスト
+        """
+        response = self.client.get(reverse('api:posts'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        body = json.loads(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual(len(body['results']), 20)
+
+    def test_not_compressed_without_accept_encoding(self):
+        """
+        Accept-Encodingがない時は圧縮しないかテスト
+        """
+        response = self.client.get(reverse('posts:list'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_is_flushed_by_threshold(self):
+        """
+        ストリーミングのレスポンスは、最初のチャンクをすぐに送り、その後はチャンクごとにflushしないかテスト
+        """
+        chunks = [b'<head></head>'] + [f'<li>park{i}</li>'.encode() for i in range(1000)]
+        content = b''.join(chunks)
+
+        brotli_data = list(compress_brotli_sequence(iter(chunks), 5))
+        self.assertEqual(brotli.Decompressor().process(brotli_data[0]), chunks[0])
+        self.assertEqual(brotli.decompress(b''.join(brotli_data)), content)
+        self.assertLess(len(brotli_data), 10)
+
+        gzip_data = list(compress_gzip_sequence(iter(chunks)))
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.assertEqual(decompressor.decompress(gzip_data[0]), chunks[0])
+        self.assertEqual(gzip.decompress(b''.join(gzip_data)), content)
+        self.assertLess(len(gzip_data), 10)
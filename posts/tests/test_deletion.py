@@ -0,0 +1,157 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import deletion, stats
+from posts.models import Skatepark, Post, Comment, UserStats
+from authentications.models import User
+
+
+class DeletionTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        patcher = override_settings(MEDIA_ROOT=self.media_root)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+        self.user = User.objects.create(username='test1', email='test1@mail.com')
+        self.user.set_password('testpassword')
+        self.user.save()
+        self.other_user = User.objects.create(username='test2', email='test2@mail.com', password='testpassword')
+        self.post = self.create_post(self.user, 'park1')
+        Comment.objects.create(post=self.post, author=self.other_user, body='comment')
+
+    def create_post(self, author, name, prefecture='東京都'):
+        skatepark = Skatepark.objects.create(
+            name=name, prefecture=prefecture, city='渋谷',
+            skatepark_image=SimpleUploadedFile(f'{name}.jpg', b'image'),
+        )
+        return Post.objects.create(author=author, skatepark=skatepark, body=name)
+
+    def image_exists(self, skatepark):
+        return os.path.exists(os.path.join(self.media_root, skatepark.skatepark_image.name))
+
+    def test_delete_view_only_marks_post(self):
+        """
+        削除ページでは削除済みにするだけで、スケートパークとコメントはすぐには削除しないかテスト
+        """
+        self.client.login(email='test1@mail.com', password='testpassword')
+        response = self.client.post(reverse('posts:delete', kwargs={'pk': self.post.pk}))
+        self.assertRedirects(response, reverse('posts:list'))
+        self.assertFalse(Post.objects.filter(pk=self.post.pk).exists())
+        self.assertIsNotNone(Post.all_objects.get(pk=self.post.pk).deleted_at)
+        self.assertTrue(Skatepark.objects.filter(pk=self.post.skatepark_id).exists())
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(UserStats.objects.get(user=self.user).post_count, 0)
+
+    def test_detail_of_deleted_post_is_not_found(self):
+        """
+        削除済みの投稿の詳細ページとコメントは404を返すかテスト
+        """
+        deletion.soft_delete_post(self.post)
+        self.client.force_login(self.user)
+        url = reverse('posts:detail', kwargs={'pk': self.post.pk})
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.post(url, {'body': 'comment'}).status_code, 404)
+
+    def test_admin_deletes_selected_posts_with_one_update(self):
+        """
+        管理画面でまとめて削除した投稿を1回のUPDATEで削除済みにし、投稿者の集計値が正しいかテスト
+        """
+        tokyo = self.create_post(self.user, 'park2')
+        osaka = self.create_post(self.user, 'park3', prefecture='大阪府')
+        other = self.create_post(self.other_user, 'park4')
+        admin_user = User.objects.create_superuser(email='admin@mail.com', username='admin', password='testpassword')
+        self.client.force_login(admin_user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('admin:posts_post_changelist'), {
+                'action': 'delete_selected', 'post': 'yes',
+                '_selected_action': [self.post.pk, osaka.pk, other.pk],
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(Post.objects.order_by('id')), [tokyo])
+        updates = [query for query in queries if query['sql'].startswith('UPDATE "posts_post"')]
+        self.assertEqual(len(updates), 1)
+        for user in (self.user, self.other_user):
+            expected = stats._count_user_stats(user.id)
+            user_stats = UserStats.objects.get(user=user)
+            self.assertEqual(
+                (user_stats.post_count, user_stats.prefecture_count),
+                (expected['post_count'], expected['prefecture_count']),
+            )
+        self.assertEqual(UserStats.objects.get(user=self.user).prefecture_count, 1)
+
+    def test_purge_deletes_comments_skatepark_and_image(self):
+        """
+        purge_deletedコマンドが、削除済みの投稿をコメント、スケートパーク、画像と一緒に削除するかテスト
+        """
+        skatepark = self.post.skatepark
+        deletion.soft_delete_post(self.post)
+        out = StringIO()
+        call_command('purge_deleted', stdout=out)
+        self.assertIn('1件の投稿', out.getvalue())
+        self.assertFalse(Post.all_objects.exists())
+        self.assertFalse(Skatepark.objects.filter(pk=skatepark.pk).exists())
+        self.assertEqual(Comment.objects.count(), 0)
+        self.assertFalse(self.image_exists(skatepark))
+        self.assertEqual(UserStats.objects.get(user=self.user).post_count, 0)
+        self.assertEqual(UserStats.objects.get(user=self.other_user).comment_count, 0)
+
+    def test_purge_works_in_batches(self):
+        """
+        batch_sizeより多い投稿も全て削除し、削除していない投稿は残すかテスト
+        """
+        posts = [self.create_post(self.user, f'park{i}') for i in range(2, 5)]
+        for post in posts:
+            deletion.soft_delete_post(post)
+        self.assertEqual(deletion.purge_posts(batch_size=1), (3, 3))
+        self.assertEqual(list(Post.all_objects.all()), [self.post])
+
+    def test_image_used_by_another_skatepark_is_kept(self):
+        """
+        他のスケートパークも使っている画像ファイルは削除しないかテスト
+        """
+        skatepark = self.post.skatepark
+        Skatepark.objects.create(
+            name='copy', prefecture='東京都', city='渋谷', skatepark_image=skatepark.skatepark_image.name
+        )
+        deletion.soft_delete_post(self.post)
+        self.assertEqual(deletion.purge_posts(batch_size=10), (1, 0))
+        self.assertTrue(self.image_exists(skatepark))
+
+    def test_purge_deletes_users_with_posts_and_comments(self):
+        """
+        退会済みのユーザーを、投稿と他の投稿へのコメントと一緒に削除するかテスト
+        """
+        other_post = self.create_post(self.other_user, 'park2')
+        Comment.objects.create(post=other_post, author=self.user, body='by user')
+        deletion.soft_delete_user(self.user)
+        self.assertFalse(Client().login(email='test1@mail.com', password='testpassword'))
+        self.assertFalse(Post.objects.filter(author=self.user).exists())
+
+        result = deletion.purge_deleted(batch_size=1)
+        self.assertEqual(result, {'users': 1, 'posts': 1, 'images': 1})
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(list(Post.objects.all()), [other_post])
+        self.assertEqual(Comment.objects.count(), 0)
+
+    def test_sweep_deletes_only_old_unused_images(self):
+        """
+        どのスケートパークも使っていない古い画像ファイルだけを削除するかテスト
+        """
+        storage = Skatepark._meta.get_field('skatepark_image').storage
+        orphan = storage.save('images/orphan.jpg', SimpleUploadedFile('orphan.jpg', b'image'))
+        self.assertEqual(deletion.sweep_images(timedelta(hours=1)), 0)
+        self.assertEqual(deletion.sweep_images(timedelta(seconds=-1)), 1)
+        self.assertFalse(storage.exists(orphan))
+        self.assertTrue(self.image_exists(self.post.skatepark))
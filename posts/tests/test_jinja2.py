@@ -0,0 +1,107 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Skatepark, Post, Comment
+from authentications.models import User
+
+
+JINJA2_TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'DIRS': [settings.TEMPLATES_DIR + '/jinja2'],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            'environment': 'sukeb.jinja2.environment',
+            'context_processors': ['posts.context_processors.notifications'],
+        },
+    },
+    *settings.TEMPLATES,
+]
+
+
+@override_settings(TEMPLATES=JINJA2_TEMPLATES)
+class Jinja2PagesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='jinjauser', email='jinja@mail.com', password='testpassword')
+        skatepark = Skatepark.objects.create(
+            name='jinjapark', prefecture='神奈川県', city='横浜市', skatepark_image='test1'
+        )
+        cls.post = Post.objects.create(body='Jinja2で表示する投稿', skatepark=skatepark, author=cls.user)
+        Comment.objects.create(post=cls.post, author=cls.user, body='Jinja2で表示するコメント')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_list_page_is_rendered_by_jinja2(self):
+        """
+        USE_JINJA2の時、投稿一覧ページがJinja2のテンプレートで同じ内容を表示するか
+        """
+        response = self.client.get(reverse('posts:list'))
+        self.assertEqual(response.status_code, 200)
+        # Djangoのテンプレートで描画するのは、共通の部品だけ
+        self.assertEqual(
+            {template.name for template in response.templates}, {'head.html', 'posts/post_cards.html'}
+        )
+        self.assertContains(response, self.post.get_absolute_url())
+        self.assertContains(response, reverse('authentications:profile', kwargs={'pk': self.user.id}))
+        self.assertContains(response, f'{reverse("posts:list")}?query=北海道')
+
+    def test_detail_page_is_rendered_by_jinja2(self):
+        """
+        USE_JINJA2の時、投稿詳細ページにコメントとCSRFトークンが表示されるか
+        """
+        with mock.patch('posts.views.get_current_weather', return_value='晴れ'):
+            response = self.client.get(self.post.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '現在の天気: 晴れ')
+        self.assertContains(response, 'Jinja2で表示するコメント')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertContains(response, reverse('posts:delete', args=[self.post.id]))
+
+    def test_profile_page_is_rendered_by_jinja2(self):
+        """
+        USE_JINJA2の時、ユーザーのプロフィールページに投稿が表示されるか
+        """
+        response = self.client.get(reverse('authentications:profile', kwargs={'pk': self.user.id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'jinjauserさんの投稿一覧')
+        self.assertContains(response, 'Jinja2で表示する投稿')
+        self.assertNotContains(response, 'pagination')
+
+    def test_prefecture_follow_button_is_rendered_by_jinja2(self):
+        """
+        USE_JINJA2の時、県名で絞り込んだ投稿一覧ページにフォローボタンが表示されるか
+        """
+        response = self.client.get(reverse('posts:list'), {'query': '神奈川県'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '神奈川県をフォローする')
+        self.assertContains(response, reverse('posts:timeline'))
+
+    def test_notification_badge_is_rendered_by_jinja2(self):
+        """
+        USE_JINJA2の時、ヘッダーに未読の通知の件数が表示されるか
+        """
+        other = User.objects.create_user(username='other', email='other@mail.com', password='testpassword')
+        cache.clear()
+        Comment.objects.create(post=self.post, author=other, body='通知されるコメント')
+        response = self.client.get(reverse('posts:notifications'))
+        self.assertContains(response, '<span class="tag is-danger is-rounded ml-1">1</span>', html=True)
+        self.assertContains(response, '通知されるコメント')
+
+    def test_shared_parts_come_from_django_templates(self):
+        """
+        USE_JINJA2の時も、headと投稿カードはDjangoのページやフラグメントと同じテンプレートから描画するか
+        """
+        response = self.client.get(reverse('posts:list'))
+        content = response.content.decode()
+        self.assertIn(engines['django'].get_template('head.html').render(), content)
+        cards = engines['django'].get_template('posts/post_cards.html').render({'posts': [self.post]})
+        self.assertIn(cards, content)
+        fragment = self.client.get(reverse('posts:fragment'))
+        self.assertEqual(fragment.content.decode(), cards)
@@ -0,0 +1,186 @@
+import asyncio
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import TestCase
+
+from posts import deletion, live
+from posts.models import Skatepark, Post, Comment
+from authentications.models import User
+
+
+class FakeApplication:
+    """
+    イベントのURL以外のリクエストを受け取ったか記録するASGIアプリ
+    """
+    def __init__(self):
+        self.called = False
+
+    async def __call__(self, scope, receive, send):
+        self.called = True
+
+
+class LiveCommentsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='liveuser', email='live@mail.com', password='testpassword')
+        skatepark = Skatepark.objects.create(name='livepark', prefecture='東京都', city='渋谷', skatepark_image='test')
+        cls.post = Post.objects.create(author=cls.user, skatepark=skatepark, body='live')
+        cls.old_comment = Comment.objects.create(post=cls.post, author=cls.user, body='前のコメント')
+
+    def setUp(self):
+        self.broker = live.InMemoryBroker()
+        patcher = mock.patch.object(live, 'get_broker', return_value=self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # TestCaseのトランザクションの中なので、テストクライアントと同じように接続を閉じない
+        patcher = mock.patch.object(live, 'close_old_connections')
+        self.close_old_connections = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_login(self.user)
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    def scope(self, path, query_string=b'', cookie=True):
+        headers = [(b'cookie', self.cookie.encode())] if cookie else []
+        return {'type': 'http', 'path': path, 'query_string': query_string, 'headers': headers}
+
+    def run_stream(self, scope, publish=(), expected_events=0):
+        """
+        イベントのストリームに接続し、publishのコメントを配ってから切断して、送られたメッセージを返す
+        """
+        async def run():
+            messages = []
+            disconnect = asyncio.Event()
+            received = asyncio.Event()
+
+            async def receive():
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                messages.append(message)
+                events = sum(b'event: comment' in message.get('body', b'') for message in messages)
+                if events >= expected_events:
+                    received.set()
+
+            application = live.LiveCommentsApplication(FakeApplication())
+            task = asyncio.ensure_future(application(scope, receive, send))
+            while not messages and not task.done():
+                await asyncio.sleep(0.01)
+            # 購読が始まってからコメントを配る
+            await asyncio.sleep(0.05)
+            for payload in publish:
+                self.broker.publish(payload)
+            if expected_events:
+                await asyncio.wait_for(received.wait(), 5)
+            disconnect.set()
+            await asyncio.wait_for(task, 5)
+            return messages
+
+        return async_to_sync(run)()
+
+    def events(self, messages):
+        body = b''.join(message.get('body', b'') for message in messages).decode()
+        return [
+            json.loads(line[len('data: '):]) for line in body.splitlines() if line.startswith('data: ')
+        ]
+
+    def test_pushes_published_comments_of_the_post(self):
+        """
+        接続している投稿のコメントだけが送られるかテスト
+        """
+        other = {'post_id': self.post.id + 1, 'id': 1000, 'author': 'a', 'body': '別の投稿', 'created_at': ''}
+        comment = {'post_id': self.post.id, 'id': 1001, 'author': 'a', 'body': '新しいコメント', 'created_at': ''}
+        messages = self.run_stream(
+            self.scope(f'/posts/detail/{self.post.id}/events'), publish=[other, comment], expected_events=1
+        )
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual([event['body'] for event in self.events(messages)], ['新しいコメント'])
+
+    def test_sends_comments_after_the_given_id_first(self):
+        """
+        afterより後のコメントを最初に送るかテスト
+        """
+        new_comment = Comment.objects.create(post=self.post, author=self.user, body='後のコメント')
+        messages = self.run_stream(
+            self.scope(f'/posts/detail/{self.post.id}/events', f'after={self.old_comment.id}'.encode()),
+            expected_events=1,
+        )
+        self.assertEqual([event['id'] for event in self.events(messages)], [new_comment.id])
+
+    def test_rejects_anonymous_user(self):
+        """
+        ログインしていない時は403を返すかテスト
+        """
+        messages = self.run_stream(self.scope(f'/posts/detail/{self.post.id}/events', cookie=False))
+        self.assertEqual(messages[0]['status'], 403)
+
+    def test_rejects_session_after_password_change(self):
+        """
+        パスワードを変えて無効になったセッションは403を返すかテスト
+        """
+        self.user.set_password('newpassword')
+        self.user.save()
+        messages = self.run_stream(self.scope(f'/posts/detail/{self.post.id}/events'))
+        self.assertEqual(messages[0]['status'], 403)
+
+    def test_rejects_inactive_and_deleted_user(self):
+        """
+        無効にしたユーザーと、退会したユーザーのセッションは403を返すかテスト
+        """
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        messages = self.run_stream(self.scope(f'/posts/detail/{self.post.id}/events'))
+        self.assertEqual(messages[0]['status'], 403)
+
+        User.objects.filter(pk=self.user.pk).update(is_active=True)
+        self.client.force_login(self.user)
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        deletion.soft_delete_user(self.user)
+        messages = self.run_stream(self.scope(f'/posts/detail/{self.post.id}/events'))
+        self.assertEqual(messages[0]['status'], 403)
+
+    def test_passes_other_requests_to_django(self):
+        """
+        イベント以外のURLはDjangoのアプリに渡すかテスト
+        """
+        fallback = FakeApplication()
+        async_to_sync(live.LiveCommentsApplication(fallback))(self.scope('/'), None, None)
+        self.assertTrue(fallback.called)
+
+    def test_publishes_comment_after_commit(self):
+        """
+        コメントを保存した時、コミットしてからブローカーに配るかテスト
+        """
+        with mock.patch.object(self.broker, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                comment = Comment.objects.create(post=self.post, author=self.user, body='配るコメント')
+                publish.assert_not_called()
+        publish.assert_called_once_with(live.comment_payload(comment))
+
+    def test_closes_old_connections_around_queries(self):
+        """
+        リクエストの外で読むデータベースの前後で、古い接続を閉じるかテスト
+        """
+        messages = self.run_stream(
+            self.scope(f'/posts/detail/{self.post.id}/events', f'after={self.old_comment.id}'.encode())
+        )
+        self.assertEqual(messages[0]['status'], 200)
+        # セッション、投稿、コメントの3回の読み込みの前後
+        self.assertEqual(self.close_old_connections.call_count, 6)
+
+    def test_listener_closes_connection_before_reconnecting(self):
+        """
+        LISTEN用の接続が切れた時、閉じてからつなぎ直すかテスト
+        """
+        broker = live.PostgresBroker()
+        conn = mock.Mock()
+        conn.cursor.side_effect = Exception('connection lost')
+        with mock.patch('psycopg2.connect', return_value=conn), \
+                mock.patch.object(live.connections['default'], 'get_connection_params', return_value={}), \
+                mock.patch.object(live.time, 'sleep', side_effect=[None, SystemExit]), \
+                self.assertLogs(live.logger, 'ERROR'):
+            with self.assertRaises(SystemExit):
+                broker._listen()
+        self.assertEqual(conn.close.call_count, 2)
@@ -1,8 +1,15 @@
+from unittest import mock
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.db.utils import DataError
 
 from authentications.models import User
-from posts.models import Skatepark, Post
+from posts.models import Skatepark, Post, Comment, UserStats, SkateparkCluster
+from posts.stats import refresh_user_stats
+from posts.geo import grid_cell, haversine_km, nearby_skateparks
+from posts.clusters import CLUSTER_MAX_ZOOM, add_locations, cluster_key, rebuild_clusters
 
 
 class SkateparkModelTest(TestCase):
@@ -148,4 +155,199 @@ class PostModelTest(TestCase):
         """ 
         Postクラスのオブジェクト文字列が投稿内容の最初の50字と一致するテスト
         """
-        self.assertEqual(str(self.post), self.post.body[:50])
\ No newline at end of file
+        self.assertEqual(str(self.post), self.post.body[:50])
+
+
+class UserStatsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='testuser', email='test@mail.com', password='testpassword')
+        self.other = User.objects.create(username='other', email='other@mail.com', password='testpassword')
+
+    def create_post(self, prefecture, author=None):
+        skatepark = Skatepark.objects.create(
+            name='park', prefecture=prefecture, city='横浜', skatepark_image='test_image.jpg'
+        )
+        return Post.objects.create(author=author or self.user, skatepark=skatepark, body='body')
+
+    def test_counts_are_updated_when_posts_are_created(self):
+        """
+        投稿を作成すると投稿数と都道府県数が増えるテスト
+        """
+        self.create_post('神奈川県')
+        self.create_post('神奈川県')
+        self.create_post('東京都')
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual(stats.post_count, 3)
+        self.assertEqual(stats.prefecture_count, 2)
+
+    def test_counts_are_updated_when_posts_are_deleted(self):
+        """
+        投稿を削除すると投稿数と都道府県数が減るテスト
+        """
+        post1 = self.create_post('神奈川県')
+        post2 = self.create_post('神奈川県')
+        post1.delete()
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual(stats.post_count, 1)
+        self.assertEqual(stats.prefecture_count, 1)
+        post2.delete()
+        stats.refresh_from_db()
+        self.assertEqual(stats.prefecture_count, 0)
+
+    def test_comment_count_is_updated(self):
+        """
+        コメントの作成と削除でコメントした人のコメント数が変わるテスト
+        """
+        post = self.create_post('神奈川県')
+        comment = Comment.objects.create(author=self.other, post=post, body='comment')
+        self.assertEqual(UserStats.objects.get(user=self.other).comment_count, 1)
+        comment.delete()
+        self.assertEqual(UserStats.objects.get(user=self.other).comment_count, 0)
+
+    def test_incremental_counts_match_full_refresh(self):
+        """
+        差分更新の結果が最初から計算し直した結果と一致するテスト
+        """
+        post = self.create_post('神奈川県')
+        self.create_post('東京都')
+        Comment.objects.create(author=self.user, post=post, body='comment')
+        stats = UserStats.objects.get(user=self.user)
+        refreshed = refresh_user_stats(self.user.id)
+        self.assertEqual(
+            (stats.post_count, stats.comment_count, stats.prefecture_count),
+            (refreshed.post_count, refreshed.comment_count, refreshed.prefecture_count),
+        )
+
+    def test_delta_is_added_when_stats_are_created_concurrently(self):
+        """
+        集計を作成する間に別のリクエストが作成していても、差分を失わずに足すテスト
+        """
+        post = self.create_post('神奈川県')
+        UserStats.objects.filter(user=self.other).delete()
+
+        def created_concurrently(**kwargs):
+            # 別のリクエストが、このコメントを数える前の集計を先に作成した状態にする
+            return UserStats.objects.create(user=self.other), False
+
+        with mock.patch.object(UserStats.objects, 'get_or_create', side_effect=created_concurrently):
+            Comment.objects.create(author=self.other, post=post, body='comment')
+        self.assertEqual(UserStats.objects.get(user=self.other).comment_count, 1)
+
+
+class SkateparkLocationTest(TestCase):
+    def create_skatepark(self, name, latitude, longitude):
+        return Skatepark.objects.create(
+            name=name, prefecture='東京都', city='渋谷', skatepark_image='test_image.jpg',
+            latitude=latitude, longitude=longitude
+        )
+
+    def test_grid_cell_is_set_on_save(self):
+        """
+        保存する時に緯度経度からグリッドのマス番号が設定されるテスト
+        """
+        skatepark = self.create_skatepark('shibuya', 35.658, 139.701)
+        self.assertEqual((skatepark.grid_lat, skatepark.grid_lng), grid_cell(35.658, 139.701))
+
+    def test_grid_cell_is_empty_without_location(self):
+        """
+        緯度経度がない時はマス番号も空になるテスト
+        """
+        skatepark = self.create_skatepark('unknown', None, None)
+        self.assertIsNone(skatepark.grid_lat)
+
+    def test_nearby_skateparks_are_ordered_by_distance(self):
+        """
+        近い順にk件返し、遠いマスにあるスケートパークも範囲を広げて見つけるテスト
+        """
+        self.create_skatepark('shibuya', 35.658, 139.701)
+        self.create_skatepark('yokohama', 35.444, 139.638)
+        self.create_skatepark('shinjuku', 35.690, 139.700)
+        self.create_skatepark('osaka', 34.693, 135.502)
+        self.create_skatepark('unknown', None, None)
+        nearest = nearby_skateparks(35.681, 139.767, k=3)
+        self.assertEqual([park['name'] for _, park in nearest], ['shinjuku', 'shibuya', 'yokohama'])
+        distances = [distance for distance, _ in nearest]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_nearby_skateparks_respects_max_distance(self):
+        """
+        max_distance_kmより遠いスケートパークは返さないテスト
+        """
+        self.create_skatepark('osaka', 34.693, 135.502)
+        self.assertEqual(nearby_skateparks(35.681, 139.767, k=3, max_distance_km=100), [])
+
+    def test_nearby_skateparks_near_pole_stops_after_few_queries(self):
+        """
+        極の近くでも、範囲を数回広げるだけで検索を終えるテスト
+        """
+        self.create_skatepark('north', 89.95, 10.0)
+        with self.assertNumQueries(6):
+            nearest = nearby_skateparks(90, 0, k=3)
+        self.assertEqual([park['name'] for _, park in nearest], ['north'])
+
+    def test_haversine_distance(self):
+        """
+        東京駅から大阪駅までの距離がおよそ400kmになるテスト
+        """
+        self.assertAlmostEqual(haversine_km(35.681, 139.767, 34.702, 135.496), 403, delta=3)
+
+
+class SkateparkClusterTest(TestCase):
+    def create_skatepark(self, latitude, longitude):
+        return Skatepark.objects.create(
+            name='park', prefecture='東京都', city='渋谷', skatepark_image='test_image.jpg',
+            latitude=latitude, longitude=longitude
+        )
+
+    def cluster_counts(self):
+        return dict(
+            ((cluster.zoom, cluster.tile_x, cluster.tile_y, cluster.cell), cluster.count)
+            for cluster in SkateparkCluster.objects.all()
+        )
+
+    def test_clusters_are_added_for_every_zoom(self):
+        """
+        スケートパークを作成すると全てのズームレベルのクラスタに追加されるテスト
+        """
+        self.create_skatepark(35.658, 139.701)
+        self.create_skatepark(35.659, 139.702)
+        self.assertEqual(SkateparkCluster.objects.filter(zoom=0).get().count, 2)
+        self.assertEqual(
+            sum(cluster.count for cluster in SkateparkCluster.objects.all()), 2 * (CLUSTER_MAX_ZOOM + 1)
+        )
+
+    def test_clusters_follow_location_changes_and_deletes(self):
+        """
+        緯度経度の変更と削除でクラスタが更新されるテスト
+        """
+        skatepark = self.create_skatepark(35.658, 139.701)
+        skatepark.latitude, skatepark.longitude = 34.693, 135.502
+        skatepark.save()
+        key = cluster_key(34.693, 135.502, CLUSTER_MAX_ZOOM)
+        self.assertEqual(self.cluster_counts()[key], 1)
+        self.assertNotIn(cluster_key(35.658, 139.701, CLUSTER_MAX_ZOOM), self.cluster_counts())
+        skatepark.delete()
+        self.assertFalse(SkateparkCluster.objects.exists())
+
+    def test_rebuild_matches_incremental_clusters(self):
+        """
+        作り直したクラスタが差分更新したクラスタと一致するテスト
+        """
+        self.create_skatepark(35.658, 139.701)
+        self.create_skatepark(34.693, 135.502)
+        self.create_skatepark(None, None)
+        incremental = self.cluster_counts()
+        rebuild_clusters()
+        self.assertEqual(self.cluster_counts(), incremental)
+
+    def test_batch_of_locations_is_written_with_few_queries(self):
+        """
+        まとめて追加した緯度経度は、クラスタごとではなくまとめて書き込まれるテスト
+        """
+        locations = [(35 + i / 10, 139 + i / 10) for i in range(20)]
+        with CaptureQueriesContext(connection) as queries:
+            add_locations(locations)
+        self.assertLess(len(queries), 10)
+        self.assertEqual(SkateparkCluster.objects.get(zoom=0).count, 20)
+        add_locations(locations[:1])
+        self.assertEqual(SkateparkCluster.objects.get(zoom=0).count, 21)
@@ -0,0 +1,114 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import comment_buffer, notifications
+from posts.deletion import soft_delete_post
+from posts.models import Skatepark, Post, Comment, Notification
+from authentications.models import User
+
+
+class NotificationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author', email='author@mail.com', password='testpassword')
+        cls.commenter = User.objects.create(username='commenter', email='commenter@mail.com', password='testpassword')
+        cls.posts = []
+        for i in range(2):
+            skatepark = Skatepark.objects.create(
+                name=f'park{i}', prefecture='東京都', city='渋谷', skatepark_image='test'
+            )
+            cls.posts.append(Post.objects.create(author=cls.author, skatepark=skatepark, body=f'post{i}'))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_batch_of_comments_is_one_insert(self):
+        """
+        まとめて作成されたコメントの通知を1回のINSERTで作り、自分のコメントは通知しないかテスト
+        """
+        comments = Comment.objects.bulk_create([
+            Comment(post=self.posts[0], author=self.commenter, body='one'),
+            Comment(post=self.posts[1], author=self.commenter, body='two'),
+            Comment(post=self.posts[1], author=self.author, body='mine'),
+        ])
+        with self.assertNumQueries(2):
+            notifications.record_comments_created(comments)
+        self.assertEqual(
+            sorted(Notification.objects.values_list('comment__body', flat=True)), ['one', 'two']
+        )
+
+    def test_unread_count_is_cached_and_updated(self):
+        """
+        未読の件数をキャッシュから返し、コメントされると増え、既読にすると0になるかテスト
+        """
+        self.assertEqual(notifications.unread_count(self.author), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.posts[0], author=self.commenter, body='hello')
+        with self.assertNumQueries(0):
+            self.assertEqual(notifications.unread_count(self.author), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(notifications.mark_all_read(self.author), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(notifications.unread_count(self.author), 0)
+
+    def test_buffered_comments_are_notified(self):
+        """
+        ファイルに溜めてから書き込んだコメントも通知されるかテスト
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with self.settings(COMMENT_BUFFER_DIR=directory):
+            comment_buffer.accept(self.posts[0].id, self.commenter.id, 'buffered')
+            comment_buffer.flush()
+        self.assertEqual(Notification.objects.get().recipient, self.author)
+
+    def test_send_digests_groups_per_user(self):
+        """
+        未読の通知をユーザーごとに1通のメールにまとめて送り、2回目は送らないかテスト
+        """
+        for body in ('one', 'two'):
+            Comment.objects.create(post=self.posts[0], author=self.commenter, body=body)
+        Comment.objects.create(post=self.posts[0], author=self.author, body='reply')
+        out = StringIO()
+        call_command('send_digests', batch_size=1, stdout=out)
+        self.assertIn('1人に2件', out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['author@mail.com'])
+        self.assertIn('one', mail.outbox[0].body)
+        self.assertIn('two', mail.outbox[0].body)
+
+        self.assertEqual(notifications.send_digests(batch_size=1), (0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_read_and_deleted_notifications_are_not_sent(self):
+        """
+        既読の通知と、削除済みの投稿への通知はメールで送らないかテスト
+        """
+        Comment.objects.create(post=self.posts[0], author=self.commenter, body='read')
+        notifications.mark_all_read(self.author)
+        Comment.objects.create(post=self.posts[1], author=self.commenter, body='deleted')
+        soft_delete_post(self.posts[1])
+        self.assertEqual(notifications.send_digests(batch_size=10), (0, 0))
+        self.assertEqual(mail.outbox, [])
+
+    def test_notifications_page_shows_badge_and_marks_read(self):
+        """
+        ヘッダーに未読の件数が表示され、既読にすると消えるかテスト
+        """
+        Comment.objects.create(post=self.posts[0], author=self.commenter, body='hello')
+        self.client.force_login(self.author)
+        url = reverse('posts:notifications')
+        response = self.client.get(url)
+        self.assertContains(response, '<span class="tag is-danger is-rounded ml-1">1</span>', html=True)
+        self.assertContains(response, 'hello')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url)
+        self.assertRedirects(response, url)
+        self.assertNotContains(self.client.get(url), 'is-danger')
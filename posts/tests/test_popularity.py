@@ -0,0 +1,96 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import popularity
+from posts.deletion import soft_delete_post
+from posts.models import Skatepark, Post, Comment
+from authentications.models import User
+
+
+class PopularityTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='test1', email='test1@mail.com', password='testpassword')
+        cls.posts = []
+        for i in range(3):
+            skatepark = Skatepark.objects.create(
+                name=f'park{i}', prefecture='東京都', city='渋谷', skatepark_image='test'
+            )
+            cls.posts.append(Post.objects.create(author=cls.user, skatepark=skatepark, body=f'post{i}'))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def comment(self, post, count=1):
+        for _ in range(count):
+            Comment.objects.create(post=post, author=self.user, body='comment')
+
+    def test_comments_increase_popularity(self):
+        """
+        コメントのたびに投稿の人気度が増えるかテスト
+        """
+        self.comment(self.posts[0], 2)
+        popularity.record_comments_created(
+            Comment(post=post) for post in (self.posts[0], self.posts[1], self.posts[1])
+        )
+        self.assertEqual(
+            list(Post.objects.order_by('id').values_list('popularity', flat=True)), [3.0, 2.0, 0.0]
+        )
+
+    def test_popular_view_orders_by_popularity(self):
+        """
+        人気の投稿ページが人気度の高い順に並び、コメントのない投稿と削除済みの投稿を表示しないかテスト
+        """
+        self.comment(self.posts[0], 1)
+        self.comment(self.posts[1], 3)
+        self.comment(self.posts[2], 2)
+        soft_delete_post(self.posts[2])
+        response = self.client.get(reverse('posts:popular'))
+        self.assertTemplateUsed(response, 'posts/posts_popular.html')
+        self.assertEqual(list(response.context['post_list']), [self.posts[1], self.posts[0]])
+
+    def test_decay_halves_scores_and_drops_small_ones(self):
+        """
+        半減期の分だけ人気度が半分になり、小さな人気度は0になるかテスト
+        """
+        Post.objects.filter(id=self.posts[0].id).update(popularity=4)
+        Post.objects.filter(id=self.posts[1].id).update(popularity=0.015)
+        out = StringIO()
+        call_command('decay_popularity', '--hours', '24', '--batch-size', '1', stdout=out)
+        self.assertIn('2件', out.getvalue())
+        self.assertEqual(
+            list(Post.objects.order_by('id').values_list('popularity', flat=True)), [2.0, 0.0, 0.0]
+        )
+
+    def test_rebuild_weights_comments_by_age(self):
+        """
+        計算し直す時は、古いコメントほど小さな点数にするかテスト
+        """
+        self.comment(self.posts[0], 1)
+        self.comment(self.posts[1], 1)
+        Comment.objects.filter(post=self.posts[1]).update(created_at=timezone.now() - timedelta(hours=24))
+        popularity.rebuild(batch_size=100, half_life_hours=24)
+        self.posts[0].refresh_from_db()
+        self.posts[1].refresh_from_db()
+        self.assertAlmostEqual(self.posts[0].popularity, 1, places=3)
+        self.assertAlmostEqual(self.posts[1].popularity, 0.5, places=3)
+
+    def test_popular_query_uses_index(self):
+        """
+        人気の投稿を読むクエリがインデックスを使うかテスト
+        """
+        queryset = Post.objects.filter(popularity__gt=0).order_by('-popularity', '-id')[:20]
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # 行が少ないとシーケンシャルスキャンが選ばれるので、インデックスを使えるかだけを見る
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {"QUERY PLAN " if connection.vendor == "sqlite" else ""}{sql}', params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('posts_post_popular_idx', plan)
@@ -0,0 +1,146 @@
+import os
+import uuid
+from unittest import mock, skipUnless
+
+import redis
+from django.core.cache import cache, caches
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from posts.models import Skatepark, Post, Comment
+from authentications.models import User
+from sukeb import ratelimit
+
+
+RATE_LIMITS = {
+    'posts:detail': (2, 60),
+    'authentications:login': (2, 60),
+}
+
+
+@override_settings(RATE_LIMITS=RATE_LIMITS, RATE_LIMIT_ENABLED=True)
+class RateLimitMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='test1', email='test1@mail.com')
+        cls.user.set_password('testpassword')
+        cls.user.save()
+        cls.other_user = User.objects.create(username='test2', email='test2@mail.com', password='testpassword')
+        skatepark = Skatepark.objects.create(
+            name='test', prefecture='東京都', city='渋谷', skatepark_image='test'
+        )
+        cls.post = Post.objects.create(author=cls.user, skatepark=skatepark, body='test')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.credentials = {'email': 'test1@mail.com', 'password': 'wrongpassword'}
+        self.addCleanup(cache.clear)
+
+    def test_login_is_rejected_before_view_when_over_limit(self):
+        """
+        制限を超えたログインはビューを呼ばずに、Retry-Afterをつけて429を返すかテスト
+        """
+        with mock.patch('authentications.views.authenticate', return_value=None) as authenticate:
+            for _ in range(2):
+                response = self.client.post(reverse('authentications:login'), self.credentials)
+                self.assertEqual(response.status_code, 302)
+            response = self.client.post(reverse('authentications:login'), self.credentials)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(authenticate.call_count, 2)
+
+    def test_get_is_not_limited(self):
+        """
+        GETリクエストは回数を制限しないかテスト
+        """
+        for _ in range(3):
+            response = self.client.get(reverse('authentications:login'))
+            self.assertEqual(response.status_code, 200)
+
+    def test_ip_addresses_have_separate_buckets(self):
+        """
+        ログインしていない時はIPアドレスごとに制限するかテスト
+        """
+        url = reverse('authentications:login')
+        for _ in range(2):
+            self.client.post(url, self.credentials, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(self.client.post(url, self.credentials, REMOTE_ADDR='10.0.0.1').status_code, 429)
+        self.assertEqual(self.client.post(url, self.credentials, REMOTE_ADDR='10.0.0.2').status_code, 302)
+
+    def test_comments_are_limited_per_user(self):
+        """
+        ログインしている時は同じIPアドレスでもユーザーごとに制限するかテスト
+        """
+        url = reverse('posts:detail', kwargs={'pk': self.post.pk})
+        self.client.force_login(self.user)
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, {'body': 'spam'}).status_code, 302)
+        self.assertEqual(self.client.post(url, {'body': 'spam'}).status_code, 429)
+        self.assertEqual(Comment.objects.count(), 2)
+
+        other_client = Client()
+        other_client.force_login(self.other_user)
+        self.assertEqual(other_client.post(url, {'body': 'hello'}).status_code, 302)
+
+    def test_tokens_are_refilled_over_time(self):
+        """
+        時間が経つとトークンが補充されて、再びリクエストできるかテスト
+        """
+        with mock.patch.object(ratelimit.time, 'time', return_value=1000.0):
+            self.assertEqual(ratelimit.take_token('test', 2, 60), 0)
+            self.assertEqual(ratelimit.take_token('test', 2, 60), 0)
+            self.assertEqual(ratelimit.take_token('test', 2, 60), 30)
+        with mock.patch.object(ratelimit.time, 'time', return_value=1030.0):
+            self.assertEqual(ratelimit.take_token('test', 2, 60), 0)
+            self.assertEqual(ratelimit.take_token('test', 2, 60), 30)
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_not_limited_when_disabled(self):
+        """
+        RATE_LIMIT_ENABLEDがFalseの時は制限しないかテスト
+        """
+        url = reverse('authentications:login')
+        for _ in range(3):
+            self.assertEqual(self.client.post(url, self.credentials).status_code, 302)
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'ratelimit': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379/0'},
+    }, RATE_LIMIT_CACHE='ratelimit')
+    def test_redis_uses_single_script_call(self):
+        """
+        Redisの時は、Luaスクリプトを1回呼ぶだけでトークンを消費するかテスト
+        """
+        client = mock.Mock()
+        client.register_script.return_value.return_value = b'12.5'
+        with mock.patch.object(ratelimit, '_redis_scripts', {}), \
+                mock.patch.object(redis.Redis, 'from_url', return_value=client) as from_url:
+            wait = ratelimit.take_token('test', 2, 60)
+            ratelimit.take_token('test', 2, 60)
+        self.assertEqual(wait, 12.5)
+        from_url.assert_called_once_with('redis://localhost:6379/0')
+        client.register_script.assert_called_once_with(ratelimit.TOKEN_BUCKET_SCRIPT)
+        client.register_script.return_value.assert_called_with(
+            keys=[caches['ratelimit'].make_and_validate_key('ratelimit:test')], args=[2, 2 / 60]
+        )
+
+    @skipUnless(os.environ.get('REDIS_URL'), 'REDIS_URLを指定した時だけ、Redisでスクリプトを実行する')
+    def test_redis_script_refills_tokens(self):
+        """
+        RedisでLuaスクリプトを実行し、トークンを消費して、足りない時は待つ秒数を返すかテスト
+        """
+        location = os.environ['REDIS_URL']
+        # 本物のキャッシュと混ざらないように、テストごとのプレフィックスをつける
+        with override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'ratelimit': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': location,
+                'KEY_PREFIX': f'test-{uuid.uuid4()}',
+            },
+        }, RATE_LIMIT_CACHE='ratelimit'):
+            self.addCleanup(caches['ratelimit'].delete, 'ratelimit:test')
+            self.assertEqual(ratelimit.take_token('test', 2, 60), 0)
+            self.assertEqual(ratelimit.take_token('test', 2, 60), 0)
+            self.assertAlmostEqual(ratelimit.take_token('test', 2, 60), 30, delta=1)
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+
+# ワーカーの起動時に読み込まず、初めて使う時に読み込むモジュール
+LAZY_MODULES = ('requests', 'PIL', 'dotenv')
+
+STARTUP_CODE = (
+    'import sys\n'
+    'import sukeb.wsgi\n'
+    'from django.urls import get_resolver\n'
+    'get_resolver().url_patterns\n'
+    'print(",".join(name for name in {modules!r} if name in sys.modules))\n'
+)
+
+
+class StartupImportTest(SimpleTestCase):
+    def test_heavy_modules_are_not_imported_on_startup(self):
+        """
+        アプリとURLの設定を読み込んだだけでは、requestsやPillowを読み込まないかテスト
+        """
+        env = dict(os.environ)
+        env['DJANGO_SETTINGS_MODULE'] = os.environ.get('DJANGO_SETTINGS_MODULE', 'sukeb.settings')
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(settings.BASE_DIR), *sys.path]))
+        result = subprocess.run(
+            [sys.executable, '-c', STARTUP_CODE.format(modules=LAZY_MODULES)],
+            env=env, cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '')
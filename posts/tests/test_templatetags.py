@@ -0,0 +1,34 @@
+from unittest import mock
+
+from django.template import Context, Template
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.prefectures import PREFECTURE_CHOICES
+from posts.templatetags import posts_tags
+
+
+class PrefectureSidebarTest(TestCase):
+    def setUp(self):
+        posts_tags.render_prefecture_sidebar.cache_clear()
+
+    def render(self):
+        return Template('{% load posts_tags %}{% prefecture_sidebar %}').render(Context())
+
+    def test_renders_link_for_every_prefecture(self):
+        """
+        サイドバーに全ての都道府県のリンクが表示されるか
+        """
+        html = self.render()
+        for name, _ in PREFECTURE_CHOICES:
+            self.assertIn(f'{reverse("posts:list")}?query={name}', html)
+
+    def test_renders_template_only_once(self):
+        """
+        2回目以降は描画済みのHTMLを使い回し、テンプレートを描画しないか
+        """
+        with mock.patch.object(posts_tags, 'render_to_string', wraps=posts_tags.render_to_string) as render:
+            first = self.render()
+            second = self.render()
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first, second)
@@ -0,0 +1,158 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Skatepark, Post, TimelineEntry
+from authentications.models import Follow, User
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author', email='author@mail.com', password='testpassword')
+        cls.reader = User.objects.create(username='reader', email='reader@mail.com', password='testpassword')
+        cls.other = User.objects.create(username='other', email='other@mail.com', password='testpassword')
+
+    def create_post(self, author, name, prefecture='東京都'):
+        skatepark = Skatepark.objects.create(
+            name=name, prefecture=prefecture, city='渋谷', skatepark_image='test'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(author=author, skatepark=skatepark, body=name)
+
+    def test_small_following_is_written_to_inbox(self):
+        """
+        フォロワーが少ない投稿者の投稿は、フォロワーのタイムラインに書き込まれるかテスト
+        """
+        timeline.follow_user(self.reader, self.author)
+        post = self.create_post(self.author, 'park1')
+        self.assertTrue(
+            TimelineEntry.objects.filter(feed=timeline.user_feed(self.reader.id), post=post).exists()
+        )
+        self.assertEqual(timeline.timeline_page(self.reader, None, 10), ([post], None))
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=1)
+    def test_large_following_is_read_from_outbox(self):
+        """
+        フォロワーが多い投稿者の投稿は1件だけ書き込まれ、読む時に全てのフォロワーのタイムラインに並ぶかテスト
+        """
+        timeline.follow_user(self.reader, self.author)
+        timeline.follow_user(self.other, self.author)
+        post = self.create_post(self.author, 'park1')
+        source = timeline.author_source(self.author.id)
+        self.assertEqual(list(TimelineEntry.objects.filter(post=post).values_list('feed', flat=True)), [source])
+        self.assertEqual(timeline.timeline_page(self.reader, None, 10)[0], [post])
+        self.assertEqual(timeline.timeline_page(self.other, None, 10)[0], [post])
+
+    def test_post_from_author_and_prefecture_appears_once(self):
+        """
+        フォローしている投稿者と都道府県の両方から届いた投稿が、1回だけ並ぶかテスト
+        """
+        timeline.follow_user(self.reader, self.author)
+        timeline.follow_prefecture(self.reader, '東京都')
+        post = self.create_post(self.author, 'park1')
+        other_post = self.create_post(self.other, 'park2')
+        self.create_post(self.other, 'park3', prefecture='大阪府')
+        self.assertEqual(TimelineEntry.objects.filter(post=post).count(), 2)
+        self.assertEqual(timeline.timeline_page(self.reader, None, 10)[0], [other_post, post])
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        """
+        フォローした時に最近の投稿が入り、フォローをやめた時に取り除かれるかテスト
+        """
+        post = self.create_post(self.author, 'park1')
+        self.assertEqual(timeline.timeline_page(self.reader, None, 10)[0], [])
+        timeline.follow_user(self.reader, self.author)
+        self.assertEqual(timeline.timeline_page(self.reader, None, 10)[0], [post])
+        timeline.unfollow_user(self.reader, self.author)
+        self.assertEqual(timeline.timeline_page(self.reader, None, 10)[0], [])
+
+    def test_pages_with_cursor(self):
+        """
+        カーソルで次のページを読み、最後のページではカーソルがNoneになるかテスト
+        """
+        timeline.follow_user(self.reader, self.author)
+        posts = [self.create_post(self.author, f'park{i}') for i in range(5)]
+        first, cursor = timeline.timeline_page(self.reader, None, 3)
+        self.assertEqual(first, posts[:1:-1])
+        second, cursor = timeline.timeline_page(self.reader, cursor, 3)
+        self.assertEqual(second, posts[1::-1])
+        self.assertIsNone(cursor)
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=0)
+    def test_pages_across_outbox_feeds(self):
+        """
+        投稿者と都道府県のタイムラインの両方にある投稿が、ページをまたいでも1回ずつ並ぶかテスト
+        """
+        timeline.follow_user(self.reader, self.author)
+        timeline.follow_prefecture(self.reader, '東京都')
+        posts = [self.create_post(self.author, f'park{i}') for i in range(3)]
+        other_post = self.create_post(self.other, 'park3')
+        pages = []
+        cursor = None
+        for _ in range(4):
+            page, cursor = timeline.timeline_page(self.reader, cursor, 1)
+            pages.extend(page)
+            if cursor is None:
+                break
+        self.assertEqual(pages, [other_post, *posts[::-1]])
+        self.assertIsNone(cursor)
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=0)
+    def test_feeds_are_read_together(self):
+        """
+        フォローしている対象のタイムラインを、対象の数によらず決まった回数のクエリで読むかテスト
+        SQLiteはUNIONの中でLIMITを使えないので、タイムラインごとに1回ずつ読む
+        """
+        timeline.follow_user(self.reader, self.author)
+        timeline.follow_user(self.reader, self.other)
+        timeline.follow_prefecture(self.reader, '東京都')
+        post = self.create_post(self.author, 'park1')
+        feeds = timeline.user_feeds(self.reader)
+        self.assertEqual(
+            sorted(feeds),
+            sorted([
+                timeline.user_feed(self.reader.id),
+                timeline.author_source(self.author.id),
+                timeline.author_source(self.other.id),
+                timeline.prefecture_source('東京都'),
+            ]),
+        )
+        if connection.features.supports_slicing_ordering_in_compound:
+            queries = 3
+        else:
+            queries = 2 + len(feeds)
+        with self.assertNumQueries(queries):
+            self.assertEqual(timeline.timeline_page(self.reader, None, 10), ([post], None))
+
+    def test_follow_views(self):
+        """
+        フォローボタンでフォローとフォローの解除が切り替わり、自分自身はフォローできないかテスト
+        """
+        self.client.force_login(self.reader)
+        url = reverse('authentications:follow', kwargs={'pk': self.author.pk})
+        self.client.post(url)
+        self.assertTrue(Follow.objects.filter(follower=self.reader, followee=self.author).exists())
+        self.client.post(url)
+        self.assertFalse(Follow.objects.filter(follower=self.reader, followee=self.author).exists())
+        self.client.post(reverse('authentications:follow', kwargs={'pk': self.reader.pk}))
+        self.assertFalse(Follow.objects.exists())
+
+        response = self.client.post(reverse('authentications:follow_prefecture'), {'prefecture': '東京都'})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(self.reader.prefecture_follows.filter(prefecture='東京都').exists())
+        response = self.client.post(reverse('authentications:follow_prefecture'), {'prefecture': 'nowhere'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_timeline_view_requires_login(self):
+        """
+        タイムラインのページはログインが必要で、ログインするとフォローしている投稿が表示されるかテスト
+        """
+        response = self.client.get(reverse('posts:timeline'))
+        self.assertEqual(response.status_code, 302)
+        timeline.follow_user(self.reader, self.author)
+        self.create_post(self.author, 'park1')
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('posts:timeline'))
+        self.assertContains(response, 'park1')
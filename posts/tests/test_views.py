@@ -1,8 +1,13 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase, Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from posts.models import Skatepark, Post, Comment
-from posts.views import PostsListView
+from posts.views import PostsListView, PostsStreamView
 from posts.prefectures import PREFECTURE_CHOICES
 from authentications.models import User
 
@@ -82,6 +87,80 @@ class PostsListViewTest(TestCase):
         self.assertEqual(response.context_data['prefectures'], PREFECTURE_CHOICES)
 
 
+class PostsFragmentViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='test1', email='test1@mail.com', password='testpassword')
+        cls.posts = []
+        for i in range(5):
+            prefecture = '東京都' if i % 2 else '神奈川県'
+            skatepark = Skatepark.objects.create(
+                name=f'park{i}', prefecture=prefecture, city='渋谷', skatepark_image='test'
+            )
+            cls.posts.append(Post.objects.create(author=user, skatepark=skatepark, body=f'post{i}'))
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_list_shows_first_page_and_next_url(self):
+        """
+        投稿一覧が最初のページだけを表示し、続きを読み込むURLを渡すかテスト
+        """
+        with mock.patch.object(PostsListView, 'page_size', 2):
+            response = self.client.get(reverse('posts:list'))
+        self.assertEqual([post.body for post in response.context['post_list']], ['post4', 'post3'])
+        self.assertEqual(response.context['post_count'], 5)
+        self.assertContains(response, 'data-next-url="/posts/fragment/?cursor=')
+
+    def test_list_count_is_cached(self):
+        """
+        投稿一覧の件数をキャッシュし、2回目の表示ではCOUNTを実行しないかテスト
+        """
+        self.client.get(reverse('posts:list'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:list'))
+        self.assertEqual(response.context['post_count'], 5)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+
+    def test_fragment_returns_cards_until_last_page(self):
+        """
+        カーソルをたどると、県名で絞り込んだ残りの投稿カードだけを返すかテスト
+        """
+        with mock.patch.object(PostsListView, 'page_size', 1):
+            response = self.client.get(reverse('posts:list'), {'query': '神奈川'})
+            bodies = []
+            next_url = response.context['next_url']
+            while next_url:
+                response = self.client.get(next_url)
+                self.assertNotContains(response, '<nav')
+                bodies.extend(post.body for post in response.context['posts'])
+                next_url = response['X-Next-Page']
+        self.assertEqual(bodies, ['post2', 'post0'])
+
+    def test_fragment_is_cacheable(self):
+        """
+        投稿カードのレスポンスにキャッシュの期限がついているかテスト
+        """
+        response = self.client.get(reverse('posts:fragment'))
+        self.assertIn('max-age=', response['Cache-Control'])
+
+    def test_fragment_does_not_vary_on_cookie(self):
+        """
+        ヘッダーのない投稿カードは、ログインしていてもセッションを読まずにCookieで分けずにキャッシュできるかテスト
+        """
+        self.client.force_login(User.objects.get(username='test1'))
+        response = self.client.get(reverse('posts:fragment'))
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+
+    def test_fragment_rejects_invalid_cursor(self):
+        """
+        不正なカーソルの時は400を返すかテスト
+        """
+        response = self.client.get(reverse('posts:fragment'), {'cursor': '!!!'})
+        self.assertEqual(response.status_code, 400)
+
+
 class PostsDetailView(TestCase):
     def setUp(self):
         self.client = Client()
@@ -216,4 +295,47 @@ class PostsDeleteViewTest(TestCase):
         _ = self.client.login(email='loginuser@mail.com', password='testpassword')
         response = self.client.post(self.url)
         self.assertEqual(response.status_code, 302)
-        self.assertRedirects(response, reverse('posts:list'))
\ No newline at end of file
+        self.assertRedirects(response, reverse('posts:list'))
+
+class PostsStreamViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='test1', email='test1@mail.com', password='testpassword')
+        for i in range(5):
+            prefecture = '東京都' if i % 2 else '神奈川県'
+            skatepark = Skatepark.objects.create(
+                name=f'park{i}', prefecture=prefecture, city='渋谷', skatepark_image='test'
+            )
+            Post.objects.create(author=user, skatepark=skatepark, body=f'post{i}')
+        User.objects.create_superuser(email='staff@mail.com', username='staff', password='testpassword')
+
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('posts:stream')
+
+    def test_view_is_staff_only(self):
+        """
+        スタッフ以外は全件表示のページを見られないかテスト
+        """
+        User.objects.create_user(email='user@mail.com', username='user', password='testpassword')
+        self.client.login(email='user@mail.com', password='testpassword')
+        response = self.client.get(self.url)
+        self.assertNotEqual(response.status_code, 200)
+
+    def test_streams_header_posts_and_count(self):
+        """
+        ヘッダー、投稿、件数の順にストリーミングで返すかテスト
+        """
+        self.client.login(email='staff@mail.com', password='testpassword')
+        with mock.patch.object(PostsStreamView, 'chunk_size', 2):
+            response = self.client.get(self.url, {'query': '神奈川'})
+            self.assertTrue(response.streaming)
+            chunks = [chunk.decode() for chunk in response.streaming_content]
+        # ヘッダー、2件、1件、件数の4回に分けて返す
+        self.assertEqual(len(chunks), 4)
+        self.assertIn('神奈川の投稿', chunks[0])
+        html = ''.join(chunks)
+        self.assertLess(html.index('post4'), html.index('post2'))
+        self.assertLess(html.index('post2'), html.index('post0'))
+        self.assertNotIn('post1', html)
+        self.assertIn('<span class="has-text-primary">3</span> 件', chunks[-1])
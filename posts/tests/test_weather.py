@@ -0,0 +1,150 @@
+import io
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts import weather
+from posts.models import ForecastRecord, Skatepark
+from posts.prefectures import PREFECTURE_ID
+
+
+class CityCodeTest(TestCase):
+    def test_returns_city_code_when_city_is_in_table(self):
+        """
+        対応表にある市名の場合は、その地域のID番号が返ってくるか
+        """
+        skatepark = Skatepark(name='テストパーク', prefecture='北海道', city='旭川市')
+        self.assertEqual(weather.city_code_for(skatepark), '012010')
+
+    def test_returns_prefecture_id_when_city_is_not_in_table(self):
+        """
+        対応表にない市名の場合は、県庁所在地のID番号が返ってくるか
+        """
+        skatepark = Skatepark(name='テストパーク', prefecture='北海道', city='存在しない市')
+        self.assertEqual(weather.city_code_for(skatepark), PREFECTURE_ID['北海道'])
+
+    def test_city_codes_for_matches_city_code_for(self):
+        """
+        まとめて取得した場合も、1件ずつ取得した場合と同じID番号が返ってくるか
+        """
+        locations = [('北海道', '旭川市'), ('北海道', '存在しない市'), ('東京都', '渋谷区')]
+        city_codes = weather.city_codes_for(locations)
+        for prefecture, city in locations:
+            skatepark = Skatepark(name='テストパーク', prefecture=prefecture, city=city)
+            self.assertEqual(city_codes[(prefecture, city)], weather.city_code_for(skatepark))
+
+
+class FetchForecastTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_requests_call_api_once(self):
+        """
+        同じID番号の天気予報を同時に取得した時、APIへのリクエストが1回だけになるか
+        """
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_request(city_code):
+            started.set()
+            release.wait(timeout=5)
+            return '晴れ'
+
+        results = []
+        with mock.patch.object(weather, 'request_forecast', side_effect=slow_request) as request:
+            first = threading.Thread(target=lambda: results.append(weather.fetch_forecast('012010', record=False)))
+            first.start()
+            started.wait(timeout=5)
+            second = threading.Thread(target=lambda: results.append(weather.fetch_forecast('012010', record=False)))
+            second.start()
+            release.set()
+            first.join()
+            second.join()
+        self.assertEqual(request.call_count, 1)
+        self.assertEqual(results, ['晴れ', '晴れ'])
+        self.assertEqual(cache.get(weather.cache_key('012010')), '晴れ')
+
+    def test_fetch_forecasts_skips_cached_city_codes(self):
+        """
+        キャッシュにある地域はAPIにリクエストを送らないか
+        """
+        cache.set(weather.cache_key('012010'), '雨')
+        with mock.patch.object(weather, 'request_forecast', return_value='晴れ') as request:
+            forecasts = weather.fetch_forecasts(['012010', '130010', '130010'])
+        request.assert_called_once_with('130010')
+        self.assertEqual(forecasts, {'012010': '雨', '130010': '晴れ'})
+
+    def test_get_current_weather_returns_error_message_when_api_fails(self):
+        """
+        APIへのリクエストが失敗した時、エラーメッセージが返ってくるか
+        """
+        with mock.patch.object(weather, 'request_forecast', side_effect=OSError):
+            self.assertEqual(weather.get_current_weather('012010'), weather.WEATHER_ERROR_MESSAGE)
+        self.assertIsNone(cache.get(weather.cache_key('012010')))
+
+
+class ForecastHistoryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_fetch_forecast_saves_record(self):
+        """
+        天気予報を取得した時、履歴に1行保存されるか
+        """
+        with mock.patch.object(weather, 'request_forecast', return_value='晴れ'):
+            weather.fetch_forecast('012010')
+        self.assertEqual(
+            list(ForecastRecord.objects.values_list('city_code', 'telop')), [('012010', '晴れ')]
+        )
+
+    def test_fetch_forecasts_saves_one_record_per_city_code(self):
+        """
+        まとめて取得した時、地域ごとに1行ずつ履歴に保存されるか
+        """
+        with mock.patch.object(weather, 'request_forecast', return_value='晴れ'):
+            weather.fetch_forecasts(['012010', '130010', '130010'])
+        self.assertEqual(
+            sorted(ForecastRecord.objects.values_list('city_code', flat=True)), ['012010', '130010']
+        )
+
+    def test_get_current_weather_returns_latest_record_when_api_fails(self):
+        """
+        APIへのリクエストが失敗した時、履歴の最新の天候が返ってくるか
+        """
+        ForecastRecord.objects.create(
+            city_code='012010', telop='雨', fetched_at=timezone.now() - timedelta(hours=3)
+        )
+        ForecastRecord.objects.create(city_code='012010', telop='くもり')
+        with mock.patch.object(weather, 'request_forecast', side_effect=OSError):
+            current_weather = weather.get_current_weather('012010')
+        self.assertTrue(current_weather.startswith('くもり ('))
+
+    def test_recent_forecasts_skips_unchanged_telops(self):
+        """
+        天候の推移に、天候が変わった時の履歴だけが新しい順に入っているか
+        """
+        now = timezone.now()
+        for hours, telop in [(30, '雪'), (5, '雨'), (4, '雨'), (2, '晴れ'), (1, '晴れ')]:
+            ForecastRecord.objects.create(
+                city_code='012010', telop=telop, fetched_at=now - timedelta(hours=hours)
+            )
+        trend = weather.recent_forecasts('012010')
+        self.assertEqual([record.telop for record in trend], ['晴れ', '雨'])
+
+    def test_prune_forecasts_deletes_only_expired_records(self):
+        """
+        保存期間を過ぎた履歴だけが削除されるか
+        """
+        now = timezone.now()
+        ForecastRecord.objects.bulk_create([
+            ForecastRecord(city_code='012010', telop='晴れ', fetched_at=now - timedelta(days=40, minutes=i))
+            for i in range(7)
+        ])
+        ForecastRecord.objects.create(city_code='012010', telop='雨', fetched_at=now - timedelta(days=1))
+        call_command('prune_forecasts', days=30, batch_size=3, stdout=io.StringIO())
+        self.assertEqual(list(ForecastRecord.objects.values_list('telop', flat=True)), ['雨'])
@@ -0,0 +1,180 @@
+"""
+フォローしているユーザーと都道府県の投稿を並べるタイムライン
+
+フォロワーがTIMELINE_FANOUT_THRESHOLD人以下の投稿者と都道府県の投稿は、投稿した時に
+フォロワーごとのタイムラインに書き込む(fan-out-on-write)
+それより多い時は1件だけ書き込み、読む時にフォローしている対象の分も一緒に読む(fan-out-on-read)
+どちらも同じTimelineEntryのテーブルに入り、読む時はタイムラインごとに(feed, post)のインデックスの範囲を
+LIMIT付きで読んでまとめるので、フォローしている対象の投稿がいくら多くても読む行数は変わらない
+"""
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+
+from authentications.models import Follow, PrefectureFollow
+
+from .models import Post, TimelineEntry
+from .pagination import decode_cursor, encode_cursor
+
+# 1回のクエリでUNION ALLにまとめるタイムラインの数
+FEEDS_PER_QUERY = 100
+
+
+def user_feed(user_id):
+    return f'u:{user_id}'
+
+
+def author_source(author_id):
+    return f'a:{author_id}'
+
+
+def prefecture_source(prefecture):
+    return f'p:{prefecture}'
+
+
+def source_followers(source):
+    """
+    フォローしている対象のフォロワーのIDを返す
+    多い時はTIMELINE_FANOUT_THRESHOLD + 1人分まで読み、それ以上は数えない
+    """
+    kind, value = source.split(':', 1)
+    if kind == 'a':
+        followers = Follow.objects.filter(followee_id=value).values_list('follower_id', flat=True)
+    else:
+        followers = PrefectureFollow.objects.filter(prefecture=value).values_list('user_id', flat=True)
+    return list(followers[:settings.TIMELINE_FANOUT_THRESHOLD + 1])
+
+
+def fan_out(post):
+    """
+    投稿をフォロワーのタイムラインに書き込む
+    フォロワーが多い投稿者と都道府県の場合は、対象のタイムラインに1件だけ書き込む
+    """
+    entries = []
+    for source in (author_source(post.author_id), prefecture_source(post.skatepark.prefecture)):
+        followers = source_followers(source)
+        if len(followers) > settings.TIMELINE_FANOUT_THRESHOLD:
+            entries.append(TimelineEntry(feed=source, source=source, post=post))
+        else:
+            entries.extend(
+                TimelineEntry(feed=user_feed(follower_id), source=source, post=post)
+                for follower_id in followers
+            )
+    TimelineEntry.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+
+
+def source_posts(source):
+    kind, value = source.split(':', 1)
+    if kind == 'a':
+        return Post.objects.filter(author_id=value)
+    return Post.objects.filter(skatepark__prefecture=value)
+
+
+def follow(user, source):
+    """
+    フォローした対象の最近の投稿をTIMELINE_BACKFILL_SIZE件までタイムラインに書き込む
+    """
+    post_ids = (
+        source_posts(source).order_by('-id')
+        .values_list('id', flat=True)[:settings.TIMELINE_BACKFILL_SIZE]
+    )
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(feed=user_feed(user.id), source=source, post_id=post_id) for post_id in post_ids],
+        ignore_conflicts=True,
+    )
+
+
+def unfollow(user, source):
+    """
+    フォローをやめた対象の投稿をタイムラインから取り除く
+    他の対象から届いた同じ投稿は残す
+    """
+    TimelineEntry.objects.filter(feed=user_feed(user.id), source=source).delete()
+
+
+def follow_user(follower, followee):
+    with transaction.atomic():
+        _, created = Follow.objects.get_or_create(follower=follower, followee=followee)
+        if created:
+            follow(follower, author_source(followee.id))
+
+
+def unfollow_user(follower, followee):
+    with transaction.atomic():
+        Follow.objects.filter(follower=follower, followee=followee).delete()
+        unfollow(follower, author_source(followee.id))
+
+
+def follow_prefecture(user, prefecture):
+    with transaction.atomic():
+        _, created = PrefectureFollow.objects.get_or_create(user=user, prefecture=prefecture)
+        if created:
+            follow(user, prefecture_source(prefecture))
+
+
+def unfollow_prefecture(user, prefecture):
+    with transaction.atomic():
+        PrefectureFollow.objects.filter(user=user, prefecture=prefecture).delete()
+        unfollow(user, prefecture_source(prefecture))
+
+
+def user_feeds(user):
+    """
+    ユーザーのタイムラインと、フォローしている全ての対象のタイムラインの名前を1回のクエリで返す
+    フォロワーの少ない対象のタイムラインは空なので、読んでもインデックスを1回引くだけになる
+    """
+    authors = Follow.objects.filter(follower=user).annotate(
+        feed=Concat(Value('a:'), Cast('followee_id', CharField()), output_field=CharField())
+    ).values_list('feed', flat=True)
+    prefectures = PrefectureFollow.objects.filter(user=user).annotate(
+        feed=Concat(Value('p:'), 'prefecture', output_field=CharField())
+    ).values_list('feed', flat=True)
+    return [user_feed(user.id), *authors.union(prefectures, all=True)]
+
+
+def feed_post_ids(feeds, before, limit):
+    """
+    タイムラインをまとめて、beforeより前の投稿のIDを新しい順にlimit件返す
+    タイムラインごとに(feed, -post)のインデックスの範囲をLIMIT limitで読むクエリをUNION ALLでまとめ、
+    Pythonで重複を除いて並べる
+    読む行はタイムラインの数 × limit件までで、フォローしている対象の過去の投稿の数によらない
+    """
+    post_ids = set()
+    for start in range(0, len(feeds), FEEDS_PER_QUERY):
+        queries = []
+        for feed in feeds[start:start + FEEDS_PER_QUERY]:
+            entries = TimelineEntry.objects.filter(feed=feed)
+            if before is not None:
+                entries = entries.filter(post_id__lt=before)
+            # 同じ投稿が複数の対象から届いていても、limit件の投稿を読めるように重複を除く
+            queries.append(entries.order_by('-post_id').values_list('post_id', flat=True).distinct()[:limit])
+        if connections[TimelineEntry.objects.db].features.supports_slicing_ordering_in_compound:
+            post_ids.update(queries[0].union(*queries[1:], all=True))
+        else:
+            # SQLiteはUNIONの中でLIMITを使えないので、タイムラインごとに読む
+            for query in queries:
+                post_ids.update(query)
+    return sorted(post_ids, reverse=True)[:limit]
+
+
+def timeline_page(user, cursor, limit):
+    """
+    タイムラインの投稿を新しい順にlimit件返す
+
+    引数:
+        user (User): タイムラインを読むユーザー
+        cursor (str): 前のページの最後の投稿のカーソル、最初のページの時はNone
+        limit (int): 1ページの件数
+    戻り値:
+        tuple: (投稿のリスト, 次のページのカーソル、最後のページの時はNone)
+    """
+    before = decode_cursor(cursor) if cursor else None
+    # 次のページがあるか判定するため1件多く取得する
+    post_ids = feed_post_ids(user_feeds(user), before, limit + 1)
+    next_cursor = encode_cursor(post_ids[limit - 1]) if len(post_ids) > limit else None
+    # 削除済みの投稿は、purge_deletedコマンドで取り除かれるまでここで除く
+    posts = list(
+        Post.objects.filter(id__in=post_ids[:limit]).select_related('author', 'skatepark').order_by('-id')
+    )
+    return posts, next_cursor
@@ -7,7 +7,15 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.PostsListView.as_view(), name='list'),
+    path('posts/timeline/', views.PostsTimelineView.as_view(), name='timeline'),
+    path('posts/popular/', views.PostsPopularView.as_view(), name='popular'),
+    path('posts/notifications/', views.NotificationsView.as_view(), name='notifications'),
+    path('posts/fragment/', views.PostsFragmentView.as_view(), name='fragment'),
     path('posts/detail/<int:pk>', views.PostsDetailView.as_view(), name='detail'),
+    # ASGIではposts.live.LiveCommentsApplicationが先に処理する
+    path('posts/detail/<int:pk>/events', views.comment_events_unavailable, name='events'),
     path('posts/create/', views.PostsCreateView.as_view(), name='create'),
     path('posts/delete/<int:pk>', views.PostsDeleteView.as_view(), name='delete'),
+    path('posts/export/', views.PostsExportView.as_view(), name='export'),
+    path('posts/stream/', views.PostsStreamView.as_view(), name='stream'),
 ]
\ No newline at end of file
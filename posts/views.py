@@ -1,14 +1,31 @@
-from django.shortcuts import render, redirect
-from django.urls import reverse_lazy
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render, redirect
+from django.template.loader import get_template
+from django.urls import reverse, reverse_lazy
+from django.utils.decorators import method_decorator
+from django.utils.http import urlencode
+from django.views.decorators.cache import cache_page
 from django.views.generic import (
-    ListView, DetailView, CreateView, DeleteView
+    ListView, DetailView, CreateView, DeleteView, View
 )
-from django.db.models import Q
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 
-from .models import Post
+from authentications.models import PrefectureFollow
+from sukeb.db import approximate_count
+
+from . import comment_buffer, notifications
+from .deletion import soft_delete_post
+from .export import EXPORT_FORMATS, iter_export
+from .models import Notification, Post
+from .pagination import keyset_page
 from .prefectures import PREFECTURE_CHOICES, PREFECTURE_ID
 from .forms import CommentForm, SkateparkForm, PostForm
+from .timeline import timeline_page
+from .weather import city_code_for, get_current_weather, recent_forecasts
 
 
 class AuthorOnly(LoginRequiredMixin, UserPassesTestMixin):
@@ -29,12 +46,40 @@ class AuthorOnly(LoginRequiredMixin, UserPassesTestMixin):
         return redirect('posts:detail', pk=self.kwargs['pk'])
 
 
+def cached_post_count(queryset, query_keyword):
+    """
+    投稿一覧の件数をPOST_FRAGMENT_CACHE_TIMEOUT秒キャッシュして返す
+    多い時はCOUNT(*)で数えずにPostgresの統計情報から見積もる
+
+    戻り値:
+        tuple: (件数, 見積もった件数の時はTrue)
+    """
+    key = 'posts:count:' + hashlib.md5((query_keyword or '').encode()).hexdigest()
+    return cache.get_or_set(
+        key, lambda: approximate_count(queryset), settings.POST_FRAGMENT_CACHE_TIMEOUT
+    )
+
+
+def posts_fragment_url(query_keyword, cursor):
+    """
+    投稿一覧の次のページの投稿カードを返すURLを作る、次のページがない時はNoneを返す
+    """
+    if cursor is None:
+        return None
+    params = {'cursor': cursor}
+    if query_keyword:
+        params['query'] = query_keyword
+    return f"{reverse('posts:fragment')}?{urlencode(params)}"
+
+
 class PostsListView(ListView):
     """
     全ての投稿データを取得し,対応したHTMLに渡す
+    最初のpage_size件だけを表示し、続きはスクロールに合わせてPostsFragmentViewから読み込む
     """
     template_name = 'posts/posts_list.html'
     model = Post
+    page_size = 20
 
     def get_queryset(self, **kwargs):
         """ 
@@ -46,9 +91,7 @@ class PostsListView(ListView):
         query_keyword = self.request.GET.get('query')
         if query_keyword:
             # locationモデルのprefectureとquery_keywordが一致するデータをフィルタする
-            queryset = Post.objects.filter(
-                Q(skatepark__prefecture__contains=query_keyword)
-            )
+            queryset = Post.objects.filter_prefecture(query_keyword)
         return queryset
 
     def get_context_data(self, **kwargs):
@@ -58,9 +101,112 @@ class PostsListView(ListView):
         context = super().get_context_data(**kwargs)
         # 全都道府県のリストをコンテキストに追加
         context['prefectures'] = PREFECTURE_CHOICES
+        # 最初のページの投稿と、続きを読み込むURLを追加
+        posts, next_cursor = keyset_page(
+            self.object_list.select_related('author', 'skatepark'), None, self.page_size
+        )
+        context['post_list'] = posts
+        context['post_count'], context['post_count_is_estimate'] = cached_post_count(
+            self.object_list, self.request.GET.get('query')
+        )
+        context['next_url'] = posts_fragment_url(self.request.GET.get('query'), next_cursor)
+        # 県名で絞り込んでいる時は、その都道府県をフォローするボタンを表示する
+        query_keyword = self.request.GET.get('query')
+        if query_keyword in PREFECTURE_ID and self.request.user.is_authenticated:
+            context['follow_prefecture'] = query_keyword
+            context['is_following_prefecture'] = PrefectureFollow.objects.filter(
+                user=self.request.user, prefecture=query_keyword
+            ).exists()
+        return context
+
+
+class PostsTimelineView(LoginRequiredMixin, View):
+    """
+    フォローしているユーザーと都道府県の投稿を新しい順に表示する
+    """
+    def get(self, request):
+        cursor = request.GET.get('cursor')
+        try:
+            posts, next_cursor = timeline_page(request.user, cursor, settings.TIMELINE_PAGE_SIZE)
+        except ValueError as err:
+            return HttpResponseBadRequest(str(err))
+        next_url = None
+        if next_cursor:
+            next_url = f"{reverse('posts:timeline')}?{urlencode({'cursor': next_cursor})}"
+        context = {
+            'post_list': posts,
+            'prefectures': PREFECTURE_CHOICES,
+            'next_url': next_url,
+        }
+        return render(request, 'posts/posts_timeline.html', context)
+
+
+class PostsPopularView(ListView):
+    """
+    人気度の高い順にPOPULAR_POSTS_SIZE件の投稿を表示する
+    人気度はコメントのたびに更新しているので、インデックスを順に読むだけで並ぶ
+    """
+    template_name = 'posts/posts_popular.html'
+    context_object_name = 'post_list'
+
+    def get_queryset(self):
+        return (
+            Post.objects.filter(popularity__gt=0)
+            .select_related('author', 'skatepark')
+            .order_by('-popularity', '-id')[:settings.POPULAR_POSTS_SIZE]
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['prefectures'] = PREFECTURE_CHOICES
         return context
 
 
+class NotificationsView(LoginRequiredMixin, View):
+    """
+    自分の投稿へのコメントの通知を新しい順にpage_size件表示する
+    """
+    page_size = 50
+
+    def get(self, request):
+        notification_list = (
+            Notification.objects.filter(recipient=request.user)
+            .select_related('comment__author', 'comment__post__skatepark')
+            .order_by('-id')[:self.page_size]
+        )
+        return render(request, 'posts/notifications.html', {'notification_list': notification_list})
+
+    def post(self, request):
+        """
+        未読の通知を全て既読にする
+        """
+        notifications.mark_all_read(request.user)
+        return redirect('posts:notifications')
+
+
+@method_decorator(cache_page(settings.POST_FRAGMENT_CACHE_TIMEOUT), name='get')
+class PostsFragmentView(View):
+    """
+    投稿一覧の続きの投稿カードだけをHTMLで返す
+    次のページのURLはX-Next-Pageヘッダーで返し、最後のページの時は空にする
+    カーソルと県名ごとに同じ内容になるので、URLごとにキャッシュする
+    """
+    def get(self, request):
+        query_keyword = request.GET.get('query')
+        queryset = Post.objects.select_related('author', 'skatepark')
+        if query_keyword:
+            queryset = queryset.filter_prefecture(query_keyword)
+        try:
+            posts, next_cursor = keyset_page(
+                queryset, request.GET.get('cursor'), PostsListView.page_size
+            )
+        except ValueError as err:
+            return HttpResponseBadRequest(str(err))
+        response = render(request, 'posts/post_cards.html', {'posts': posts})
+        response['X-Next-Page'] = posts_fragment_url(query_keyword, next_cursor) or ''
+        return response
+
+
 class PostsDetailView(LoginRequiredMixin ,DetailView):
     """
     投稿の詳細情報をHTMLに渡す
@@ -71,32 +217,26 @@ class PostsDetailView(LoginRequiredMixin ,DetailView):
     def get(self, request, pk):
         """ 
         GETメソッドでリクエストが来たらコメントのフォーム、投稿、全都道府県のタプルを渡す
-        スケートパークの県名を取得し、ID番号を取得する。そのID番号を使って天気予報 APIにリクエストを送ると
-        その地域の現在の天候が返ってくる
+        スケートパークの市名から天気予報APIの地域のID番号を取得し、その地域の現在の天候を渡す
+        天候はキャッシュから読み込み、なければAPIにリクエストを送る
         """
-        import requests
-
         comment_form = CommentForm()
-        post = Post.objects.get(id=pk)
-        comments = post.comment_set.all
-        post_prefecture = post.skatepark.prefecture
+        post = get_object_or_404(Post, id=pk)
+        # テンプレートでの件数の表示とループで同じ結果を使う
+        comments = list(post.comment_set.select_related('author').order_by('id'))
         # APIリクエストでパラメーターとして使うID番号を取得
-        prefecture_id = PREFECTURE_ID[post_prefecture]
-        # 天気予報APIにリクエストを送信
-        try:
-            res = requests.get(f'https://weather.tsukumijima.net/api/forecast?city={prefecture_id}')
-            json_res = res.json()
-            # 天候情報を取得
-            current_weather = json_res['forecasts'][0]['telop']
-        except Exception as err:
-            current_weather = 'エラーが起きました'
+        city_code = city_code_for(post.skatepark)
+        current_weather = get_current_weather(city_code)
+        weather_trend = recent_forecasts(city_code)
         prefectures = PREFECTURE_CHOICES
         context = {
             'post': post,
             'comments': comments,
+            'last_comment_id': comments[-1].id if comments else 0,
             'comment_form': comment_form,
             'prefectures': prefectures,
-            'current_weather': current_weather
+            'current_weather': current_weather,
+            'weather_trend': weather_trend,
         }
         return render(request, 'posts/posts_detail.html', context)
 
@@ -109,8 +249,15 @@ class PostsDetailView(LoginRequiredMixin ,DetailView):
         # 投稿のIDを取得
         post_id = self.kwargs.get('pk')
         if comment_form.is_valid():
+            if settings.COMMENT_BUFFER_ENABLED:
+                # ない投稿と削除済みの投稿へのコメントは受け付けない
+                if not Post.objects.filter(id=post_id).exists():
+                    raise Http404
+                # データベースには後でまとめて書き込み、すぐにリダイレクトする
+                comment_buffer.accept(post_id, request.user.id, comment_form.cleaned_data['body'])
+                return redirect('posts:detail', pk=post_id)
             comment = comment_form.save(commit=False)
-            post = Post.objects.get(id=post_id)
+            post = get_object_or_404(Post, id=post_id)
             comment.post = post
             comment.author = request.user
             comment.save()
@@ -118,6 +265,14 @@ class PostsDetailView(LoginRequiredMixin ,DetailView):
         return render(request, 'posts/posts_detail', pk=post_id)
     
 
+def comment_events_unavailable(request, pk):
+    """
+    WSGIで動かしている時のコメントのイベントのURL
+    204を返すと、ブラウザのEventSourceは再接続をやめる
+    """
+    return HttpResponse(status=204)
+
+
 class PostsCreateView(LoginRequiredMixin, CreateView):
     """ 
     投稿の作成フォームをHTMLに渡す
@@ -169,4 +324,80 @@ class PostsDeleteView(AuthorOnly, DeleteView):
     """
     template_name = 'posts/posts_delete.html'
     model = Post
-    success_url = reverse_lazy('posts:list')
\ No newline at end of file
+    success_url = reverse_lazy('posts:list')
+
+    def form_valid(self, form):
+        """
+        削除済みにしてすぐにリダイレクトする
+        コメント、スケートパーク、画像はpurge_deletedコマンドが後で削除する
+        """
+        soft_delete_post(self.object)
+        return redirect(self.get_success_url())
+
+
+class StaffOnly(LoginRequiredMixin, UserPassesTestMixin):
+    """
+    スタッフ以外のアクセスを制限するクラス
+    """
+    def test_func(self):
+        return self.request.user.is_staff
+
+
+class PostsExportView(StaffOnly, View):
+    """
+    全ての投稿をスケートパーク、投稿者、コメントと一緒にCSVかNDJSONで書き出す
+    サーバーサイドカーソルから少しずつ読み込んでストリーミングで返すので、
+    件数が増えてもメモリ使用量は変わらない
+    """
+    chunk_size = 2000
+
+    def get(self, request):
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest('formatはcsvかndjsonを指定してください')
+        response = StreamingHttpResponse(
+            iter_export(export_format, chunk_size=self.chunk_size),
+            content_type=EXPORT_FORMATS[export_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="posts.{export_format}"'
+        return response
+
+
+
+class PostsStreamView(StaffOnly, View):
+    """
+    条件に合う全ての投稿を1ページで表示する、スタッフ用の投稿一覧
+    ヘッダーを先に返してから、サーバーサイドカーソルで読み込んだ投稿をchunk_size件ずつ
+    HTMLにして返すので、件数が増えても最初の応答までの時間とメモリ使用量は変わらない
+    """
+    chunk_size = 100
+
+    def get(self, request):
+        query_keyword = request.GET.get('query', '')
+        queryset = Post.objects.all()
+        if query_keyword:
+            queryset = queryset.filter_prefecture(query_keyword)
+        queryset = queryset.select_related('author', 'skatepark').order_by('-created_at', '-id')
+        return StreamingHttpResponse(
+            self.stream(queryset, query_keyword), content_type='text/html; charset=utf-8'
+        )
+
+    def stream(self, queryset, query_keyword):
+        """
+        ヘッダー、chunk_size件ずつの投稿、件数の順にHTMLを返すジェネレーター
+        """
+        request = self.request
+        cards = get_template('posts/post_cards.html')
+        yield get_template('posts/posts_stream_head.html').render({'query': query_keyword}, request)
+        post_count = 0
+        chunk = []
+        for post in queryset.iterator(chunk_size=self.chunk_size):
+            chunk.append(post)
+            if len(chunk) == self.chunk_size:
+                yield cards.render({'posts': chunk}, request)
+                post_count += len(chunk)
+                chunk = []
+        if chunk:
+            yield cards.render({'posts': chunk}, request)
+            post_count += len(chunk)
+        yield get_template('posts/posts_stream_foot.html').render({'post_count': post_count}, request)
@@ -0,0 +1,227 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .prefectures import PREFECTURE_ID
+
+
+WEATHER_API_URL = 'https://weather.tsukumijima.net/api/forecast?city={}'
+WEATHER_ERROR_MESSAGE = 'エラーが起きました'
+# 詳細ページに表示する天候の推移の期間と件数
+TREND_HOURS = 24
+TREND_SIZE = 8
+# 市名の最後についている区分、取り除いた名前でも対応表を検索する
+CITY_SUFFIXES = ('市', '区', '町', '村')
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def cache_key(city_code):
+    return f'weather:{city_code}'
+
+
+def city_names(city):
+    """
+    対応表を検索する市名の候補を返す、最後の市、区、町、村を取り除いた名前も含める
+    """
+    city = city.strip()
+    names = [city]
+    if city.endswith(CITY_SUFFIXES) and len(city) > 1:
+        names.append(city[:-1])
+    return names
+
+
+def city_code_for(skatepark):
+    """
+    スケートパークの市名から天気予報APIの地域のID番号を返す
+    対応表にない市の場合は、県庁所在地のID番号を返す
+
+    引数:
+        skatepark (Skatepark): スケートパーク
+    戻り値:
+        str: 地域のID番号
+    """
+    from .models import WeatherCity
+
+    city_code = (
+        WeatherCity.objects
+        .filter(prefecture=skatepark.prefecture, name__in=city_names(skatepark.city))
+        .values_list('city_code', flat=True)
+        .first()
+    )
+    return city_code or PREFECTURE_ID[skatepark.prefecture]
+
+
+def city_codes_for(locations):
+    """
+    複数の(県名, 市名)の地域のID番号を、対応表を1回だけ読み込んでまとめて返す
+
+    引数:
+        locations (iterable): (県名, 市名)のタプル
+    戻り値:
+        dict: (県名, 市名)と地域のID番号の対応
+    """
+    from .models import WeatherCity
+
+    table = {
+        (prefecture, name): city_code
+        for prefecture, name, city_code in WeatherCity.objects.values_list('prefecture', 'name', 'city_code')
+    }
+    city_codes = {}
+    for prefecture, city in locations:
+        city_code = next(
+            (table[(prefecture, name)] for name in city_names(city) if (prefecture, name) in table),
+            None,
+        )
+        city_codes[(prefecture, city)] = city_code or PREFECTURE_ID[prefecture]
+    return city_codes
+
+
+def request_forecast(city_code):
+    """
+    天気予報APIにリクエストを送り、現在の天候を返す
+    """
+    import requests
+
+    res = requests.get(WEATHER_API_URL.format(city_code), timeout=settings.WEATHER_API_TIMEOUT)
+    res.raise_for_status()
+    json_res = res.json()
+    return json_res['forecasts'][0]['telop']
+
+
+def fetch_forecast(city_code, record=True):
+    """
+    天気予報を取得してキャッシュに保存する
+    同じID番号のリクエストが同時に来た場合は、最初の1つだけがAPIにリクエストを送り、
+    残りはその結果を待って同じ値を返す
+
+    引数:
+        city_code (str): 地域のID番号
+        record (bool): 取得した天候を履歴に保存するか
+    戻り値:
+        str: 現在の天候
+    """
+    from .models import ForecastRecord
+
+    with _inflight_lock:
+        future = _inflight.get(city_code)
+        is_owner = future is None
+        if is_owner:
+            future = Future()
+            _inflight[city_code] = future
+    if not is_owner:
+        return future.result(timeout=settings.WEATHER_API_TIMEOUT * 2)
+    try:
+        telop = request_forecast(city_code)
+        cache.set(cache_key(city_code), telop, settings.WEATHER_CACHE_TIMEOUT)
+        if record:
+            ForecastRecord.objects.create(city_code=city_code, telop=telop)
+        future.set_result(telop)
+        return telop
+    except Exception as err:
+        future.set_exception(err)
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[city_code]
+
+
+def fetch_forecasts(city_codes, max_workers=8):
+    """
+    複数の地域の天気予報をまとめて取得する
+    キャッシュにある地域は取得せず、重複したID番号は1回だけ取得する
+
+    引数:
+        city_codes (iterable): 地域のID番号
+        max_workers (int): 同時にリクエストを送る数
+    戻り値:
+        dict: 地域のID番号と現在の天候の対応、取得に失敗した地域は含まない
+    """
+    city_codes = set(city_codes)
+    cached = cache.get_many([cache_key(city_code) for city_code in city_codes])
+    forecasts = {
+        city_code: cached[cache_key(city_code)]
+        for city_code in city_codes if cache_key(city_code) in cached
+    }
+    missing = city_codes - forecasts.keys()
+    if not missing:
+        return forecasts
+    from .models import ForecastRecord
+
+    # スレッドからはデータベースに書き込まず、取得し終わってからまとめて履歴に保存する
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+        futures = {
+            city_code: executor.submit(fetch_forecast, city_code, record=False)
+            for city_code in missing
+        }
+    fetched_at = timezone.now()
+    records = []
+    for city_code, future in futures.items():
+        if future.exception() is None:
+            forecasts[city_code] = future.result()
+            records.append(ForecastRecord(city_code=city_code, fetched_at=fetched_at, telop=future.result()))
+    ForecastRecord.objects.bulk_create(records)
+    return forecasts
+
+
+def latest_forecast(city_code):
+    """
+    履歴に保存してある最新の天気予報を返す、ない場合はNoneを返す
+    """
+    from .models import ForecastRecord
+
+    return ForecastRecord.objects.filter(city_code=city_code).order_by('-fetched_at').first()
+
+
+def recent_forecasts(city_code):
+    """
+    詳細ページに表示する天候の推移を返す
+    直近TREND_HOURS時間の履歴から、天候が変わった時の履歴だけを新しい順に返す
+
+    引数:
+        city_code (str): 地域のID番号
+    戻り値:
+        list: ForecastRecordのリスト
+    """
+    from .models import ForecastRecord
+
+    records = ForecastRecord.objects.filter(
+        city_code=city_code, fetched_at__gte=timezone.now() - timedelta(hours=TREND_HOURS)
+    ).order_by('-fetched_at').only('fetched_at', 'telop')
+    trend = []
+    # 古い方から見て、前回と同じ天候の履歴は省く
+    for record in reversed(list(records)):
+        if not trend or trend[-1].telop != record.telop:
+            trend.append(record)
+    return trend[::-1][:TREND_SIZE]
+
+
+def get_current_weather(city_code):
+    """
+    投稿詳細ページに表示する現在の天候を返す
+    キャッシュになければAPIから取得し、失敗した時は履歴の最新の天候を取得日時と一緒に返す
+    履歴もない時はエラーメッセージを返す
+
+    引数:
+        city_code (str): 地域のID番号
+    戻り値:
+        str: 現在の天候
+    """
+    telop = cache.get(cache_key(city_code))
+    if telop is not None:
+        return telop
+    try:
+        return fetch_forecast(city_code)
+    except Exception:
+        record = latest_forecast(city_code)
+        if record is None:
+            return WEATHER_ERROR_MESSAGE
+        telop = f'{record.telop} ({timezone.localtime(record.fetched_at):%m/%d %H:%M}時点)'
+        # APIが落ちている間、毎回タイムアウトまで待たないように短い時間だけキャッシュする
+        cache.set(cache_key(city_code), telop, settings.WEATHER_FALLBACK_CACHE_TIMEOUT)
+        return telop
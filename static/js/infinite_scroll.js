@@ -0,0 +1,39 @@
+// 投稿一覧の最後までスクロールしたら、続きの投稿カードを読み込んで追加する
+(function () {
+    const list = document.getElementById('post-list');
+    const more = document.getElementById('post-list-more');
+    if (!list || !more || !('IntersectionObserver' in window)) {
+        return;
+    }
+    let loading = false;
+
+    async function loadNextPage() {
+        const nextUrl = more.dataset.nextUrl;
+        if (loading || !nextUrl) {
+            return;
+        }
+        loading = true;
+        try {
+            const response = await fetch(nextUrl, { headers: { 'X-Requested-With': 'XMLHttpRequest' } });
+            if (!response.ok) {
+                return;
+            }
+            list.insertAdjacentHTML('beforeend', await response.text());
+            // 次のページがなければ監視をやめる
+            more.dataset.nextUrl = response.headers.get('X-Next-Page') || '';
+            if (!more.dataset.nextUrl) {
+                observer.disconnect();
+                more.remove();
+            }
+        } finally {
+            loading = false;
+        }
+    }
+
+    const observer = new IntersectionObserver(function (entries) {
+        if (entries.some(function (entry) { return entry.isIntersecting; })) {
+            loadNextPage();
+        }
+    }, { rootMargin: '600px 0px' });
+    observer.observe(more);
+})();
@@ -0,0 +1,37 @@
+// 投稿詳細ページで、新しいコメントをServer-Sent Eventsで受け取って追加する
+(function () {
+    const list = document.getElementById('comment-list');
+    const count = document.getElementById('comment-count');
+    if (!list || !list.dataset.eventsUrl || !('EventSource' in window)) {
+        return;
+    }
+
+    function commentElement(comment) {
+        const article = document.createElement('article');
+        article.className = 'message is-link';
+        const header = document.createElement('div');
+        header.className = 'message-header';
+        const author = document.createElement('p');
+        author.textContent = comment.author;
+        header.appendChild(author);
+        const body = document.createElement('div');
+        body.className = 'message-body';
+        body.textContent = comment.body;
+        const createdAt = document.createElement('div');
+        createdAt.className = 'mt-3';
+        createdAt.textContent = new Date(comment.created_at).toLocaleString('ja-JP');
+        body.appendChild(createdAt);
+        article.appendChild(header);
+        article.appendChild(body);
+        return article;
+    }
+
+    // 切れた時はブラウザがLast-Event-IDをつけて再接続する
+    const source = new EventSource(list.dataset.eventsUrl);
+    source.addEventListener('comment', function (event) {
+        list.appendChild(commentElement(JSON.parse(event.data)));
+        if (count) {
+            count.textContent = Number(count.textContent) + 1;
+        }
+    });
+})();
@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sukeb.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Djangoの初期化が終わってからモデルを使うモジュールを読み込む
+from posts.live import LiveCommentsApplication  # noqa: E402
+
+# コメントのServer-Sent Eventsだけを別のアプリで処理し、それ以外はDjangoに渡す
+application = LiveCommentsApplication(django_application)
@@ -0,0 +1,54 @@
+"""
+データベースの件数の見積もり
+
+Postgresでは件数をCOUNT(*)で数えずに統計情報から見積もる
+管理画面のページ送りと投稿一覧の件数の表示で使う
+"""
+import json
+
+from django.conf import settings
+from django.db import connections
+
+
+def estimated_count(queryset):
+    """
+    Postgresの統計情報からquerysetの件数の見積もりを返す
+    絞り込んでいない時はpg_classのreltuplesを、絞り込んでいる時はEXPLAINの見積もり行数を使う
+
+    引数:
+        queryset (QuerySet): 件数を見積もるクエリセット
+    戻り値:
+        int: 見積もった件数、Postgres以外のデータベースや、まだANALYZEしていない時はNone
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    query = queryset.order_by().query
+    with connection.cursor() as cursor:
+        if not query.where:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+            # 一度もANALYZEしていないテーブルのreltuplesは-1になる
+            return int(row[0]) if row and row[0] >= 0 else None
+        sql, params = query.get_compiler(using=queryset.db).as_sql()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def approximate_count(queryset):
+    """
+    querysetの件数を返す
+    見積もりがEXACT_COUNT_LIMIT件より少ない時と、Postgres以外のデータベースでは正確に数える
+
+    戻り値:
+        tuple: (件数, 見積もった件数の時はTrue)
+    """
+    estimate = estimated_count(queryset)
+    if estimate is None or estimate < settings.EXACT_COUNT_LIMIT:
+        return queryset.count(), False
+    return estimate, True
@@ -0,0 +1,101 @@
+"""
+ワーカーの起動時間と、起動時に時間のかかっているimportを計測するスクリプト
+
+    python -m sukeb.importtime                  # sukeb.wsgiとURLの設定を読み込む時間を計測する
+    python -m sukeb.importtime --module sukeb.asgi --top 30
+    python -m sukeb.importtime --preload        # sukeb.serverがワーカーの起動前に読み込む時間を計測する
+
+新しいプロセスでモジュールを読み込み、-X importtimeの結果を集計する
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+TIMING_CODE = (
+    '{setup}\n'
+    'import time\n'
+    'started = time.perf_counter()\n'
+    '{code}\n'
+    'print(time.perf_counter() - started)\n'
+)
+# URLの設定は最初のリクエストで読み込まれるので、起動時間に含めて計測する
+IMPORT_CODE = 'import {module}\nfrom django.urls import get_resolver\nget_resolver().url_patterns'
+PRELOAD_CODE = 'load_application({module!r} + \':application\')'
+# gunicornはアプリより先にマスターが読み込んでいるので、起動時間には含めない
+PRELOAD_SETUP = 'from sukeb.server import load_application'
+
+
+def cold_start_times(code, runs, env, setup=''):
+    """
+    新しいプロセスでsetupを実行した後、codeを実行するのにかかった秒数をruns回分返す
+    """
+    times = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', TIMING_CODE.format(setup=setup, code=code)],
+            env=env, capture_output=True, text=True, check=True,
+        )
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return times
+
+
+def import_times(code, env):
+    """
+    -X importtimeの結果を読み込み、(自身の時間, 累計の時間, モジュール名, 深さ)のリストを返す
+    時間の単位はマイクロ秒
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(self_time), int(cumulative), name.strip(), depth))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='起動時のimportにかかる時間を計測する')
+    parser.add_argument('--module', default='sukeb.wsgi', help='読み込むモジュール (デフォルト: sukeb.wsgi)')
+    parser.add_argument('--top', type=int, default=20, help='表示する件数 (デフォルト: 20)')
+    parser.add_argument('--runs', type=int, default=5, help='起動時間を計測する回数 (デフォルト: 5)')
+    parser.add_argument(
+        '--preload', action='store_true',
+        help='sukeb.serverと同じ方法で、ガベージコレクションを止めて読み込む'
+    )
+    args = parser.parse_args(argv)
+    code = (PRELOAD_CODE if args.preload else IMPORT_CODE).format(module=args.module)
+    setup = PRELOAD_SETUP if args.preload else ''
+
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'sukeb.settings')
+    # 計測するプロセスでも、このディレクトリからモジュールを読み込めるようにする
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.getcwd(), env.get('PYTHONPATH')]))
+
+    times = cold_start_times(code, args.runs, env, setup)
+    print(
+        f'{args.module}: median {statistics.median(times) * 1000:.1f} ms  '
+        f'min {min(times) * 1000:.1f} ms  ({args.runs} runs)'
+    )
+
+    rows = import_times(f'{setup}\n{code}', env)
+    print(f'\nslowest imports by cumulative time (top {args.top})')
+    print(f"{'cumulative ms':>13} {'self ms':>8}  module")
+    # 親のimportの中に子のimportの時間も含まれるので、累計では上位のモジュールが並ぶ
+    for self_time, cumulative, name, depth in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        print(f'{cumulative / 1000:>13.1f} {self_time / 1000:>8.1f}  {"  " * depth}{name}')
+    print(f'\nslowest imports by self time (top {args.top})')
+    print(f"{'self ms':>13}  module")
+    for self_time, _, name, _ in sorted(rows, key=lambda row: -row[0])[:args.top]:
+        print(f'{self_time / 1000:>13.1f}  {name}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+from django.template import engines
+from django.template.defaultfilters import date, truncatechars
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.formats import localize
+from django.utils.timezone import template_localtime
+from jinja2 import Environment
+
+from posts.templatetags.posts_tags import prefecture_sidebar
+
+
+def url(viewname, *args, **kwargs):
+    """
+    Djangoテンプレートの{% url %}と同じようにURLを返す
+    """
+    return reverse(viewname, args=args or None, kwargs=kwargs or None)
+
+
+def django_include(template_name, **context):
+    """
+    Djangoのテンプレートを描画して埋め込む
+    head.htmlや投稿カードのように、Djangoのページやフラグメントと共通の部品は
+    Jinja2用に書き写さず、同じファイルを描画する
+    """
+    return engines['django'].get_template(template_name).render(context)
+
+
+def localize_value(value):
+    """
+    Djangoテンプレートで{{ value }}と書いた時と同じように、日時を現地時間にして表示形式を整える
+    """
+    return localize(template_localtime(value))
+
+
+def environment(**options):
+    """
+    Jinja2のテンプレートで使う関数とフィルターを登録した環境を作る
+    """
+    env = Environment(**options)
+    env.globals.update({
+        'url': url,
+        'django_include': django_include,
+        'static': static,
+        'prefecture_sidebar': prefecture_sidebar,
+    })
+    env.filters.update({
+        'date': date,
+        'localize': localize_value,
+        'truncatechars': truncatechars,
+    })
+    return env
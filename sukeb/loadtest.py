@@ -0,0 +1,105 @@
+"""
+サーバーに同時にリクエストを送り、スループットと応答時間を計測するスクリプト
+
+    python -m sukeb.loadtest http://localhost:8000/ --concurrency 16 --duration 20
+
+URLを複数指定すると順番に使う。seed_postsコマンドで作ったデータで計測する
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+
+def worker(urls, deadline, results, lock):
+    """
+    deadlineまでkeep-aliveの接続でリクエストを送り続ける
+    """
+    connections = {}
+    latencies = []
+    statuses = Counter()
+    index = 0
+    while time.perf_counter() < deadline:
+        url = urls[index % len(urls)]
+        index += 1
+        parts = urlsplit(url)
+        connection = connections.get(parts.netloc)
+        if connection is None:
+            connection = connections[parts.netloc] = http.client.HTTPConnection(parts.netloc, timeout=30)
+        path = parts.path or '/'
+        if parts.query:
+            path = f'{path}?{parts.query}'
+        started = time.perf_counter()
+        try:
+            connection.request('GET', path, headers={'Accept-Encoding': 'gzip, br'})
+            response = connection.getresponse()
+            response.read()
+            statuses[response.status] += 1
+            if response.getheader('Connection', '').lower() == 'close':
+                connection.close()
+                del connections[parts.netloc]
+        except (OSError, http.client.HTTPException):
+            statuses['error'] += 1
+            connection.close()
+            del connections[parts.netloc]
+            continue
+        latencies.append(time.perf_counter() - started)
+    with lock:
+        results['latencies'].extend(latencies)
+        results['statuses'].update(statuses)
+
+
+def run(urls, concurrency, duration):
+    """
+    concurrency個のスレッドでduration秒リクエストを送り、結果を返す
+    """
+    results = {'latencies': [], 'statuses': Counter()}
+    lock = threading.Lock()
+    started = time.perf_counter()
+    deadline = started + duration
+    threads = [
+        threading.Thread(target=worker, args=(urls, deadline, results, lock))
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results['elapsed'] = time.perf_counter() - started
+    return results
+
+
+def percentile(values, rate):
+    return values[min(len(values) - 1, int(len(values) * rate))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='サーバーのスループットを計測する')
+    parser.add_argument('urls', nargs='+', help='リクエストを送るURL')
+    parser.add_argument('--concurrency', type=int, default=16, help='同時に送るリクエストの数 (デフォルト: 16)')
+    parser.add_argument('--duration', type=float, default=20, help='計測する秒数 (デフォルト: 20)')
+    parser.add_argument('--warmup', type=float, default=2, help='計測の前に送る秒数 (デフォルト: 2)')
+    args = parser.parse_args(argv)
+
+    if args.warmup:
+        run(args.urls, args.concurrency, args.warmup)
+    results = run(args.urls, args.concurrency, args.duration)
+    latencies = sorted(results['latencies'])
+    if not latencies:
+        print(f"全てのリクエストが失敗しました: {dict(results['statuses'])}")
+        return
+    print(f'concurrency={args.concurrency} duration={results["elapsed"]:.1f}s requests={len(latencies)}')
+    print(f'throughput {len(latencies) / results["elapsed"]:.1f} req/s')
+    print(
+        f'latency p50 {statistics.median(latencies) * 1000:.1f} ms  '
+        f'p95 {percentile(latencies, 0.95) * 1000:.1f} ms  '
+        f'p99 {percentile(latencies, 0.99) * 1000:.1f} ms'
+    )
+    print(f"status {dict(sorted(results['statuses'].items(), key=str))}")
+
+
+if __name__ == '__main__':
+    main()
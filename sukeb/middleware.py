@@ -0,0 +1,197 @@
+import math
+import re
+import time
+from gzip import GzipFile
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.http import HttpResponse
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import StreamingBuffer, compress_string
+
+from .ratelimit import take_token
+
+try:
+    import brotli
+except ImportError:  # brotliがインストールされていない時はgzipだけを使う
+    brotli = None
+
+
+re_accepts_brotli = re.compile(r'\bbr\b')
+re_accepts_gzip = re.compile(r'\bgzip\b')
+
+# ストリーミングのレスポンスは、まだ送っていない分がこのバイト数を超えるか、
+# 前にflushしてからこの秒数が経った後に次のチャンクが届いた時にflushする
+STREAM_FLUSH_BYTES = 16 * 1024
+STREAM_FLUSH_SECONDS = 0.1
+
+
+def flush_points(sequence):
+    """
+    ストリーミングのレスポンスのチャンクと、そのチャンクの後でflushするかを返す
+    最初のチャンク(<head>など)はすぐにflushし、その後はSTREAM_FLUSH_BYTESかSTREAM_FLUSH_SECONDSを
+    超えた時だけflushする
+    チャンクごとにflushすると、圧縮の辞書がリセットされて圧縮率が大きく下がる
+
+    経過時間は次のチャンクが届いた時にしか判定しないので、STREAM_FLUSH_SECONDSはチャンクの間の上限で、
+    送信の遅れの上限ではない
+    小さいチャンクの後でビューが止まると、次のチャンクか終わりまでその分は送られない
+    ビューが時間のかかる処理の前に送りたい分は、最初のチャンクにまとめて返す
+    """
+    pending = 0
+    last_flush = None
+    for chunk in sequence:
+        pending += len(chunk)
+        now = time.monotonic()
+        flush = (
+            last_flush is None
+            or pending >= STREAM_FLUSH_BYTES
+            or now - last_flush >= STREAM_FLUSH_SECONDS
+        )
+        if flush:
+            pending = 0
+            last_flush = now
+        yield chunk, flush
+
+
+def compress_brotli(content, quality):
+    return brotli.compress(content, quality=quality)
+
+
+def compress_brotli_sequence(sequence, quality):
+    """
+    ストリーミングのレスポンスをbrotliで圧縮して返す
+    flush_pointsの区切りでflushするので、ブラウザは届いた分から表示できる
+    """
+    compressor = brotli.Compressor(quality=quality)
+    for chunk, flush in flush_points(sequence):
+        data = compressor.process(chunk)
+        if flush:
+            data += compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def compress_gzip_sequence(sequence):
+    """
+    ストリーミングのレスポンスをgzipで圧縮して返す
+    Djangoのcompress_sequenceはflushしないので、flush_pointsの区切りでflushする
+    """
+    buf = StreamingBuffer()
+    with GzipFile(mode='wb', compresslevel=6, fileobj=buf, mtime=0) as zfile:
+        for chunk, flush in flush_points(sequence):
+            zfile.write(chunk)
+            if flush:
+                zfile.flush()
+            data = buf.read()
+            if data:
+                yield data
+    yield buf.read()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    HTMLとJSONなどのテキストのレスポンスを圧縮するミドルウェア
+    ブラウザが対応していて、brotliがインストールされている時はbrotliを、それ以外はgzipを使う
+    静的ファイルはWhiteNoiseが圧縮済みのファイルを返すので、ここでは圧縮しない
+    """
+    content_types = (
+        'text/html',
+        'application/json',
+        'application/x-ndjson',
+        'text/csv',
+    )
+    # 動的なレスポンスは毎回圧縮するので、圧縮率より速さを優先する
+    brotli_quality = 5
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if content_type not in self.content_types:
+            return response
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and re_accepts_brotli.search(accept_encoding):
+            encoding = 'br'
+        elif re_accepts_gzip.search(accept_encoding):
+            encoding = 'gzip'
+        else:
+            return super().process_response(request, response)
+
+        if not response.streaming and len(response.content) < 200:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.streaming:
+            if encoding == 'br':
+                response.streaming_content = compress_brotli_sequence(
+                    response.streaming_content, self.brotli_quality
+                )
+            else:
+                response.streaming_content = compress_gzip_sequence(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed_content = compress_brotli(response.content, self.brotli_quality)
+            else:
+                compressed_content = compress_string(response.content)
+            if len(compressed_content) >= len(response.content):
+                return response
+            response.content = compressed_content
+            response.headers['Content-Length'] = str(len(response.content))
+        # 圧縮すると中身が変わるので、強いETagは弱いETagにする
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def client_ip(request):
+    """
+    リクエストを送ったクライアントのIPアドレスを返す
+    RATE_LIMIT_PROXY_COUNT台のプロキシの後ろにいる時は、X-Forwarded-Forの最後からその数だけ戻った値を使う
+    """
+    proxy_count = settings.RATE_LIMIT_PROXY_COUNT
+    if proxy_count:
+        forwarded_for = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+        if len(forwarded_for) >= proxy_count:
+            return forwarded_for[-proxy_count]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def rate_limit_key(request, view_name):
+    """
+    ログインしている時はユーザー、していない時はIPアドレスと、URLの名前からバケットのキーを作る
+    ユーザーはセッションのIDだけを見て、ユーザーのモデルは読み込まない
+    """
+    user_id = request.session.get(SESSION_KEY)
+    if user_id is not None:
+        return f'{view_name}:user:{user_id}'
+    return f'{view_name}:ip:{client_ip(request)}'
+
+
+class RateLimitMiddleware(MiddlewareMixin):
+    """
+    RATE_LIMITSに登録したURLへのPOSTリクエストの回数を制限するミドルウェア
+    RATE_LIMIT_ENABLEDがFalseの時は制限しない
+    ビューを呼ぶ前に判定し、制限を超えたリクエストにはRetry-Afterをつけて429を返す
+    """
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method != 'POST' or not settings.RATE_LIMIT_ENABLED:
+            return None
+        view_name = request.resolver_match.view_name
+        limit = settings.RATE_LIMITS.get(view_name)
+        if limit is None:
+            return None
+        wait = take_token(rate_limit_key(request, view_name), *limit)
+        if not wait:
+            return None
+        response = HttpResponse(
+            'リクエストが多すぎます。しばらくしてからもう一度お試しください。',
+            status=429, content_type='text/plain; charset=utf-8',
+        )
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
@@ -0,0 +1,116 @@
+"""
+トークンバケットでリクエストの回数を制限する
+
+バケットはRATE_LIMIT_CACHEのキャッシュに保存する
+Redisの時はLuaスクリプトで、補充と消費を1回の通信でまとめて行い、全てのワーカーで同じ制限を使う
+Redis以外のキャッシュでは、読み込みと書き込みの間をプロセス内のロックで守るだけなので、
+LocMemCacheではワーカーごとの制限(全体ではワーカーの数の倍まで)になる
+"""
+import math
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+
+
+# KEYS[1]: バケットのキー、ARGV[1]: 容量、ARGV[2]: 1秒に補充するトークンの数
+# トークンが足りない時は、次のトークンが補充されるまでの秒数を返す
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+_redis_scripts = {}
+_local_lock = threading.Lock()
+
+
+def refill(tokens, updated, now, capacity, rate):
+    """
+    前回からの経過時間分のトークンを補充し、1つ消費する
+
+    戻り値:
+        tuple: (残りのトークン, 次のトークンが補充されるまでの秒数、消費できた時は0)
+    """
+    tokens = min(capacity, tokens + max(0, now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate
+
+
+def redis_script(alias):
+    """
+    キャッシュaliasのRedisに登録したトークンバケットのスクリプトを返す
+    DjangoのRedisCacheは内部の接続を公開していないので、同じLOCATIONに自分で接続する
+    複数のサーバーを指定した時は、Djangoと同じく書き込みに使う最初のサーバーを使う
+    """
+    location = settings.CACHES[alias]['LOCATION']
+    if isinstance(location, str):
+        location = re.split('[;,]', location)
+    location = location[0]
+    script = _redis_scripts.get(location)
+    if script is None:
+        import redis
+
+        script = redis.Redis.from_url(location).register_script(TOKEN_BUCKET_SCRIPT)
+        _redis_scripts[location] = script
+    return script
+
+
+def take_token_redis(cache, alias, key, capacity, rate):
+    # EVALSHAを送り、スクリプトがまだ登録されていない時だけ本文を送り直す
+    script = redis_script(alias)
+    return float(script(keys=[cache.make_and_validate_key(key)], args=[capacity, rate]))
+
+
+def take_token_local(cache, key, capacity, rate, period):
+    """
+    Redis以外のキャッシュでは、読み込みと書き込みの2回の通信の間をロックで守る
+    ロックはプロセス内だけなので、LocMemCacheではワーカーごとの制限になり、
+    複数のワーカーで共有するキャッシュでもおおよその制限になる
+    全てのワーカーで同じ制限を使う時は、RATE_LIMIT_CACHEにRedisのキャッシュを指定する
+    """
+    with _local_lock:
+        now = time.time()
+        tokens, updated = cache.get(key, (capacity, now))
+        tokens, wait = refill(tokens, updated, now, capacity, rate)
+        cache.set(key, (tokens, now), math.ceil(period) + 1)
+    return wait
+
+
+def take_token(key, capacity, period):
+    """
+    バケットからトークンを1つ消費する
+    容量はcapacityで、period秒で空から満杯まで補充される
+
+    引数:
+        key (str): バケットのキー
+        capacity (int): 連続でリクエストできる回数
+        period (int): capacity回分のトークンが補充される秒数
+    戻り値:
+        float: 次にリクエストできるまでの秒数、リクエストできる時は0
+    """
+    alias = settings.RATE_LIMIT_CACHE
+    cache = caches[alias]
+    rate = capacity / period
+    key = f'ratelimit:{key}'
+    if isinstance(cache, RedisCache):
+        return take_token_redis(cache, alias, key, capacity, rate)
+    return take_token_local(cache, key, capacity, rate, period)
@@ -0,0 +1,123 @@
+"""
+本番用のサーバーを起動するモジュール
+
+    python -m sukeb.server          # gunicornのgthreadワーカーでWSGIアプリを動かす
+    python -m sukeb.server --asgi   # uvicornのワーカーでASGIアプリを動かす(コメントのライブ配信が使える)
+
+ワーカー数などは環境変数で上書きできる
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+
+from gunicorn.app.base import BaseApplication
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def server_options(asgi=False):
+    """
+    gunicornの設定を環境変数とCPUのコア数から作る
+
+    引数:
+        asgi (bool): uvicornのワーカーでASGIアプリを動かすか
+    戻り値:
+        dict: gunicornの設定
+    """
+    cores = multiprocessing.cpu_count()
+    options = {
+        'bind': os.environ.get('SERVER_BIND', '0.0.0.0:8000'),
+        # ワーカーを起動する前にアプリを読み込み、forkしたワーカーでメモリを共有する
+        'preload_app': True,
+        # メモリリークに備え、max_requests件処理したワーカーを入れ替える
+        # jitterで入れ替えの時期をずらし、全てのワーカーが同時に止まらないようにする
+        'max_requests': env_int('SERVER_MAX_REQUESTS', 1000),
+        'max_requests_jitter': env_int('SERVER_MAX_REQUESTS_JITTER', 100),
+        # ロードバランサーの後ろで接続を使い回せるように、keep-aliveの時間をとる
+        'keepalive': env_int('SERVER_KEEPALIVE', 5),
+        'timeout': env_int('SERVER_TIMEOUT', 30),
+        'graceful_timeout': env_int('SERVER_GRACEFUL_TIMEOUT', 30),
+        # 空にするとアクセスログを出さない
+        'accesslog': os.environ.get('SERVER_ACCESS_LOG', '-') or None,
+    }
+    if asgi:
+        # イベントループのワーカーは1つで多くの接続を処理できるので、コア数と同じにする
+        options.update({
+            'worker_class': 'uvicorn.workers.UvicornWorker',
+            'workers': env_int('SERVER_WORKERS', cores),
+        })
+    else:
+        # 天気予報APIやデータベースの待ち時間をスレッドで重ねる
+        options.update({
+            'worker_class': 'gthread',
+            'workers': env_int('SERVER_WORKERS', cores * 2 + 1),
+            'threads': env_int('SERVER_THREADS', 4),
+        })
+    return options
+
+
+def load_application(application_path):
+    """
+    アプリとURLの設定を読み込んで返す
+    読み込みの間はガベージコレクションを止め、読み込んだオブジェクトはgc.freezeで対象から外す
+    preload_appでマスターが読み込むと、forkしたワーカーはURLの設定を読み込み済みの状態で始まり、
+    ガベージコレクションで共有しているメモリに書き込むこともなくなる
+
+    引数:
+        application_path (str): 'モジュール:変数'の形式のアプリのパス
+    戻り値:
+        アプリ
+    """
+    from gunicorn.util import import_app
+
+    gc.disable()
+    try:
+        application = import_app(application_path)
+        # 最初のリクエストで読み込まれるビューとURLの設定も先に読み込む
+        from django.urls import get_resolver
+        get_resolver().url_patterns
+    finally:
+        gc.freeze()
+        gc.enable()
+    return application
+
+
+class Server(BaseApplication):
+    """
+    設定ファイルを使わずに、dictの設定でgunicornを起動する
+    """
+    def __init__(self, application_path, options):
+        self.application_path = application_path
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return load_application(self.application_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='本番用のサーバーを起動する')
+    parser.add_argument('--asgi', action='store_true', help='uvicornのワーカーでASGIアプリを動かす')
+    parser.add_argument('--print-config', action='store_true', help='起動せずに設定を表示する')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sukeb.settings')
+    options = server_options(asgi=args.asgi)
+    if args.print_config:
+        for key, value in sorted(options.items()):
+            print(f'{key} = {value!r}')
+        return
+    application_path = 'sukeb.asgi:application' if args.asgi else 'sukeb.wsgi:application'
+    Server(application_path, options).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,11 @@
 from pathlib import Path
 import os
 
-from dotenv import load_dotenv
 
-
-load_dotenv('.env')
+# .envがある時だけpython-dotenvを読み込み、ワーカーの起動を軽くする
+if os.path.exists('.env'):
+    from dotenv import load_dotenv
+    load_dotenv('.env')
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -40,7 +41,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # 静的ファイルはDjangoのビューを通さずに、圧縮済みのファイルを返す
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'sukeb.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    # ビューを呼ぶ前にコメント、ログイン、登録の回数を制限する
+    'sukeb.middleware.RateLimitMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -61,13 +67,33 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'posts.context_processors.notifications',
             ],
         },
     },
 ]
 
+# USE_JINJA2を設定すると、templates/jinja2にあるページはJinja2で描画する
+# それ以外のテンプレートはJinja2のディレクトリにないので、Djangoのテンプレートで描画される
+USE_JINJA2 = os.environ.get('USE_JINJA2', '').lower() in ('1', 'true', 'yes')
+if USE_JINJA2:
+    TEMPLATES.insert(0, {
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'DIRS': [os.path.join(TEMPLATES_DIR, 'jinja2')],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            'environment': 'sukeb.jinja2.environment',
+            'context_processors': [
+                'posts.context_processors.notifications',
+            ],
+        },
+    })
+
 WSGI_APPLICATION = 'sukeb.wsgi.application'
 
+# テストの間は回数制限を止め、キャッシュをプロセス内のメモリにする
+TEST_RUNNER = 'sukeb.test_runner.TestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
@@ -83,6 +109,20 @@ DATABASES = {
     }
 }
 
+# REDIS_URLを指定した時はRedisをキャッシュに使い、全てのワーカーで共有する
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# 新しいコメントを配る方法、postgresかmemory
+# 指定しない時は、データベースがPostgresならLISTEN/NOTIFYでワーカー間に配る
+LIVE_COMMENTS_BROKER = os.environ.get('LIVE_COMMENTS_BROKER')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -102,6 +142,83 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# パスワードハッシュのコストプロファイル(PBKDF2の反復回数)
+PASSWORD_HASH_PROFILES = {
+    'low': 100000,
+    'default': 390000,
+    'high': 600000,
+}
+PASSWORD_HASH_PROFILE = os.environ.get('PASSWORD_HASH_PROFILE', 'default')
+# 非同期ログイン、登録でハッシュ計算に使うスレッド数
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))
+
+PASSWORD_HASHERS = [
+    'authentications.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+AUTHENTICATION_BACKENDS = [
+    'authentications.backends.EmailBackend',
+]
+
+
+# 投稿一覧の続きの投稿カードをキャッシュする時間(秒)
+POST_FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('POST_FRAGMENT_CACHE_TIMEOUT', 60))
+
+# 人気の投稿ページに表示する件数と、人気度が半分になるまでの時間
+POPULAR_POSTS_SIZE = 20
+POPULARITY_HALF_LIFE_HOURS = float(os.environ.get('POPULARITY_HALF_LIFE_HOURS', 24))
+
+# フォロワーがこの人数より多い投稿者と都道府県の投稿は、フォロワーごとに書き込まず読む時に集める
+TIMELINE_FANOUT_THRESHOLD = int(os.environ.get('TIMELINE_FANOUT_THRESHOLD', 500))
+# タイムラインの1ページの件数と、フォローした時にタイムラインに加える最近の投稿の件数
+TIMELINE_PAGE_SIZE = 20
+TIMELINE_BACKFILL_SIZE = 50
+
+# 管理画面と投稿一覧の件数は、見積もりがこれより少ない時だけ正確に数える
+EXACT_COUNT_LIMIT = int(os.environ.get('EXACT_COUNT_LIMIT', 10000))
+
+# 未読の通知の件数をキャッシュする時間(秒)
+NOTIFICATION_COUNT_CACHE_TIMEOUT = int(os.environ.get('NOTIFICATION_COUNT_CACHE_TIMEOUT', 10 * 60))
+# 通知をまとめたメールを送る方法、指定しない時はEMAIL_FILE_PATHにファイルとして書き出す
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.filebased.EmailBackend')
+EMAIL_FILE_PATH = os.environ.get('EMAIL_FILE_PATH', os.path.join(BASE_DIR, 'sent_emails'))
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'noreply@sukeba.example.com')
+
+# コメントをファイルに溜めて、まとめてデータベースに書き込むか
+COMMENT_BUFFER_ENABLED = os.environ.get('COMMENT_BUFFER_ENABLED', '').lower() in ('1', 'true', 'yes')
+# 溜めたコメントを置くディレクトリ、全てのワーカーで同じディレクトリを使う
+COMMENT_BUFFER_DIR = os.environ.get('COMMENT_BUFFER_DIR', os.path.join(BASE_DIR, 'comment_buffer'))
+# 1回のbulk_createで書き込む件数と、書き込む間隔(秒)、0の時はflush_commentsコマンドで書き込む
+COMMENT_BUFFER_BATCH_SIZE = int(os.environ.get('COMMENT_BUFFER_BATCH_SIZE', 200))
+COMMENT_BUFFER_INTERVAL = float(os.environ.get('COMMENT_BUFFER_INTERVAL', 1))
+
+# 天気予報APIのタイムアウト(秒)と、取得した天気予報をキャッシュする時間(秒)
+WEATHER_API_TIMEOUT = 5
+WEATHER_CACHE_TIMEOUT = int(os.environ.get('WEATHER_CACHE_TIMEOUT', 30 * 60))
+# APIが落ちている時に、保存してある天気予報を返す間隔(秒)と、履歴を残す日数
+WEATHER_FALLBACK_CACHE_TIMEOUT = 60
+WEATHER_HISTORY_DAYS = int(os.environ.get('WEATHER_HISTORY_DAYS', 30))
+
+# POSTリクエストの回数を制限するURLの名前と、(連続でリクエストできる回数, 回数分が補充される秒数)
+RATE_LIMITS = {
+    'posts:detail': (10, 60),
+    'authentications:login': (10, 60),
+    'authentications:async_login': (10, 60),
+    'authentications:signup': (10, 600),
+    'authentications:async_signup': (10, 600),
+}
+# 回数を制限するか、テストの間はsukeb.test_runnerが止める
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# トークンのバケットを保存するキャッシュ
+# Redis以外のキャッシュでは、全てのワーカーで共有されず、ワーカーごとの制限になる
+RATE_LIMIT_CACHE = os.environ.get('RATE_LIMIT_CACHE', 'default')
+# アプリの前にあるプロキシの台数、0の時はX-Forwarded-Forを使わない
+RATE_LIMIT_PROXY_COUNT = int(os.environ.get('RATE_LIMIT_PROXY_COUNT', 0))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
@@ -122,6 +239,11 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = ( 
     STATIC_DIR,
 )
+# collectstaticで集めた静的ファイルのフォルダー
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# collectstaticでファイル名にハッシュをつけ、gzipとbrotliで圧縮したファイルも作る
+# ハッシュつきのファイルはWhiteNoiseが期限なしでキャッシュするヘッダーをつけて返す
+STATICFILES_STORAGE = 'sukeb.storage.StaticFilesStorage'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
@@ -0,0 +1,27 @@
+"""
+テストの実行
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    テストの間は回数制限を止め、キャッシュをプロセス内のメモリに置き換える
+
+    同じIPアドレスから何度もログインするテストが制限に引っかからないようにし、
+    REDIS_URLでRedisを使う環境でも、テストのcache.clear()で本物のキャッシュを消さない
+    回数制限のテストは、override_settingsでRATE_LIMIT_ENABLEDをTrueにする
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(
+            RATE_LIMIT_ENABLED=False,
+            RATE_LIMIT_CACHE='default',
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        )
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -6,6 +6,7 @@ from django.conf.urls.static import static
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('authentications.urls')),
+    path('api/', include('posts.api_urls')),
     path('', include('posts.urls')),
 ]
 